@@ -1,5 +1,3 @@
-import sqlite3
-
 import pyray as ray
 from raylib import CAMERA_ORTHOGRAPHIC
 from raylib.defines import (
@@ -10,6 +8,11 @@ from raylib.defines import (
 )
 
 from libs.audio import audio
+from libs.input import drum_input
+from libs.profiler import profiler
+from libs.score_store import score_store
+from libs.texture import tex
+from libs.timeline import song_timeline
 from libs.utils import (
     force_dedicated_gpu,
     get_config,
@@ -42,37 +45,6 @@ class Screens:
     DEV_MENU = "DEV_MENU"
     LOADING = "LOADING"
 
-def create_song_db():
-    """Create the scores database if it doesn't exist
-    The migration will eventually be removed"""
-    with sqlite3.connect('scores.db') as con:
-        cursor = con.cursor()
-        create_table_query = '''
-        CREATE TABLE IF NOT EXISTS Scores (
-            hash TEXT PRIMARY KEY,
-            en_name TEXT NOT NULL,
-            jp_name TEXT NOT NULL,
-            diff INTEGER,
-            score INTEGER,
-            good INTEGER,
-            ok INTEGER,
-            bad INTEGER,
-            drumroll INTEGER,
-            combo INTEGER,
-            clear INTEGER
-        );
-        '''
-        cursor.execute(create_table_query)
-        con.commit()
-        # Migrate existing records: set clear=2 for full combos (bad=0)
-        cursor.execute("""
-            UPDATE Scores
-            SET clear = 2
-            WHERE bad = 0 AND (clear IS NULL OR clear <> 2)
-        """)
-        con.commit()
-        print("Scores database created successfully")
-
 def main():
     force_dedicated_gpu()
     global_data.config = get_config()
@@ -94,6 +66,7 @@ def main():
     camera.projection = CAMERA_ORTHOGRAPHIC
 
     ray.init_window(screen_width, screen_height, "PyTaiko")
+    tex.set_budget(global_data.config["video"].get("texture_budget_mb", 0))
     global_tex.load_screen_textures('global')
     global_tex.load_zip('chara', 'chara_0')
     global_tex.load_zip('chara', 'chara_1')
@@ -106,8 +79,6 @@ def main():
 
     audio.init_audio_device()
 
-    create_song_db()
-
     title_screen = TitleScreen()
     entry_screen = EntryScreen()
     song_select_screen = SongSelectScreen()
@@ -140,19 +111,32 @@ def main():
     ray.set_exit_key(ord(global_data.config["keys_1p"]["exit_key"]))
 
     while not ray.window_should_close():
+        profiler.begin_frame()
         if ray.is_key_pressed(ray.KeyboardKey.KEY_F11):
             ray.toggle_fullscreen()
         elif ray.is_key_pressed(ray.KeyboardKey.KEY_F10):
             ray.toggle_borderless_windowed()
+        elif ray.is_key_pressed(ray.KeyboardKey.KEY_F3):
+            profiler.toggle()
+        elif ray.is_key_pressed(ray.KeyboardKey.KEY_F4):
+            if ray.is_key_down(ray.KeyboardKey.KEY_LEFT_SHIFT) or ray.is_key_down(ray.KeyboardKey.KEY_RIGHT_SHIFT):
+                profiler.toggle_session()
+            else:
+                profiler.dump_trace()
+        elif ray.is_key_pressed(ray.KeyboardKey.KEY_F5):
+            song_timeline.dump_drift_log()
+        drum_input.poll()
 
         ray.begin_texture_mode(target)
         ray.begin_blend_mode(ray.BlendMode.BLEND_CUSTOM_SEPARATE)
 
         screen = screen_mapping[current_screen]
 
-        next_screen = screen.update()
+        with profiler.section('update'):
+            next_screen = screen.update()
         ray.clear_background(ray.BLACK)
-        screen.draw()
+        with profiler.section('draw'):
+            screen.draw()
         #ray.begin_mode_3d(camera)
         #screen.draw_3d()
        # ray.end_mode_3d()
@@ -167,17 +151,22 @@ def main():
         ray.end_texture_mode()
         ray.begin_drawing()
         ray.clear_background(ray.WHITE)
-        ray.draw_texture_pro(
-             target.texture,
-             ray.Rectangle(0, 0, target.texture.width, -target.texture.height),
-             ray.Rectangle(0, 0, ray.get_screen_width(), ray.get_screen_height()),
-             ray.Vector2(0,0),
-             0,
-             ray.WHITE
-        )
-        ray.end_drawing()
+        with profiler.section('blit'):
+            ray.draw_texture_pro(
+                 target.texture,
+                 ray.Rectangle(0, 0, target.texture.width, -target.texture.height),
+                 ray.Rectangle(0, 0, ray.get_screen_width(), ray.get_screen_height()),
+                 ray.Vector2(0,0),
+                 0,
+                 ray.WHITE
+            )
+        profiler.draw()
+        # Includes waiting for vsync when it is enabled
+        with profiler.section('present'):
+            ray.end_drawing()
     ray.close_window()
     audio.close_audio_device()
+    score_store.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,86 @@
+"""Measure cloning animations from their prototypes against copy.deepcopy, which
+TextureWrapper.get_animation(index, is_copy=True) used before.
+
+Every animation.json under Graphics is parsed, and each animation is copied both
+ways: clone() from the read-only prototype, and deepcopy of a writable animation
+as the texture wrapper held them before. The clones are checked to hold the same
+values as the deep copies. The time per copy is printed for every animation type.
+
+Usage:
+    python -m benchmarks.animation_clone [rounds]
+
+Defaults to 200 rounds over every animation.
+"""
+import copy
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from libs.animation import BaseAnimation, parse_animations
+
+DEFAULT_ROUNDS = 200
+
+def load_prototypes(graphics_path: Path) -> list[BaseAnimation]:
+    """Return the prototypes of every animation.json under a folder."""
+    prototypes = []
+    for path in sorted(graphics_path.rglob('animation.json')):
+        with open(path, encoding='utf-8') as f:
+            prototypes.extend(parse_animations(json.load(f)).values())
+    return prototypes
+
+def same_fields(a: BaseAnimation, b: BaseAnimation) -> bool:
+    """Check two animations hold the same values, lists and tuples compared by content."""
+    def normalize(value):
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+    return type(a) is type(b) and all(normalize(getattr(a, name)) == normalize(getattr(b, name))
+                                      for name in a.CLONE_FIELDS)
+
+def time_copies(animations: list[BaseAnimation], copy_function, rounds: int) -> dict[str, int]:
+    """Return the total nanoseconds spent copying each type of animation."""
+    totals: dict[str, int] = defaultdict(int)
+    for _ in range(rounds):
+        for animation in animations:
+            start = time.perf_counter_ns()
+            copy_function(animation)
+            totals[animation.LIVE_CLASS.__name__] += time.perf_counter_ns() - start
+    return totals
+
+def benchmark_animation_clone(rounds: int) -> bool:
+    prototypes = load_prototypes(Path('Graphics'))
+    if not prototypes:
+        print("No animation.json found under Graphics")
+        return False
+    # The writable animations the texture wrapper used to deepcopy
+    animations = [prototype.clone() for prototype in prototypes]
+    mismatches = [prototype for prototype, animation in zip(prototypes, animations)
+                  if not same_fields(prototype.clone(), copy.deepcopy(animation))]
+
+    counts: dict[str, int] = defaultdict(int)
+    for prototype in prototypes:
+        counts[prototype.LIVE_CLASS.__name__] += rounds
+    deepcopy_ns = time_copies(animations, copy.deepcopy, rounds)
+    clone_ns = time_copies(prototypes, BaseAnimation.clone, rounds)
+
+    print(f"{len(prototypes)} animations, {rounds} rounds")
+    print(f"{'Type':<24}{'Copies':>10}{'deepcopy us':>14}{'clone us':>12}{'Speedup':>10}")
+    print('-' * 70)
+    for name in sorted(counts):
+        deep_us = deepcopy_ns[name] / counts[name] / 1000
+        clone_us = clone_ns[name] / counts[name] / 1000
+        print(f"{name:<24}{counts[name]:>10}{deep_us:>14.2f}{clone_us:>12.2f}{deep_us / clone_us:>9.1f}x")
+    total = sum(counts.values())
+    deep_us = sum(deepcopy_ns.values()) / total / 1000
+    clone_us = sum(clone_ns.values()) / total / 1000
+    print(f"{'All':<24}{total:>10}{deep_us:>14.2f}{clone_us:>12.2f}{deep_us / clone_us:>9.1f}x")
+
+    for prototype in mismatches:
+        print(f"Clone differs from deepcopy: {prototype!r}")
+    return not mismatches and clone_us < deep_us
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROUNDS
+    sys.exit(0 if benchmark_animation_clone(rounds) else 1)
@@ -0,0 +1,109 @@
+"""Measure the frame hitch of switching branches, with the sort of every note left in
+the chart that Player.merge_branch_section used to do against the merge of the
+branch into the remaining notes.
+
+A synthetic chart with a branch every third measure is played headless by autoplay
+with both players. Every merge call is timed, along with the frame it ran in, and
+the judgements of both plays are printed. The old merge rebuilt the note queues
+from the chart, bringing back notes judged in the last TIMING_BAD milliseconds and
+dropping a drumroll that had already started, so its judgements are expected to
+differ.
+
+Usage:
+    python -m benchmarks.branch_merge [number of branches] [rounds]
+
+Defaults to 50 branches and 3 rounds.
+"""
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+from benchmarks.headless import HeadlessPlayer, Simulation
+from benchmarks.judgement import make_branched_chart
+from scenes.game import Player
+
+DEFAULT_BRANCHES = 50
+DEFAULT_ROUNDS = 3
+
+class TimedPlayer(HeadlessPlayer):
+    """Records the time of every merge_branch_section call and the frame it ran in."""
+    def __init__(self, *args, hits):
+        super().__init__(*args, hits=hits)
+        self.frame = 0
+        self.merges: list[tuple[int, int]] = []
+
+    def update(self, ms_from_start, current_time, background):
+        super().update(ms_from_start, current_time, background)
+        self.frame += 1
+
+    def merge_branch_section(self, branch_section, current_ms):
+        start = time.perf_counter_ns()
+        super().merge_branch_section(branch_section, current_ms)
+        self.merges.append((self.frame, time.perf_counter_ns() - start))
+
+class SortingPlayer(TimedPlayer):
+    """Merges branches by sorting the whole chart again, as Player did before."""
+    def __init__(self, *args, hits):
+        super().__init__(*args, hits=hits)
+        self.play_notes = deque(sorted([*self.don_notes, *self.kat_notes, *self.other_notes]))
+
+    def merge_branch_section(self, branch_section, current_ms):
+        start = time.perf_counter_ns()
+        self.play_notes.extend(branch_section.play_notes)
+        self.draw_note_list.extend(branch_section.draw_notes)
+        self.draw_bar_list.extend(branch_section.bars)
+        self.play_notes = deque(sorted(self.play_notes))
+        self.draw_note_list = deque(sorted(self.draw_note_list, key=lambda x: x.load_ms))
+        self.draw_bar_list = deque(sorted(self.draw_bar_list, key=lambda x: x.load_ms))
+        timing_threshold = current_ms - Player.TIMING_BAD
+        total_don = [note for note in self.play_notes if note.type in {1, 3}]
+        total_kat = [note for note in self.play_notes if note.type in {2, 4}]
+        total_other = [note for note in self.play_notes if note.type not in {1, 2, 3, 4}]
+
+        self.don_notes = deque([note for note in total_don if note.hit_ms > timing_threshold])
+        self.kat_notes = deque([note for note in total_kat if note.hit_ms > timing_threshold])
+        self.other_notes = deque([note for note in total_other if note.hit_ms > timing_threshold])
+        self.merges.append((self.frame, time.perf_counter_ns() - start))
+
+def measure(tja_path: Path, player_class: type[TimedPlayer], rounds: int) -> tuple[list[int], list[int], tuple]:
+    """Play the chart and return the merge times, the times of the frames with a merge, and the judgements."""
+    merge_ns = []
+    hitch_ns = []
+    judgements = None
+    for _ in range(rounds):
+        simulation = Simulation(tja_path, 3, player_class=player_class)
+        result = simulation.run()
+        merges = simulation.player.merges
+        merge_ns += [ns for _, ns in merges]
+        hitch_ns += [result.frame_ns[frame] for frame, _ in merges]
+        judgements = result.judgements
+    return merge_ns, hitch_ns, judgements
+
+def benchmark_branch_merge(branch_count: int, rounds: int) -> bool:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tja_path = Path(temp_dir) / "synthetic_branches.tja"
+        tja_path.write_text(make_branched_chart(branch_count), encoding='utf-8')
+        results = {name: measure(tja_path, player_class, rounds)
+                   for name, player_class in (('sort', SortingPlayer), ('merge', TimedPlayer))}
+    print(f"{branch_count} branches, {rounds} rounds (times in us)")
+    print(f"{'':<6} {'merges':>7} {'merge mean':>11} {'merge max':>10} {'frame mean':>11} {'frame max':>10}  judgements")
+    for name, (merge_ns, hitch_ns, judgements) in results.items():
+        if not merge_ns:
+            print(f"{name}: no branch was merged")
+            return False
+        print(f"{name:<6} {len(merge_ns):>7} {statistics.fmean(merge_ns) / 1000:>11.1f} {max(merge_ns) / 1000:>10.1f}"
+              f" {statistics.fmean(hitch_ns) / 1000:>11.1f} {max(hitch_ns) / 1000:>10.1f}  {judgements}")
+    _, _, judgements = results['merge']
+    _, good, ok, bad, _, max_combo = judgements
+    if ok or bad or max_combo != good:
+        print(f"Autoplay judged {good} good, {ok} ok, {bad} bad with max combo {max_combo}")
+        return False
+    return True
+
+if __name__ == "__main__":
+    branch_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BRANCHES
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROUNDS
+    sys.exit(0 if benchmark_branch_merge(branch_count, rounds) else 1)
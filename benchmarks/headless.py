@@ -0,0 +1,316 @@
+"""Play a chart through the game's judgement engine without a window or an audio device.
+
+install_headless() swaps every raylib call that needs a window or the GPU for a
+no-op returning an empty value of the right type, and replaces the audio engine
+with one that plays nothing. It has to run before the scenes are imported.
+
+A Simulation drives Player.update from a virtual clock that advances one fixed
+frame at a time, and hits the drum from a scripted input timeline instead of the
+keyboard. The same chart and timeline always give the same judgements, so the
+result can be compared between runs and the per-frame CPU time can be measured.
+
+Usage:
+    python -m benchmarks.headless path/to/song.tja [difficulty] [auto|script|replay.json]
+
+Plays the chart once and prints the judgements and frame times. The default
+timeline is a scripted player whose hits are spread around every note with a
+fixed seed. A replay is a JSON list of [ms, "DON" or "KAT", "L" or "R"] hits,
+or a JSON dump of Player.input_log.
+"""
+import json
+import random
+import statistics
+import sys
+import time
+import types
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pyray as ray
+import raylib
+
+from libs import animation, utils
+from libs.animation import rounded
+from libs.global_data import global_data
+
+FRAME_MS = 1000 / 60
+# Hits are spread around each note with this standard deviation in milliseconds,
+# enough for a mix of GOOD, OK and BAD judgements
+SCRIPT_SPREAD_MS = 20
+# Drumrolls are hit at 20 hits per second
+SCRIPT_ROLL_INTERVAL_MS = 50
+# Time played after the last note, so rolls and branch decisions at the end resolve
+END_PADDING_MS = 2000
+# raylib functions with these prefixes need a window, a GPU context or load files
+# that are only read to be drawn
+_STUBBED_PREFIXES = ('begin_', 'end_', 'draw_', 'clear_background', 'load_', 'unload_', 'update_texture',
+                     'gen_texture', 'gen_image', 'image_', 'export_', 'measure_text', 'set_shader', 'set_texture',
+                     'get_shader_location', 'rl_')
+
+Hit = tuple[float, str, str]
+
+def _c_name(name: str) -> str:
+    if name.startswith('rl_'):
+        return 'rl' + ''.join(part.capitalize() for part in name[3:].split('_'))
+    return ''.join(part.capitalize() for part in name.split('_'))
+
+def _make_stub(name: str):
+    """Build a no-op for a raylib function that returns an empty value of its return type."""
+    c_function = getattr(raylib.rl, _c_name(name), None)
+    result = ray.ffi.typeof(c_function).result if c_function is not None else None
+    if result is not None and result.kind == 'struct':
+        return lambda *args: ray.ffi.new(f"{result.cname} *")[0]
+    if result is not None and result.kind == 'pointer':
+        return lambda *args: ray.ffi.NULL
+    if result is not None and result.kind == 'primitive':
+        return lambda *args: 0
+    return lambda *args: None
+
+class VirtualClock:
+    """A clock that only moves when it is told to, read by animations in place of the wall clock."""
+    def __init__(self):
+        self.ms = 0.0
+
+    def get_current_ms(self) -> int:
+        return rounded(self.ms)
+
+clock = VirtualClock()
+
+class HeadlessAudio:
+    """Stands in for the AudioEngine. Sounds load and play instantly and are never heard.
+
+    Loading returns the name the sound was loaded under, queries return zero or
+    False and everything else does nothing.
+    """
+    def __getattr__(self, name: str):
+        if name in {'load_sound', 'load_music_stream'}:
+            return lambda file_path, sound_name: sound_name
+        if name.startswith('is_'):
+            return lambda *args: False
+        if name.startswith('get_'):
+            return lambda *args: 0.0
+        return lambda *args, **kwargs: None
+
+def install_headless():
+    """Replace the window, GPU and audio calls with no-ops and load the game's configuration and textures."""
+    if 'scenes.game' in sys.modules:
+        raise Exception("install_headless must run before the scenes are imported")
+    audio_module = types.ModuleType('libs.audio')
+    audio_module.audio = HeadlessAudio() # type: ignore
+    sys.modules['libs.audio'] = audio_module
+    animation.get_current_ms = clock.get_current_ms
+    utils.get_current_ms = clock.get_current_ms
+    for name in dir(ray):
+        if name.startswith(_STUBBED_PREFIXES) and callable(getattr(ray, name)):
+            setattr(ray, name, _make_stub(name))
+
+    # Texture tables are loaded the same way as at startup, only the upload is skipped
+    from libs import texture
+    from libs.texture import tex
+    texture.draw_texture_pro_c = _make_stub('draw_texture_pro')
+    from libs.utils import global_tex
+    global_data.config = utils.get_config()
+    global_tex.load_screen_textures('global')
+    for chara in ('chara_0', 'chara_1'):
+        if (global_tex.graphics_path / 'chara' / chara).with_suffix('.zip').exists():
+            global_tex.load_zip('chara', chara)
+    tex.load_screen_textures('game')
+
+install_headless()
+
+from libs.global_data import Modifiers
+from libs.tja import NoteList, TJAParser
+from libs.profiler import profiler
+from libs.texture import SCREEN_WIDTH
+from libs.utils import global_tex
+from scenes import game
+from scenes.game import GameScreen, Player
+
+class _NoChara:
+    """Stands in for Chara2D when the skin has no character textures. The character only animates."""
+    def __init__(self, index: int, bpm: float):
+        pass
+
+    def set_animation(self, name: str):
+        pass
+
+    def update(self, current_time_ms: float, bpm: float, is_clear: bool, is_rainbow: bool):
+        pass
+
+if 'chara_0' not in global_tex.textures:
+    game.Chara2D = _NoChara
+
+class HeadlessPlayer(Player):
+    """A Player whose drum is hit by a timeline of (ms, 'DON' or 'KAT', 'L' or 'R') hits.
+
+    Every hit that is due by the current frame is judged at the frame's time,
+    the same as a key press read by handle_input on that frame.
+    """
+    def __init__(self, *args, hits: list[Hit]):
+        super().__init__(*args)
+        self.hits = sorted(hits, key=lambda hit: hit[0])
+        self.hit_index = 0
+
+    def handle_input(self, ms_from_start, current_time, background):
+        while self.hit_index < len(self.hits) and self.hits[self.hit_index][0] <= ms_from_start:
+            _, note_type, side = self.hits[self.hit_index]
+            self.hit_index += 1
+            self.hit(note_type, side, f'hitsound_{note_type.lower()}_{self.player_number}p',
+                     ms_from_start, current_time, background)
+
+@dataclass
+class SimulationResult:
+    """The judgements of a simulated play and the CPU time of every frame.
+
+    Attributes:
+        score (int): The final score.
+        good (int): The number of GOOD judgements.
+        ok (int): The number of OK judgements.
+        bad (int): The number of BAD judgements, including missed notes.
+        drumroll (int): The number of drumroll and balloon hits.
+        max_combo (int): The highest combo reached.
+        frame_ns (list[int]): The CPU time of each Player.update call in nanoseconds.
+        sections (dict[str, float]): The total time in seconds of each profiled section.
+    """
+    score: int
+    good: int
+    ok: int
+    bad: int
+    drumroll: int
+    max_combo: int
+    frame_ns: list[int] = field(repr=False)
+    sections: dict[str, float] = field(repr=False)
+
+    @property
+    def judgements(self) -> tuple[int, int, int, int, int, int]:
+        return self.score, self.good, self.ok, self.bad, self.drumroll, self.max_combo
+
+def script_hits(notes: NoteList, branches: list[NoteList], seed: int = 0) -> list[Hit]:
+    """Build a timeline that plays every note of a chart, with hit times spread by a seeded random offset.
+
+    Args:
+        notes (NoteList): The notes outside of branches.
+        branches (list[NoteList]): The branch sections to play, normally one of the
+            master, expert or normal lists. The player is not forced onto them, notes
+            of a branch that is not taken are hit like empty lane.
+        seed (int): The seed of the hit offsets.
+    """
+    rng = random.Random(seed)
+    play_notes = list(notes.play_notes)
+    for section in branches:
+        play_notes.extend(section.play_notes)
+    play_notes.sort(key=lambda note: note.hit_ms)
+    hits: list[Hit] = []
+    side = 'L'
+    for i, note in enumerate(play_notes):
+        if note.type in {1, 2, 3, 4}:
+            side = 'R' if side == 'L' else 'L'
+            hits.append((note.hit_ms + rng.gauss(0, SCRIPT_SPREAD_MS), 'DON' if note.type in {1, 3} else 'KAT', side))
+        elif note.type in {5, 6, 7, 9}:
+            tail = next((tail for tail in play_notes[i + 1:] if tail.type == 8), None)
+            if tail is None:
+                continue
+            ms = note.hit_ms + rng.uniform(0, SCRIPT_ROLL_INTERVAL_MS)
+            while ms < tail.hit_ms:
+                side = 'R' if side == 'L' else 'L'
+                hits.append((ms, 'DON', side))
+                ms += SCRIPT_ROLL_INTERVAL_MS
+    return hits
+
+def load_chart(tja_path: Path) -> TJAParser:
+    """Open a chart with the start delay and note distance GameScreen uses."""
+    return TJAParser(tja_path, start_delay=GameScreen().start_delay, distance=SCREEN_WIDTH - GameScreen.JUDGE_X)
+
+def load_replay(path: Path) -> list[Hit]:
+    """Read a timeline from a JSON list of [ms, note type, side], or an object of
+    {ms: [note type, side]} as Player.input_log is dumped."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return [(float(ms), note_type, side) for ms, (note_type, side) in data.items()]
+    return [(float(ms), note_type, side) for ms, note_type, side in data]
+
+class Simulation:
+    """Plays one difficulty of a chart on a virtual clock.
+
+    The clock starts where GameScreen's does, at the song offset, and advances
+    frame_ms per frame until the last note has passed.
+
+    Args:
+        tja_path (Path): The chart to play.
+        difficulty (int): The difficulty to play.
+        hits (list[Hit], optional): The timeline of drum hits, or None to let autoplay
+            hit every note.
+        frame_ms (float): The length of a frame of the virtual clock in milliseconds.
+        player_class (type[HeadlessPlayer]): The player to simulate, a subclass can
+            replace part of Player to compare it with the original.
+    """
+    def __init__(self, tja_path: Path, difficulty: int, hits: list[Hit] | None = None, frame_ms: float = FRAME_MS,
+                 player_class: type[HeadlessPlayer] = HeadlessPlayer):
+        self.tja = load_chart(tja_path)
+        self.start_ms = self.tja.metadata.offset * 1000
+        clock.ms = self.start_ms
+        modifiers = Modifiers(auto=hits is None)
+        self.player = player_class(self.tja, 1, difficulty, False, modifiers, hits=hits or [])
+        self.frame_ms = frame_ms
+
+    def run(self) -> SimulationResult:
+        """Play the chart to the end and return the judgements and frame times."""
+        player = self.player
+        end_ms = player.end_time + END_PADDING_MS
+        frame_ns = []
+        sections: dict[str, float] = dict()
+        was_enabled = profiler.enabled
+        if not was_enabled:
+            profiler.toggle()
+        frame = 0
+        ms_from_start = self.start_ms
+        while ms_from_start <= end_ms:
+            ms_from_start = self.start_ms + frame * self.frame_ms
+            clock.ms = ms_from_start
+            profiler.begin_frame()
+            start = time.perf_counter_ns()
+            player.update(ms_from_start, ms_from_start, None)
+            frame_ns.append(time.perf_counter_ns() - start)
+            for name, total in profiler.totals.items():
+                sections[name] = sections.get(name, 0.0) + total
+            frame += 1
+        if not was_enabled:
+            profiler.toggle()
+        return SimulationResult(player.score, player.good_count, player.ok_count, player.bad_count,
+                                player.total_drumroll, player.max_combo, frame_ns, sections)
+
+def frame_stats(frame_ns: list[int]) -> tuple[float, float, float, float]:
+    """Return the mean, p50, p99 and max of frame times in microseconds."""
+    ordered = sorted(frame_ns)
+    count = len(ordered)
+    return (statistics.fmean(ordered) / 1000, ordered[count // 2] / 1000,
+            ordered[min(count - 1, count * 99 // 100)] / 1000, ordered[-1] / 1000)
+
+def main(args: list[str]) -> int:
+    if not args:
+        print(__doc__)
+        return 1
+    tja_path = Path(args[0])
+    tja = load_chart(tja_path)
+    difficulty = int(args[1]) if len(args) > 1 else max(tja.metadata.course_data)
+    timeline = args[2] if len(args) > 2 else 'script'
+    if timeline == 'auto':
+        hits = None
+    elif timeline == 'script':
+        notes, branch_m, _, _ = tja.notes_to_position(difficulty)
+        hits = script_hits(notes, branch_m)
+    else:
+        hits = load_replay(Path(timeline))
+    result = Simulation(tja_path, difficulty, hits).run()
+    mean, p50, p99, max_us = frame_stats(result.frame_ns)
+    print(f"{tja_path} difficulty {difficulty}, {timeline} timeline")
+    print(f"score {result.score} good {result.good} ok {result.ok} bad {result.bad} "
+          f"drumroll {result.drumroll} max combo {result.max_combo}")
+    print(f"{len(result.frame_ns)} frames: mean {mean:.1f} p50 {p50:.1f} p99 {p99:.1f} max {max_us:.1f} us")
+    for name, total in result.sections.items():
+        print(f"  {name} {total * 1e6 / len(result.frame_ns):.1f} us per frame")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+"""Benchmark the judgement engine by playing charts headless, the way pytest-benchmark
+times a test: every case runs several rounds and the table shows the spread.
+
+Each difficulty of each chart is played twice, once by autoplay and once by the
+seeded script of benchmarks.headless, which plays the master branch. A synthetic
+chart with a branch every few measures is always included, alternating accuracy
+and drumroll conditions, so evaluate_branch and the branch merge are measured even
+when Songs/ has no branched charts.
+
+The run fails if autoplay misses a note or if two rounds of a case end with
+different judgements. With --compare it also fails when a case got slower than
+the saved run by more than the threshold, or its judgements changed.
+
+Usage:
+    python -m benchmarks.judgement [--rounds N] [--save results.json]
+        [--compare results.json] [--threshold 0.1] [path to .tja or folder ...]
+
+Defaults to every chart under Songs/ and 5 rounds.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.headless import Simulation, load_chart, script_hits
+
+SYNTHETIC_BRANCHES = 12
+DEFAULT_ROUNDS = 5
+DEFAULT_THRESHOLD = 0.1
+
+def make_branched_chart(branch_count: int, seed: int = 0) -> str:
+    """Write a chart with a #BRANCHSTART every third measure, alternating 'p' and 'r' conditions.
+
+    Branches are decided before the measure that leads into them, so each branch
+    point has a drumroll two measures before it for drumroll conditions to count.
+    """
+    rng = random.Random(seed)
+
+    def measure(density: int, kinds: str = '1122') -> str:
+        return ''.join(rng.choice(kinds) if rng.random() < density / 16 else '0' for _ in range(16)) + ','
+
+    lines = ["TITLE:Synthetic branches", "BPM:160", "OFFSET:-1.0", "",
+             "COURSE:Oni", "LEVEL:10", "BALLOON:" + ','.join(['6'] * branch_count), "", "#START"]
+    for branch in range(branch_count):
+        lines.append("1020102050000008,")
+        lines.append(measure(8))
+        if branch % 2 == 0:
+            lines.append("#BRANCHSTART p,60,85")
+        else:
+            lines.append("#BRANCHSTART r,4,8")
+        for level, density, kinds in (('#N', 4, '12'), ('#E', 8, '1122'), ('#M', 14, '11223344')):
+            lines.append(level)
+            lines.append(measure(density, kinds))
+            lines.append(measure(density, kinds) if branch % 3 else "7000000000800000,")
+        lines.append("#BRANCHEND")
+    lines += [measure(8), "#END", ""]
+    return '\n'.join(lines)
+
+def run_case(tja_path: Path, difficulty: int, timeline: str, rounds: int) -> dict:
+    """Play one case for several rounds and return its timings and judgements."""
+    hits = None
+    if timeline == 'script':
+        notes, branch_m, _, _ = load_chart(tja_path).notes_to_position(difficulty)
+        hits = script_hits(notes, branch_m)
+    times = []
+    frame_means = []
+    frame_p99s = []
+    sections: dict[str, float] = dict()
+    judgements = set()
+    frames = 0
+    for _ in range(rounds):
+        simulation = Simulation(tja_path, difficulty, hits)
+        start = time.perf_counter()
+        result = simulation.run()
+        times.append(time.perf_counter() - start)
+        judgements.add(result.judgements)
+        frames = len(result.frame_ns)
+        ordered = sorted(result.frame_ns)
+        frame_means.append(statistics.fmean(ordered) / 1000)
+        frame_p99s.append(ordered[min(frames - 1, frames * 99 // 100)] / 1000)
+        for name, total in result.sections.items():
+            sections[name] = sections.get(name, 0.0) + total / rounds
+    return {
+        'min': min(times), 'max': max(times), 'mean': statistics.fmean(times),
+        'stddev': statistics.stdev(times) if rounds > 1 else 0.0, 'median': statistics.median(times),
+        'frames': frames, 'frame_mean_us': statistics.median(frame_means), 'frame_p99_us': statistics.median(frame_p99s),
+        'sections_us': {name: total * 1e6 / frames for name, total in sections.items()},
+        'judgements': [list(j) for j in sorted(judgements)],
+    }
+
+def check_case(name: str, timeline: str, case: dict) -> list[str]:
+    errors = []
+    if len(case['judgements']) > 1:
+        errors.append(f"{name}: rounds ended with different judgements {case['judgements']}")
+    if timeline == 'auto':
+        for score, good, ok, bad, drumroll, max_combo in case['judgements']:
+            if ok or bad or max_combo != good:
+                errors.append(f"{name}: autoplay judged {good} good, {ok} ok, {bad} bad with max combo {max_combo}")
+    return errors
+
+def compare_case(name: str, case: dict, saved: dict, threshold: float) -> list[str]:
+    errors = []
+    if case['judgements'] != saved['judgements']:
+        errors.append(f"{name}: judgements changed from {saved['judgements']} to {case['judgements']}")
+    if case['median'] > saved['median'] * (1 + threshold):
+        errors.append(f"{name}: median {case['median'] * 1000:.1f} ms is "
+                      f"{(case['median'] / saved['median'] - 1) * 100:.0f}% slower than {saved['median'] * 1000:.1f} ms")
+    return errors
+
+def print_table(results: dict[str, dict]):
+    section_names = sorted({name for case in results.values() for name in case['sections_us']})
+    name_width = max(len(name) for name in results)
+    header = (f"{'Name (time in ms)':<{name_width}} {'Min':>8} {'Max':>8} {'Mean':>8} {'StdDev':>8} {'Median':>8}"
+              f" {'Frames':>7} {'us/frame':>9} {'p99 us':>8}" + ''.join(f" {name:>15}" for name in section_names))
+    print(header)
+    print('-' * len(header))
+    for name, case in results.items():
+        print(f"{name:<{name_width}} {case['min'] * 1000:>8.1f} {case['max'] * 1000:>8.1f} {case['mean'] * 1000:>8.1f}"
+              f" {case['stddev'] * 1000:>8.2f} {case['median'] * 1000:>8.1f} {case['frames']:>7}"
+              f" {case['frame_mean_us']:>9.1f} {case['frame_p99_us']:>8.1f}"
+              + ''.join(f" {case['sections_us'].get(section, 0.0):>15.2f}" for section in section_names))
+    print("Section columns are microseconds per frame")
+
+def benchmark_judgement(tja_paths: list[Path], rounds: int, save: Path | None, compare: Path | None, threshold: float) -> bool:
+    results: dict[str, dict] = dict()
+    errors = []
+    for tja_path in tja_paths:
+        try:
+            difficulties = sorted(load_chart(tja_path).metadata.course_data)
+        except Exception as e:
+            print(f"Skipping {tja_path}: {e}")
+            continue
+        for difficulty in difficulties:
+            for timeline in ('auto', 'script'):
+                name = f"{tja_path.stem}[{difficulty}-{timeline}]"
+                case = run_case(tja_path, difficulty, timeline, rounds)
+                errors += check_case(name, timeline, case)
+                results[name] = case
+    print_table(results)
+    if compare is not None:
+        with open(compare, encoding='utf-8') as f:
+            saved_results = json.load(f)
+        for name, case in results.items():
+            if name in saved_results:
+                errors += compare_case(name, case, saved_results[name], threshold)
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {save}")
+    for error in errors:
+        print(error)
+    return not errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the judgement engine on headless plays")
+    parser.add_argument('paths', nargs='*', type=Path)
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument('--save', type=Path)
+    parser.add_argument('--compare', type=Path)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    paths = []
+    for root in args.paths or [Path("Songs")]:
+        paths += sorted(root.rglob("*.tja")) if root.is_dir() else [root]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        synthetic = Path(temp_dir) / "synthetic_branches.tja"
+        synthetic.write_text(make_branched_chart(SYNTHETIC_BRANCHES), encoding='utf-8')
+        passed = benchmark_judgement(paths + [synthetic], args.rounds, args.save, args.compare, args.threshold)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,70 @@
+"""Measure drawing the note lane with one tex.draw_texture call per note and moji,
+as Player.draw_notes did before, against queuing them in a SpriteBatch.
+
+A hidden window is opened and the game textures are loaded. For every visible
+note count, a lane of alternating don and kat notes with their moji is drawn
+both ways, and the CPU time spent submitting the draws is measured. The GPU
+work is the same for both, raylib batches the quads either way.
+
+Usage:
+    python -m benchmarks.note_draw [frames]
+
+Defaults to 300 frames per note count, the median frame is reported.
+"""
+import statistics
+import sys
+import time
+
+import pyray as ray
+
+from libs.texture import SpriteBatch, tex
+
+DEFAULT_FRAMES = 300
+NOTE_COUNTS = (25, 50, 100, 200, 400)
+
+def lane(note_count: int) -> list[tuple[str, int, float, float]]:
+    """Return the (note type, moji, x, y) of notes spread over the lane."""
+    spacing = 1280 / note_count
+    return [(str(1 + i % 2), i % 2, 1280 - i * spacing, 0) for i in range(note_count)]
+
+def draw_one_by_one(notes: list[tuple[str, int, float, float]], eighth: int):
+    for note_type, moji, x, y in notes:
+        tex.draw_texture('notes', note_type, frame=eighth % 2, x=x, y=y+192, center=True)
+        tex.draw_texture('notes', 'moji', frame=moji, x=x - (168//2) + 64, y=323 + y)
+
+def draw_batched(batch: SpriteBatch, notes: list[tuple[str, int, float, float]], eighth: int):
+    for note_type, moji, x, y in notes:
+        batch.add(note_type, eighth % 2, x, y+192)
+        batch.add('moji', moji, x - (168//2) + 64, 323 + y)
+    batch.flush()
+
+def time_frames(frames: int, draw) -> float:
+    """Return the median milliseconds spent in draw over a number of frames."""
+    times = []
+    for frame in range(frames):
+        ray.begin_drawing()
+        ray.clear_background(ray.BLACK)
+        start = time.perf_counter()
+        draw(frame)
+        times.append((time.perf_counter() - start) * 1000)
+        ray.end_drawing()
+    return statistics.median(times)
+
+def benchmark_note_draw(frames: int):
+    ray.set_trace_log_level(ray.TraceLogLevel.LOG_WARNING)
+    ray.set_config_flags(ray.ConfigFlags.FLAG_WINDOW_HIDDEN)
+    ray.init_window(1280, 720, "note_draw")
+    tex.load_screen_textures('game')
+    batch = SpriteBatch(tex, 'notes')
+    print(f"{'Notes':>6}{'Draws':>7}{'draw_texture ms':>17}{'SpriteBatch ms':>16}{'Speedup':>9}")
+    print('-' * 55)
+    for note_count in NOTE_COUNTS:
+        notes = lane(note_count)
+        one_by_one = time_frames(frames, lambda frame: draw_one_by_one(notes, frame))
+        batched = time_frames(frames, lambda frame: draw_batched(batch, notes, frame))
+        print(f"{note_count:>6}{note_count * 2:>7}{one_by_one:>17.3f}{batched:>16.3f}{one_by_one / batched:>8.1f}x")
+    tex.unload_textures()
+    ray.close_window()
+
+if __name__ == "__main__":
+    benchmark_note_draw(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FRAMES)
@@ -0,0 +1,113 @@
+"""Compare the memory held by positioned charts using the slotted note classes
+against the dict-backed note classes they replaced.
+
+Usage:
+    python -m benchmarks.note_memory [path to .tja or folder ...]
+
+Defaults to every chart under Songs/.
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from libs.tja import Balloon, Drumroll, Note, NoteList, TJAParser
+
+
+@dataclass
+class LegacyNote:
+    """The previous, dict-backed Note layout."""
+    type: int = field(init=False)
+    hit_ms: float = field(init=False)
+    load_ms: float = field(init=False)
+    pixels_per_frame_x: float = field(init=False)
+    pixels_per_frame_y: float = field(init=False)
+    display: bool = field(init=False)
+    index: int = field(init=False)
+    bpm: float = field(init=False)
+    gogo_time: bool = field(init=False)
+    moji: int = field(init=False)
+    is_branch_start: bool = field(init=False)
+    branch_params: str = field(init=False)
+
+@dataclass
+class LegacyDrumroll(LegacyNote):
+    """The previous Drumroll layout, which kept its source note alive."""
+    _source_note: LegacyNote
+    color: int = field(init=False)
+
+    def __post_init__(self):
+        self.__dict__.update(self._source_note.__dict__)
+
+@dataclass
+class LegacyBalloon(LegacyNote):
+    """The previous Balloon layout, which kept its source note alive."""
+    _source_note: LegacyNote
+    count: int = field(init=False)
+    popped: bool = False
+    is_kusudama: bool = False
+
+    def __post_init__(self):
+        self.__dict__.update(self._source_note.__dict__)
+
+def to_legacy(note: Note) -> LegacyNote:
+    legacy = LegacyNote()
+    for field_name in Note.__slots__:
+        if hasattr(note, field_name):
+            setattr(legacy, field_name, getattr(note, field_name))
+    if isinstance(note, Drumroll):
+        legacy = LegacyDrumroll(legacy)
+        legacy.color = note.color
+    elif isinstance(note, Balloon):
+        legacy = LegacyBalloon(legacy, popped=note.popped, is_kusudama=note.is_kusudama)
+        legacy.count = note.count
+    return legacy
+
+def to_legacy_note_list(notes: NoteList) -> NoteList:
+    # draw_notes shares its objects with play_notes, keep it that way
+    converted = {id(note): to_legacy(note) for note in notes.play_notes}
+    return NoteList(play_notes=[converted[id(note)] for note in notes.play_notes],
+                    draw_notes=[converted[id(note)] for note in notes.draw_notes],
+                    bars=[to_legacy(bar) for bar in notes.bars])
+
+def retained_memory(build) -> int:
+    """Return the number of bytes still allocated by build() once it returns."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def benchmark_note_memory(tja_paths: list[Path]):
+    total_slotted = total_legacy = total_notes = 0
+    for tja_path in tja_paths:
+        for diff in TJAParser(tja_path, metadata_only=True).metadata.course_data:
+            # The parsers are created up front so only the positioned notes are measured
+            slotted_parser = TJAParser(tja_path)
+            legacy_parser = TJAParser(tja_path)
+            master_notes, branch_m, branch_e, branch_n = TJAParser(tja_path).notes_to_position(diff)
+            sections = [master_notes] + branch_m + branch_e + branch_n
+
+            slotted = retained_memory(lambda: slotted_parser.notes_to_position(diff))
+            legacy = retained_memory(lambda: [to_legacy_note_list(section) for chart in [legacy_parser.notes_to_position(diff)]
+                                              for section in [chart[0]] + chart[1] + chart[2] + chart[3]])
+            note_count = sum(len(section.play_notes) + len(section.bars) for section in sections)
+            total_slotted += slotted
+            total_legacy += legacy
+            total_notes += note_count
+            print(f"{tja_path.name} [{TJAParser.DIFFS.get(diff, diff)}] {note_count} notes: "
+                  f"slotted {slotted / 1024:.1f} KiB, dict-backed {legacy / 1024:.1f} KiB")
+    if total_notes == 0:
+        print("No charts found")
+        return
+    print(f"Total {total_notes} notes: slotted {total_slotted / 1024:.1f} KiB "
+          f"({total_slotted / total_notes:.0f} B/note), dict-backed {total_legacy / 1024:.1f} KiB "
+          f"({total_legacy / total_notes:.0f} B/note), {1 - total_slotted / total_legacy:.0%} less")
+
+if __name__ == "__main__":
+    roots = [Path(arg) for arg in sys.argv[1:]] or [Path("Songs")]
+    paths = []
+    for root in roots:
+        paths.extend([root] if root.is_file() else sorted(root.rglob("*.tja")))
+    benchmark_note_memory(paths)
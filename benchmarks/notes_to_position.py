@@ -0,0 +1,497 @@
+"""Check the vectorized note positioning against the per-note parser it replaced and
+time both.
+
+Every field of every note, bar and draw list is compared, so the check fails on any
+difference in timing, scroll speed, moji or ordering. The benchmark positions the
+longest chart found.
+
+Usage:
+    python -m benchmarks.notes_to_position [path to .tja or folder ...]
+
+Defaults to every chart under Songs/.
+"""
+import bisect
+import sys
+import time
+from dataclasses import fields
+from pathlib import Path
+
+from libs.tja import (Balloon, Drumroll, Note, NoteList, TJAParser,
+                      deserialize_chart, get_ms_per_measure, get_pixels_per_ms,
+                      serialize_chart)
+from libs.utils import get_pixels_per_frame
+
+BENCHMARK_ROUNDS = 20
+
+def legacy_get_moji(play_note_list: list[Note], ms_per_measure: float) -> None:
+    """
+    Assign 口唱歌 (note phoneticization) to notes.
+
+    Args:
+        play_note_list (list[Note]): The list of notes to process.
+        ms_per_measure (float): The duration of a measure in milliseconds.
+
+    Returns:
+        None
+    """
+    se_notes = {
+        1: [0, 1, 2],  # Note '1' has three possible sound effects
+        2: [3, 4],     # Note '2' has two possible sound effects
+        3: 5,
+        4: 6,
+        5: 7,
+        6: 8,
+        7: 9,
+        8: 10,
+        9: 11
+    }
+
+    if len(play_note_list) <= 1:
+        return
+
+    current_note = play_note_list[-1]
+    if current_note.type in {1, 2}:
+        current_note.moji = se_notes[current_note.type][0]
+    else:
+        current_note.moji = se_notes[current_note.type]
+
+    prev_note = play_note_list[-2]
+
+    if prev_note.type in {1, 2}:
+        timing_threshold = ms_per_measure / 8 - 1
+        if current_note.hit_ms - prev_note.hit_ms <= timing_threshold:
+            prev_note.moji = se_notes[prev_note.type][1]
+        else:
+            prev_note.moji = se_notes[prev_note.type][0]
+    else:
+        prev_note.moji = se_notes[prev_note.type]
+
+    if len(play_note_list) > 3:
+        notes_minus_4 = play_note_list[-4]
+        notes_minus_3 = play_note_list[-3]
+        notes_minus_2 = play_note_list[-2]
+
+        consecutive_ones = (
+            notes_minus_4.type == 1 and
+            notes_minus_3.type == 1 and
+            notes_minus_2.type == 1
+        )
+
+        if consecutive_ones:
+            rapid_timing = (
+                notes_minus_3.hit_ms - notes_minus_4.hit_ms < (ms_per_measure / 8) and
+                notes_minus_2.hit_ms - notes_minus_3.hit_ms < (ms_per_measure / 8)
+            )
+
+            if rapid_timing:
+                if len(play_note_list) > 5:
+                    spacing_before = play_note_list[-4].hit_ms - play_note_list[-5].hit_ms >= (ms_per_measure / 8)
+                    spacing_after = play_note_list[-1].hit_ms - play_note_list[-2].hit_ms >= (ms_per_measure / 8)
+
+                    if spacing_before and spacing_after:
+                        play_note_list[-3].moji = se_notes[1][2]
+                else:
+                    play_note_list[-3].moji = se_notes[1][2]
+
+def legacy_parse_notes(parser: TJAParser, diff: int):
+    master_notes = NoteList()
+    branch_m: list[NoteList] = []
+    branch_e: list[NoteList] = []
+    branch_n: list[NoteList] = []
+    notes = parser.data_to_notes(diff)
+    balloon = parser.metadata.course_data[diff].balloon.copy()
+    count = 0
+    index = 0
+    time_signature = 4/4
+    bpm = parser.metadata.bpm
+    x_scroll_modifier = 1
+    y_scroll_modifier = 0
+    barline_display = True
+    gogo_time = False
+    curr_note_list = master_notes.play_notes
+    curr_draw_list = master_notes.draw_notes
+    curr_bar_list = master_notes.bars
+    start_branch_ms = 0
+    start_branch_bpm = bpm
+    start_branch_time_sig = time_signature
+    start_branch_x_scroll = x_scroll_modifier
+    start_branch_y_scroll = y_scroll_modifier
+    start_branch_barline = barline_display
+    start_branch_gogo = gogo_time
+    branch_balloon_count = 0
+    is_branching = False
+    for bar in notes:
+        #Length of the bar is determined by number of notes excluding commands
+        bar_length = sum(len(part) for part in bar if '#' not in part)
+        barline_added = False
+        for part in bar:
+            if part.startswith('#BRANCHSTART'):
+                start_branch_ms = parser.current_ms
+                start_branch_bpm = bpm
+                start_branch_time_sig = time_signature
+                start_branch_x_scroll = x_scroll_modifier
+                start_branch_y_scroll = y_scroll_modifier
+                start_branch_barline = barline_display
+                start_branch_gogo = gogo_time
+                branch_balloon_count = count
+                branch_params = part[13:]
+
+                if branch_params[0] == 'r':
+                    # Helper function to find and set drumroll branch params
+                    def set_drumroll_branch_params(note_list, bar_list):
+                        for i in range(len(note_list)-1, -1, -1):
+                            if 5 <= note_list[i].type <= 7 or note_list[i].type == 9:
+                                drumroll_ms = note_list[i].hit_ms
+                                for bar_idx in range(len(bar_list)-1, -1, -1):
+                                    if bar_list[bar_idx].hit_ms <= drumroll_ms:
+                                        bar_list[bar_idx].branch_params = branch_params
+                                        return True
+                                break
+                        return False
+
+                    # Always try to set in master notes
+                    set_drumroll_branch_params(master_notes.play_notes, master_notes.bars)
+
+                    # If we have existing branches, also apply to them
+                    if branch_m and len(branch_m) > 0:
+                        set_drumroll_branch_params(branch_m[-1].play_notes, branch_m[-1].bars)
+                    if branch_e and len(branch_e) > 0:
+                        set_drumroll_branch_params(branch_e[-1].play_notes, branch_e[-1].bars)
+                    if branch_n and len(branch_n) > 0:
+                        set_drumroll_branch_params(branch_n[-1].play_notes, branch_n[-1].bars)
+                else:
+                    if len(curr_bar_list) > 1:
+                        curr_bar_list[-2].branch_params = branch_params
+                    elif len(curr_bar_list) > 0:
+                        curr_bar_list[-1].branch_params = branch_params
+
+                    if branch_m and len(branch_m[-1].bars) > 1:
+                        branch_m[-1].bars[-2].branch_params = branch_params
+                    elif branch_m and len(branch_m[-1].bars) > 0:
+                        branch_m[-1].bars[-1].branch_params = branch_params
+                    if branch_e and len(branch_e[-1].bars) > 1:
+                        branch_e[-1].bars[-2].branch_params = branch_params
+                    elif branch_e and len(branch_e[-1].bars) > 0:
+                        branch_e[-1].bars[-1].branch_params = branch_params
+                    if branch_n and len(branch_n[-1].bars) > 1:
+                        branch_n[-1].bars[-2].branch_params = branch_params
+                    elif branch_n and len(branch_n[-1].bars) > 0:
+                        branch_n[-1].bars[-1].branch_params = branch_params
+                    if branch_m and len(branch_m[-1].bars) > 0:
+                        branch_m[-1].bars[-1].branch_params = branch_params
+                continue
+            elif part.startswith('#BRANCHEND'):
+                curr_note_list = master_notes.play_notes
+                curr_draw_list = master_notes.draw_notes
+                curr_bar_list = master_notes.bars
+                continue
+            if part == '#M':
+                branch_m.append(NoteList())
+                curr_note_list = branch_m[-1].play_notes
+                curr_draw_list = branch_m[-1].draw_notes
+                curr_bar_list = branch_m[-1].bars
+                parser.current_ms = start_branch_ms
+                bpm = start_branch_bpm
+                time_signature = start_branch_time_sig
+                x_scroll_modifier = start_branch_x_scroll
+                y_scroll_modifier = start_branch_y_scroll
+                barline_display = start_branch_barline
+                gogo_time = start_branch_gogo
+                count = branch_balloon_count
+                is_branching = True
+                continue
+            elif part == '#E':
+                branch_e.append(NoteList())
+                curr_note_list = branch_e[-1].play_notes
+                curr_draw_list = branch_e[-1].draw_notes
+                curr_bar_list = branch_e[-1].bars
+                parser.current_ms = start_branch_ms
+                bpm = start_branch_bpm
+                time_signature = start_branch_time_sig
+                x_scroll_modifier = start_branch_x_scroll
+                y_scroll_modifier = start_branch_y_scroll
+                barline_display = start_branch_barline
+                gogo_time = start_branch_gogo
+                count = branch_balloon_count
+                is_branching = True
+                continue
+            elif part == '#N':
+                branch_n.append(NoteList())
+                curr_note_list = branch_n[-1].play_notes
+                curr_draw_list = branch_n[-1].draw_notes
+                curr_bar_list = branch_n[-1].bars
+                parser.current_ms = start_branch_ms
+                bpm = start_branch_bpm
+                time_signature = start_branch_time_sig
+                x_scroll_modifier = start_branch_x_scroll
+                y_scroll_modifier = start_branch_y_scroll
+                barline_display = start_branch_barline
+                gogo_time = start_branch_gogo
+                count = branch_balloon_count
+                is_branching = True
+                continue
+            if '#LYRIC' in part:
+                continue
+            if '#JPOSSCROLL' in part:
+                continue
+            elif '#NMSCROLL' in part:
+                continue
+            elif '#MEASURE' in part:
+                divisor = part.find('/')
+                time_signature = float(part[9:divisor]) / float(part[divisor+1:])
+                continue
+            elif '#SCROLL' in part:
+                scroll_value = part[7:]
+                if 'i' in scroll_value:
+                    normalized = scroll_value.replace('.i', 'j').replace('i', 'j')
+                    c = complex(normalized)
+                    x_scroll_modifier = c.real
+                    y_scroll_modifier = c.imag
+                else:
+                    x_scroll_modifier = float(scroll_value)
+                    y_scroll_modifier = 0.0
+                continue
+            elif '#BPMCHANGE' in part:
+                bpm = float(part[11:])
+                continue
+            elif '#BARLINEOFF' in part:
+                barline_display = False
+                continue
+            elif '#BARLINEON' in part:
+                barline_display = True
+                continue
+            elif '#GOGOSTART' in part:
+                gogo_time = True
+                continue
+            elif '#GOGOEND' in part:
+                gogo_time = False
+                continue
+            #Unrecognized commands will be skipped for now
+            elif len(part) > 0 and not part[0].isdigit():
+                continue
+
+            ms_per_measure = get_ms_per_measure(bpm, time_signature)
+
+            #Create note object
+            bar_line = Note()
+
+            #Determines how quickly the notes need to move across the screen to reach the judgment circle in time
+            bar_line.pixels_per_frame_x = get_pixels_per_frame(bpm * time_signature * x_scroll_modifier, time_signature*4, parser.distance)
+            bar_line.pixels_per_frame_y = get_pixels_per_frame(bpm * time_signature * y_scroll_modifier, time_signature*4, parser.distance)
+            pixels_per_ms = get_pixels_per_ms(bar_line.pixels_per_frame_x)
+
+            bar_line.hit_ms = parser.current_ms
+            if pixels_per_ms == 0:
+                bar_line.load_ms = bar_line.hit_ms
+            else:
+                bar_line.load_ms = bar_line.hit_ms - (parser.distance / pixels_per_ms)
+            bar_line.type = 0
+            bar_line.display = barline_display
+            bar_line.gogo_time = gogo_time
+            bar_line.bpm = bpm
+            if barline_added:
+                bar_line.display = False
+
+            if is_branching:
+                bar_line.is_branch_start = True
+                is_branching = False
+
+            bisect.insort(curr_bar_list, bar_line, key=lambda x: x.load_ms)
+            barline_added = True
+
+            #Empty bar is still a bar, otherwise start increment
+            if len(part) == 0:
+                parser.current_ms += ms_per_measure
+                increment = 0
+            else:
+                increment = ms_per_measure / bar_length
+
+            for item in part:
+                if item == '.':
+                    continue
+                if item == '0' or (not item.isdigit()):
+                    parser.current_ms += increment
+                    continue
+                if item == '9' and curr_note_list and curr_note_list[-1].type == 9:
+                    parser.current_ms += increment
+                    continue
+                note = Note()
+                note.hit_ms = parser.current_ms
+                note.display = True
+                note.pixels_per_frame_x = bar_line.pixels_per_frame_x
+                note.pixels_per_frame_y = bar_line.pixels_per_frame_y
+                pixels_per_ms = get_pixels_per_ms(note.pixels_per_frame_x)
+                note.load_ms = (note.hit_ms if pixels_per_ms == 0
+                                else note.hit_ms - (parser.distance / pixels_per_ms))
+                note.type = int(item)
+                note.index = index
+                note.bpm = bpm
+                note.gogo_time = gogo_time
+                note.moji = -1
+                if item in {'5', '6'}:
+                    note = Drumroll(note)
+                    note.color = 255
+                elif item in {'7', '9'}:
+                    count += 1
+                    if balloon is None:
+                        raise Exception("Balloon note found, but no count was specified")
+                    if item == '9':
+                        note = Balloon(note, is_kusudama=True)
+                    else:
+                        note = Balloon(note)
+                    note.count = 1 if not balloon else balloon.pop(0)
+                elif item == '8':
+                    new_pixels_per_ms = curr_note_list[-1].pixels_per_frame_x / (1000 / 60)
+                    if new_pixels_per_ms == 0:
+                        note.load_ms = note.hit_ms
+                    else:
+                        note.load_ms = note.hit_ms - (parser.distance / new_pixels_per_ms)
+                    note.pixels_per_frame_x = curr_note_list[-1].pixels_per_frame_x
+                parser.current_ms += increment
+                curr_note_list.append(note)
+                bisect.insort(curr_draw_list, note, key=lambda x: x.load_ms)
+                legacy_get_moji(curr_note_list, ms_per_measure)
+                index += 1
+    # Sorting by load_ms is necessary for drawing, as some notes appear on the
+    # screen slower regardless of when they reach the judge circle
+    # Bars can be sorted like this because they don't need hit detection
+    return master_notes, branch_m, branch_e, branch_n
+
+def note_fields(note: Note) -> tuple:
+    # A roll's tail is checked by check_roll_tails, the legacy parser never linked it.
+    # The legacy hash is built from str() of the times, so they are compared by repr,
+    # which tells 0 from 0.0
+    return (type(note).__name__,) + tuple(repr(getattr(note, f.name, None)) if f.name in ('hit_ms', 'load_ms')
+                                          else getattr(note, f.name, None) for f in fields(note) if f.name != 'tail')
+
+def check_roll_tails(notes: NoteList) -> list[str]:
+    """Every drumroll and balloon must be linked to the first roll end after it in its section."""
+    errors = []
+    play_notes = notes.play_notes
+    for i, note in enumerate(play_notes):
+        if not isinstance(note, (Drumroll, Balloon)):
+            continue
+        expected = None
+        for later in play_notes[i + 1:]:
+            if later.type == 8:
+                expected = later
+                break
+            if isinstance(later, (Drumroll, Balloon)):
+                break
+        if getattr(note, 'tail', None) is not expected:
+            errors.append(f"play_notes[{i}]: roll is not linked to its roll end")
+            break
+    return errors
+
+def compare_note_lists(expected: NoteList, actual: NoteList) -> list[str]:
+    errors = []
+    for name in ('play_notes', 'draw_notes', 'bars'):
+        expected_notes = getattr(expected, name)
+        actual_notes = getattr(actual, name)
+        if len(expected_notes) != len(actual_notes):
+            errors.append(f"{name}: {len(expected_notes)} notes, got {len(actual_notes)}")
+            continue
+        for i, (expected_note, actual_note) in enumerate(zip(expected_notes, actual_notes)):
+            if note_fields(expected_note) != note_fields(actual_note):
+                errors.append(f"{name}[{i}]: expected {expected_note}, got {actual_note}")
+                break
+    # draw_notes must share its objects with play_notes
+    play_ids = {id(note) for note in actual.play_notes}
+    if any(id(note) not in play_ids for note in actual.draw_notes):
+        errors.append("draw_notes holds notes that are not in play_notes")
+    errors.extend(check_roll_tails(actual))
+    return errors
+
+def compare_charts(tja_path: Path, diff: int, start_delay: float) -> list[str]:
+    legacy_parser = TJAParser(tja_path, start_delay=start_delay)
+    parser = TJAParser(tja_path, start_delay=start_delay)
+    try:
+        expected = legacy_parse_notes(legacy_parser, diff)
+    except Exception as e:
+        try:
+            parser.notes_to_position(diff)
+        except Exception:
+            return []
+        return [f"legacy parser raised {e!r}, vectorized parser did not"]
+    actual = parser.notes_to_position(diff)
+    errors = []
+    # The compiled chart must rebuild the same notes, roll links included
+    cached = deserialize_chart(serialize_chart(*actual, parser.current_ms))
+    for name, sections, cached_sections in zip(('notes', 'branch_m', 'branch_e', 'branch_n'),
+                                               ([actual[0]],) + actual[1:], ([cached[0]],) + cached[1:4]):
+        for section, cached_section in zip(sections, cached_sections):
+            errors.extend(f"compiled {name}.{error}" for error in compare_note_lists(section, cached_section))
+    if cached[0].branch_points != actual[0].branch_points:
+        errors.append("compiled branch_points differ")
+    if legacy_parser.current_ms != parser.current_ms:
+        errors.append(f"current_ms: expected {legacy_parser.current_ms}, got {parser.current_ms}")
+    errors.extend(compare_note_lists(expected[0], actual[0]))
+    for name, expected_sections, actual_sections in zip(('branch_m', 'branch_e', 'branch_n'), expected[1:], actual[1:]):
+        if len(expected_sections) != len(actual_sections):
+            errors.append(f"{name}: {len(expected_sections)} sections, got {len(actual_sections)}")
+            continue
+        for i, (expected_section, actual_section) in enumerate(zip(expected_sections, actual_sections)):
+            errors.extend(f"{name}[{i}].{error}" for error in compare_note_lists(expected_section, actual_section))
+    if legacy_parser.hash_note_data(expected[0]) != parser.hash_note_data(actual[0]):
+        errors.append("chart hash differs")
+    # Scores saved before HASH_VERSION 2 are only migrated if this matches
+    if legacy_parser.legacy_hash_note_data(expected[0]) != parser.legacy_hash_note_data(actual[0]):
+        errors.append("legacy chart hash differs")
+    if legacy_parser.legacy_hash_note_data(expected[0]) != legacy_parser.legacy_hash_note_data(cached[0]):
+        errors.append("compiled legacy chart hash differs")
+    return errors
+
+def best_time(function) -> float:
+    best = float('inf')
+    for _ in range(BENCHMARK_ROUNDS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_notes_to_position(tja_paths: list[Path]) -> bool:
+    checked = failures = 0
+    charts = []
+    for tja_path in tja_paths:
+        for diff in TJAParser(tja_path, metadata_only=True).metadata.course_data:
+            for start_delay in (0, 1000):
+                errors = compare_charts(tja_path, diff, start_delay)
+                checked += 1
+                label = f"{tja_path.name} [{TJAParser.DIFFS.get(diff, diff)}] start delay {start_delay}"
+                if errors:
+                    failures += 1
+                    print(f"MISMATCH {label}")
+                    for error in errors[:10]:
+                        print(f"  {error}")
+            try:
+                master_notes, branch_m, branch_e, branch_n = TJAParser(tja_path).notes_to_position(diff)
+            except Exception:
+                continue
+            note_count = sum(len(section.play_notes) for section in [master_notes] + branch_m + branch_e + branch_n)
+            charts.append((note_count, tja_path, diff))
+    if not charts:
+        print("No charts found")
+        return True
+    print(f"Golden check: {checked - failures}/{checked} charts identical")
+
+    note_count, tja_path, diff = max(charts, key=lambda chart: chart[0])
+    parser = TJAParser(tja_path)
+    parser.data
+    def position_legacy():
+        parser.current_ms = parser.start_delay
+        legacy_parse_notes(parser, diff)
+    def position():
+        parser.current_ms = parser.start_delay
+        parser.notes_to_position(diff)
+    legacy = best_time(position_legacy)
+    vectorized = best_time(position)
+    print(f"{tja_path.name} [{TJAParser.DIFFS.get(diff, diff)}] {note_count} notes: "
+          f"per-note {legacy * 1000:.2f} ms, vectorized {vectorized * 1000:.2f} ms ({legacy / vectorized:.1f}x)")
+    return failures == 0
+
+if __name__ == "__main__":
+    roots = [Path(arg) for arg in sys.argv[1:]] or [Path("Songs")]
+    paths = []
+    for root in roots:
+        paths.extend([root] if root.is_file() else sorted(root.rglob("*.tja")))
+    sys.exit(0 if benchmark_notes_to_position(paths) else 1)
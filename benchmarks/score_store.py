@@ -0,0 +1,102 @@
+"""Time reading the scores of song boxes from scores.db the way SongBox.get_scores
+used to (a new connection per box) against the score store, cold and preloaded,
+and the time a score write keeps the caller waiting.
+
+Usage:
+    python -m benchmarks.score_store [number of boxes]
+
+Defaults to 5,000 boxes with four difficulties each. The database is created in a
+temporary directory.
+"""
+import hashlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from libs.score_store import ScoreStore
+
+DIFFICULTIES = 4
+WRITES = 50
+
+def make_boxes(box_count: int) -> list[list[str]]:
+    return [[hashlib.sha256(f"{box}-{diff}".encode()).hexdigest() for diff in range(DIFFICULTIES)]
+            for box in range(box_count)]
+
+def fill_database(store: ScoreStore, boxes: list[list[str]]):
+    rng = random.Random(0)
+    rows = [(diff_hash, f"Song {box}", "", diff, rng.randrange(1_000_000), 500, 20, 3, 40, 300, 1)
+            for box, hashes in enumerate(boxes) for diff, diff_hash in enumerate(hashes) if rng.random() < 0.6]
+    with store.lock:
+        store.connection.executemany("""
+            INSERT INTO Scores (hash, en_name, jp_name, diff, score, good, ok, bad, drumroll, combo, clear, version)
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 2)
+        """, rows)
+        store.connection.commit()
+
+def read_per_connection(db_path: Path, boxes: list[list[str]]) -> dict:
+    scores = dict()
+    for hash_values in boxes:
+        with sqlite3.connect(db_path) as con:
+            cursor = con.cursor()
+            placeholders = ','.join('?' * len(hash_values))
+            cursor.execute(f"SELECT hash, score, good, ok, bad, clear FROM Scores WHERE hash IN ({placeholders})", hash_values)
+            hash_to_score = {row[0]: row[1:] for row in cursor.fetchall()}
+        for diff_hash in hash_values:
+            scores[diff_hash] = hash_to_score.get(diff_hash)
+    return scores
+
+def read_store(store: ScoreStore, boxes: list[list[str]]) -> dict:
+    scores = dict()
+    for hash_values in boxes:
+        scores.update(store.get_scores(hash_values))
+    return scores
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def benchmark_score_store(box_count: int):
+    boxes = make_boxes(box_count)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "scores.db"
+        store = ScoreStore(db_path)
+        fill_database(store, boxes)
+
+        expected, per_connection = timed(lambda: read_per_connection(db_path, boxes))
+        cold_scores, cold = timed(lambda: read_store(store, boxes))
+        _, preload = timed(store.preload)
+        warm_scores, warm = timed(lambda: read_store(store, boxes))
+        if cold_scores != expected or warm_scores != expected:
+            print("Score store returned different scores than scores.db")
+            return False
+        print(f"{box_count} boxes: connection per box {per_connection * 1000:.1f} ms, "
+              f"store cold {cold * 1000:.1f} ms, preload {preload * 1000:.1f} ms, "
+              f"store cached {warm * 1000:.1f} ms ({per_connection / warm:.0f}x)")
+
+        sync_times = []
+        with sqlite3.connect(db_path) as con:
+            for i in range(WRITES):
+                start = time.perf_counter()
+                con.execute("UPDATE Scores SET score = ? WHERE hash = ?", (2_000_000 + i, boxes[i][0]))
+                con.commit()
+                sync_times.append(time.perf_counter() - start)
+        queued_times = []
+        for i in range(WRITES):
+            start = time.perf_counter()
+            store.save_score(boxes[i][1], f"Song {i}", "", 1, 3_000_000 + i, 500, 20, 3, 40, 300, 2, 2)
+            queued_times.append(time.perf_counter() - start)
+        store.flush()
+        if any(store.get_score(boxes[i][1])[0] != 3_000_000 + i for i in range(WRITES)):
+            print("Queued writes did not reach the cache")
+            return False
+        store.close()
+        print(f"Score write: synchronous commit {max(sync_times) * 1000:.2f} ms worst, "
+              f"queued {max(queued_times) * 1000:.3f} ms worst")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_score_store(int(sys.argv[1]) if len(sys.argv) > 1 else 5000) else 1)
@@ -0,0 +1,107 @@
+"""Measure how long the textures of every screen take to decode, with the temporary
+files TextureWrapper.load_zip used before against decoding from memory on the
+decode threads.
+
+Before, every texture folder was extracted to a temporary directory and every
+single PNG written to a temporary file, then loaded from disk one at a time. Now
+the PNGs are read from the zip into memory and decoded by DECODE_WORKERS threads.
+Both paths stop at the CPU image, the GPU upload is the same for both and needs a
+window. Every folder under Graphics holding zips is loaded as one screen, and the
+images of both paths are checked to have the same sizes, which only holds for
+zips not packed into atlases by libs.atlas_packer.
+
+Usage:
+    python -m benchmarks.texture_load [rounds]
+
+Defaults to 3 rounds, the best round of each path is reported.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import pyray as ray
+
+from libs.texture import DECODE_WORKERS, LoadReport, decode_zip
+
+DEFAULT_ROUNDS = 3
+
+def load_zip_from_files(zip: Path) -> list[tuple[int, int]]:
+    """Decode the images of a zip through temporary files as load_zip did, returning their sizes."""
+    sizes = []
+    with zipfile.ZipFile(zip, 'r') as zip_ref:
+        with zip_ref.open('texture.json') as json_file:
+            tex_mapping_data = json.loads(json_file.read().decode('utf-8'))
+        for tex_name in tex_mapping_data:
+            if f"{tex_name}/" in zip_ref.namelist():
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    zip_ref.extractall(temp_dir, members=[name for name in zip_ref.namelist()
+                                                        if name.startswith(tex_name)])
+                    extracted_path = Path(temp_dir) / tex_name
+                    for frame in sorted(extracted_path.iterdir(), key=lambda x: int(x.stem)):
+                        if frame.is_file():
+                            image = ray.load_image(str(frame))
+                            sizes.append((image.width, image.height))
+                            ray.unload_image(image)
+            elif f"{tex_name}.png" in zip_ref.namelist():
+                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
+                    temp_file.write(zip_ref.read(f"{tex_name}.png"))
+                    temp_path = temp_file.name
+                try:
+                    image = ray.load_image(temp_path)
+                    sizes.append((image.width, image.height))
+                    ray.unload_image(image)
+                finally:
+                    os.unlink(temp_path)
+    return sizes
+
+def load_zip_from_memory(zip: Path, report: LoadReport) -> list[tuple[int, int]]:
+    """Decode the images of a zip the way load_zip does, returning their sizes."""
+    sizes = []
+    _, pages, pending = decode_zip(zip, report)
+    for future in pages + [future for _, _, futures, _ in pending for future in futures]:
+        image, decode_ns = future.result()
+        report.decode_ms += decode_ns / 1_000_000
+        sizes.append((image.width, image.height))
+        ray.unload_image(image)
+    return sizes
+
+def benchmark_texture_load(rounds: int) -> bool:
+    ray.set_trace_log_level(ray.TraceLogLevel.LOG_WARNING)
+    screens = sorted({zip.parent for zip in Path('Graphics').rglob('*.zip')})
+    print(f"{'Screen':<40}{'Zips':>6}{'Images':>8}{'MB':>7}{'files ms':>10}{'memory ms':>11}{'decode ms':>11}{'Speedup':>9}")
+    print('-' * 102)
+    passed = True
+    total_files = total_memory = 0.0
+    for screen in screens:
+        zips = sorted(screen.glob('*.zip'))
+        best_files = best_memory = float('inf')
+        report = LoadReport()
+        for _ in range(rounds):
+            start = time.perf_counter()
+            file_sizes = [size for zip in zips for size in load_zip_from_files(zip)]
+            best_files = min(best_files, (time.perf_counter() - start) * 1000)
+
+            report = LoadReport()
+            start = time.perf_counter()
+            memory_sizes = [size for zip in zips for size in load_zip_from_memory(zip, report)]
+            best_memory = min(best_memory, (time.perf_counter() - start) * 1000)
+            if file_sizes != memory_sizes:
+                print(f"{screen}: images differ between the two paths")
+                passed = False
+        total_files += best_files
+        total_memory += best_memory
+        name = str(screen.relative_to('Graphics'))
+        print(f"{name:<40}{report.zips:>6}{report.images:>8}{report.bytes / 1_000_000:>7.1f}{best_files:>10.1f}"
+              f"{best_memory:>11.1f}{report.decode_ms:>11.1f}{best_files / best_memory:>8.1f}x")
+    print(f"{'All':<40}{'':>6}{'':>8}{'':>7}{total_files:>10.1f}{total_memory:>11.1f}{'':>11}"
+          f"{total_files / total_memory:>8.1f}x")
+    print(f"{DECODE_WORKERS} decode threads")
+    return passed
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROUNDS
+    sys.exit(0 if benchmark_texture_load(rounds) else 1)
@@ -1,5 +1,6 @@
+import operator
 import time
-from typing import Any, Optional
+from typing import Any, ClassVar, Optional
 
 from libs.global_data import global_data
 
@@ -16,7 +17,50 @@ def get_current_ms() -> int:
     return rounded(time.time() * 1000)
 
 
+def _clone_fields(cls: type) -> tuple[str, ...]:
+    """Return the slots of a class and its bases, which are the fields clone() copies."""
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get('__slots__', ()):
+            if name not in fields:
+                fields.append(name)
+    return tuple(fields)
+
+def _freeze_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_freeze_value(item) for item in value)
+    return value
+
+class _Prototype:
+    """Makes an animation read-only, mixed into the classes made by BaseAnimation.freeze."""
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"Cannot set {name}, animation prototypes are read-only, clone() them first")
+
+_PROTOTYPE_CLASSES: dict[type, type] = dict()
+
 class BaseAnimation():
+    """The base class of all animations.
+
+    Every animation keeps its state in __slots__, which are also the fields clone()
+    copies. Values are copied by reference, so the fields must never be mutated in
+    place, only replaced.
+    """
+    __slots__ = ('duration', 'delay', 'delay_saved', 'start_ms', 'is_finished', 'attribute',
+                 'is_started', 'is_reversing', 'unlocked', 'loop', 'lock_input')
+    LIVE_CLASS: ClassVar[type['BaseAnimation']]
+    CLONE_FIELDS: ClassVar[tuple[str, ...]]
+    read_fields: ClassVar[operator.attrgetter]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if issubclass(cls, _Prototype):
+            return
+        cls.LIVE_CLASS = cls
+        cls.CLONE_FIELDS = _clone_fields(cls)
+        cls.read_fields = operator.attrgetter(*cls.CLONE_FIELDS)
+
     def __init__(self, duration: float, delay: float = 0.0, loop: bool = False, lock_input: bool = False) -> None:
         """
         Initialize a base animation.
@@ -39,10 +83,39 @@ class BaseAnimation():
         self.lock_input = lock_input
 
     def __repr__(self):
-        return str(self.__dict__)
+        return str({name: getattr(self, name) for name in self.CLONE_FIELDS})
 
     def __str__(self):
-        return str(self.__dict__)
+        return repr(self)
+
+    def clone(self):
+        """Return a copy of the animation that can be changed independently.
+
+        Only the fields listed in CLONE_FIELDS are copied, one assignment each, so
+        cloning costs the same whatever the animation holds. The clone of a
+        prototype is a normal, writable animation.
+        """
+        cls = self.LIVE_CLASS
+        new = object.__new__(cls)
+        for name, value in zip(cls.CLONE_FIELDS, cls.read_fields(self)):
+            setattr(new, name, value)
+        return new
+
+    def freeze(self):
+        """Return a read-only copy of the animation to clone others from.
+
+        Lists held by the animation, like the frames of a texture change, are turned
+        into tuples so the clones can share them.
+        """
+        cls = self.LIVE_CLASS
+        prototype_class = _PROTOTYPE_CLASSES.get(cls)
+        if prototype_class is None:
+            prototype_class = type(f"{cls.__name__}Prototype", (_Prototype, cls), {'__slots__': ()})
+            _PROTOTYPE_CLASSES[cls] = prototype_class
+        prototype = object.__new__(prototype_class)
+        for name, value in zip(cls.CLONE_FIELDS, cls.read_fields(self)):
+            object.__setattr__(prototype, name, _freeze_value(value))
+        return prototype
 
     def update(self, current_time_ms: float) -> None:
         """Update the animation based on the current time."""
@@ -111,6 +184,9 @@ class BaseAnimation():
         return progress
 
 class FadeAnimation(BaseAnimation):
+    __slots__ = ('initial_opacity', 'final_opacity', 'initial_opacity_saved', 'final_opacity_saved',
+                 'ease_in', 'ease_out', 'reverse_delay', 'reverse_delay_saved')
+
     def __init__(self, duration: float, initial_opacity: float = 1.0, loop: bool = False,
                      lock_input: bool = False, final_opacity: float = 0.0, delay: float = 0.0,
                      ease_in: Optional[str] = None, ease_out: Optional[str] = None,
@@ -160,6 +236,9 @@ class FadeAnimation(BaseAnimation):
             self.attribute = self.initial_opacity + progress * (self.final_opacity - self.initial_opacity)
 
 class MoveAnimation(BaseAnimation):
+    __slots__ = ('reverse_delay', 'reverse_delay_saved', 'total_distance', 'start_position',
+                 'total_distance_saved', 'start_position_saved', 'ease_in', 'ease_out')
+
     def __init__(self, duration: float, total_distance: int = 0, loop: bool = False,
                       lock_input: bool = False, start_position: int = 0, delay: float = 0.0,
                       reverse_delay: Optional[float] = None,
@@ -205,6 +284,8 @@ class MoveAnimation(BaseAnimation):
             self.attribute = self.start_position + (self.total_distance * progress)
 
 class TextureChangeAnimation(BaseAnimation):
+    __slots__ = ('textures',)
+
     def __init__(self, duration: float, textures: list[tuple[float, float, int]],
                        loop: bool = False, lock_input: bool = False, delay: float = 0.0) -> None:
         super().__init__(duration, loop=loop, lock_input=lock_input)
@@ -234,6 +315,8 @@ class TextureChangeAnimation(BaseAnimation):
             self.is_finished = True
 
 class TextStretchAnimation(BaseAnimation):
+    __slots__ = ()
+
     def update(self, current_time_ms: float) -> None:
         if not self.is_started:
             return
@@ -253,6 +336,9 @@ class TextStretchAnimation(BaseAnimation):
             self.is_finished = True
 
 class TextureResizeAnimation(BaseAnimation):
+    __slots__ = ('initial_size', 'final_size', 'reverse_delay', 'initial_size_saved', 'final_size_saved',
+                 'reverse_delay_saved', 'ease_in', 'ease_out')
+
     def __init__(self, duration: float, initial_size: float = 1.0,
                      loop: bool = False, lock_input: bool = False,
                      final_size: float = 0.0, delay: float = 0.0,
@@ -391,7 +477,8 @@ ANIMATION_CLASSES = {
 
 def parse_animations(animation_json):
     """Processes animations from a json file, including
-    ones with references to other animations, returns a dictionary"""
+    ones with references to other animations, returns a dictionary
+    of read-only prototypes to clone() animations from"""
     raw_anims = {}
     for item in animation_json:
         if "id" not in item:
@@ -462,6 +549,6 @@ def parse_animations(animation_json):
         anim_class = ANIMATION_CLASSES[type]
 
         anim_object = anim_class(**absolute_anim)
-        anim_dict[id_val] = anim_object
+        anim_dict[id_val] = anim_object.freeze()
 
     return anim_dict
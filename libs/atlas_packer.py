@@ -0,0 +1,170 @@
+"""Pack the textures of the Graphics zips into atlases, so that TextureWrapper draws
+them from one or a few textures instead of one texture per image.
+
+The frames of every texture in a zip are placed on shelves of ATLAS_SIZE pages,
+written into the zip as atlas/<page>.png, with an atlas.json giving the page and
+rectangle of every frame. The original images are kept, so a zip can be packed
+again after they are edited. Textures with frames of different sizes, or too
+large for a page, stay textures of their own.
+
+Drawing every image of a zip once in texture.json order needs one texture bind,
+and so one draw call, per image before packing. The binds before and after are
+printed for every zip.
+
+Usage:
+    python -m libs.atlas_packer [zip ...]
+
+Packs every zip under Graphics when none are given.
+"""
+import json
+import os
+import struct
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any
+
+import pyray as ray
+
+from libs.texture import ATLAS_JSON
+
+ATLAS_SIZE = 2048
+# Transparent pixels between frames, so that filtering does not pick up the neighbours
+PADDING = 2
+# Sampled whole by the rainbow mask shader, so they cannot be moved into an atlas
+UNPACKED = {Path('Graphics/game/balloon.zip')}
+
+def png_size(data: bytes) -> tuple[int, int]:
+    """Return the width and height of a PNG from its IHDR chunk."""
+    return struct.unpack('>II', data[16:24])
+
+def pack_shelves(sizes: list[tuple[int, int]], atlas_size: int = ATLAS_SIZE,
+                 padding: int = PADDING) -> tuple[list[tuple[int, int, int]], list[tuple[int, int]]]:
+    """Place rectangles on shelves of square pages, tallest first.
+
+    Args:
+        sizes (list[tuple[int, int]]): The width and height of every rectangle,
+            each at most atlas_size - padding on both sides.
+        atlas_size (int): The largest width and height of a page.
+        padding (int): The space kept between rectangles.
+
+    Returns:
+        The page, x and y of every rectangle in the order of sizes, and the
+        width and height each page needs.
+    """
+    placements: list[tuple[int, int, int]] = [(0, 0, 0)] * len(sizes)
+    pages: list[tuple[int, int]] = []
+    page = -1
+    shelf_x = shelf_y = shelf_height = atlas_size
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        width, height = sizes[i]
+        if shelf_x + width + padding > atlas_size:
+            shelf_y += shelf_height
+            shelf_x = 0
+            shelf_height = height + padding
+        if shelf_y + height + padding > atlas_size:
+            page += 1
+            pages.append((0, 0))
+            shelf_x = shelf_y = 0
+            shelf_height = height + padding
+        placements[i] = (page, shelf_x, shelf_y)
+        pages[page] = (max(pages[page][0], shelf_x + width), max(pages[page][1], shelf_y + height))
+        shelf_x += width + padding
+    return placements, pages
+
+def count_binds(textures: list[Any]) -> int:
+    """Return the texture binds needed to draw a sequence of textures in order."""
+    return sum(1 for i, texture in enumerate(textures) if i == 0 or texture != textures[i - 1])
+
+def pack_zip(zip_path: Path) -> tuple[int, int, int]:
+    """Pack the textures of a zip into atlas pages written into the zip.
+
+    Returns:
+        The number of pages, and the texture binds needed to draw every image of
+        the zip once in texture.json order, before and after packing.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        names = [name for name in zip_ref.namelist() if name != ATLAS_JSON and not name.startswith('atlas/')]
+        tex_mapping_data = json.loads(zip_ref.read('texture.json').decode('utf-8'))
+        if 'atlas' in tex_mapping_data:
+            raise Exception(f"{zip_path} has a texture named atlas, which would be replaced by its atlas pages")
+        members: list[tuple[str, bool, list[str]]] = []
+        for tex_name in tex_mapping_data:
+            folder = f"{tex_name}/"
+            if folder in names:
+                frames = [name for name in names
+                          if name.startswith(folder) and name != folder and '/' not in name[len(folder):]]
+                members.append((tex_name, True, sorted(frames, key=lambda name: int(Path(name).stem))))
+            elif f"{tex_name}.png" in names:
+                members.append((tex_name, False, [f"{tex_name}.png"]))
+            else:
+                raise Exception(f"Texture {tex_name} was not found in {zip_path}")
+        images = {member: zip_ref.read(member) for _, _, frames in members for member in frames}
+        others = {name: zip_ref.read(name) for name in names if name not in images}
+
+    packed = []
+    for tex_name, is_frames, frames in members:
+        sizes = {png_size(images[member]) for member in frames}
+        if len(sizes) == 1:
+            width, height = next(iter(sizes))
+            if width + PADDING <= ATLAS_SIZE and height + PADDING <= ATLAS_SIZE:
+                packed.append((tex_name, is_frames, frames))
+    packed_members = [member for _, _, frames in packed for member in frames]
+    placements, page_sizes = pack_shelves([png_size(images[member]) for member in packed_members])
+    placement = dict(zip(packed_members, placements))
+
+    pages = [ray.gen_image_color(width, height, ray.BLANK) for width, height in page_sizes]
+    for member in packed_members:
+        data = images[member]
+        image = ray.load_image_from_memory('.png', data, len(data))
+        page, x, y = placement[member]
+        ray.image_draw(pages[page], image, ray.Rectangle(0, 0, image.width, image.height),
+                       ray.Rectangle(x, y, image.width, image.height), ray.WHITE)
+        ray.unload_image(image)
+    page_data = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i, page in enumerate(pages):
+            path = Path(temp_dir) / f"{i}.png"
+            ray.export_image(page, str(path))
+            ray.unload_image(page)
+            page_data.append(path.read_bytes())
+
+    atlas = {'pages': [f"atlas/{i}.png" for i in range(len(pages))], 'textures': {}}
+    for tex_name, is_frames, frames in packed:
+        rects = []
+        for member in frames:
+            page, x, y = placement[member]
+            rects.append([page, x, y, *png_size(images[member])])
+        atlas['textures'][tex_name] = {'frames': is_frames, 'rects': rects}
+
+    temp_path = zip_path.with_suffix('.zip.tmp')
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, data in others.items():
+            zip_ref.writestr(name, data)
+        for name, data in images.items():
+            zip_ref.writestr(name, data)
+        zip_ref.writestr(ATLAS_JSON, json.dumps(atlas, indent=4))
+        for name, data in zip(atlas['pages'], page_data):
+            zip_ref.writestr(name, data)
+    os.replace(temp_path, zip_path)
+
+    order = [member for _, _, frames in members for member in frames]
+    before = count_binds(order)
+    after = count_binds([placement[member][0] if member in placement else member for member in order])
+    return len(pages), before, after
+
+if __name__ == "__main__":
+    zips = [Path(arg) for arg in sys.argv[1:]] or sorted(Path('Graphics').rglob('*.zip'))
+    ray.set_trace_log_level(ray.TraceLogLevel.LOG_WARNING)
+    print(f"{'Zip':<50}{'Pages':>7}{'Binds before':>14}{'Binds after':>13}")
+    print('-' * 84)
+    total_before = total_after = 0
+    for path in zips:
+        if path in UNPACKED:
+            continue
+        page_count, before, after = pack_zip(path)
+        total_before += before
+        total_after += after
+        print(f"{str(path):<50}{page_count:>7}{before:>14}{after:>13}")
+    print(f"{'All':<50}{'':>7}{total_before:>14}{total_after:>13}")
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+CHART_CACHE_DIR = Path("cache/charts")
+CHART_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+class ChartCache:
+    """On-disk store for compiled charts.
+
+    Entries are keyed by the chart's path, size and modification time together with
+    the parse parameters, so editing a .tja automatically misses the cache. The total
+    size of the cache directory is capped and the least recently used entries are
+    evicted first.
+
+    Args:
+        cache_dir (Path): The directory the compiled charts are stored in.
+        max_size (int): The maximum total size of the cache in bytes.
+    """
+    def __init__(self, cache_dir: Path = CHART_CACHE_DIR, max_size: int = CHART_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    def _path_prefix(self, path: Path) -> str:
+        return hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()[:16]
+
+    def make_key(self, path: Path, start_delay: float, distance: float, diff: int, version: int) -> Optional[str]:
+        """Build the cache key for a chart, or None if the file cannot be read."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        params = f"{stat.st_size}|{stat.st_mtime_ns}|{start_delay}|{distance}|{diff}|{version}"
+        return f"{self._path_prefix(path)}_{hashlib.sha1(params.encode('utf-8')).hexdigest()[:16]}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the compiled chart stored under key, marking it as recently used."""
+        entry = self.cache_dir / f"{key}.bin"
+        try:
+            data = entry.read_bytes()
+            os.utime(entry)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a compiled chart and evict old entries if the cache is over its size cap."""
+        with self.lock:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                entry = self.cache_dir / f"{key}.bin"
+                temp_entry = entry.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+                temp_entry.write_bytes(data)
+                os.replace(temp_entry, entry)
+                self._evict()
+            except OSError as e:
+                print(f"Failed to write chart cache entry {key}: {e}")
+
+    def invalidate(self, path: Path) -> None:
+        """Remove every compiled chart stored for path, forcing a rebuild on next load."""
+        with self.lock:
+            if not self.cache_dir.exists():
+                return
+            for entry in self.cache_dir.glob(f"{self._path_prefix(path)}_*.bin"):
+                entry.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Remove every compiled chart."""
+        with self.lock:
+            if not self.cache_dir.exists():
+                return
+            for entry in self.cache_dir.glob("*.bin"):
+                entry.unlink(missing_ok=True)
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        for entry in self.cache_dir.glob("*.bin"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+            total_size += stat.st_size
+        if total_size <= self.max_size:
+            return
+        entries.sort(key=lambda item: item[0])
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+
+chart_cache = ChartCache()
@@ -3,11 +3,12 @@ import random
 from typing import Optional, Union
 from libs.audio import audio
 from libs.animation import Animation, MoveAnimation
-from libs.tja import TJAParser, test_encodings
+from libs.score_store import score_store
+from libs.song_index import song_index
+from libs.tja import TJAParser, read_text_file
 from libs.texture import tex
 from libs.utils import OutlinedText, get_current_ms, global_data
 from datetime import datetime, timedelta
-import sqlite3
 import pyray as ray
 
 BOX_CENTER = 444
@@ -91,27 +92,13 @@ class SongBox:
     def get_scores(self):
         if self.tja is None:
             return
-        with sqlite3.connect('scores.db') as con:
-            cursor = con.cursor()
-            # Batch database query for all diffs at once
-            if self.tja.metadata.course_data:
-                hash_values = [self.hash[diff] for diff in self.tja.metadata.course_data if diff in self.hash]
-                placeholders = ','.join('?' * len(hash_values))
-
-                batch_query = f"""
-                    SELECT hash, score, good, ok, bad, clear
-                    FROM Scores
-                    WHERE hash IN ({placeholders})
-                """
-                cursor.execute(batch_query, hash_values)
-
-                hash_to_score = {row[0]: row[1:] for row in cursor.fetchall()}
-
-                for diff in self.tja.metadata.course_data:
-                    if diff not in self.hash:
-                        continue
-                    diff_hash = self.hash[diff]
-                    self.scores[diff] = hash_to_score.get(diff_hash)
+        if self.tja.metadata.course_data:
+            hash_values = [self.hash[diff] for diff in self.tja.metadata.course_data if diff in self.hash]
+            hash_to_score = score_store.get_scores(hash_values)
+            for diff in self.tja.metadata.course_data:
+                if diff not in self.hash:
+                    continue
+                self.scores[diff] = hash_to_score[self.hash[diff]]
 
     def move_box(self):
         if self.position != self.target_position and self.move is None:
@@ -652,8 +639,14 @@ class SongFile(FileSystemItem):
     """Represents a song file (TJA) in the navigation system"""
     def __init__(self, path: Path, name: str, texture_index: int, tja=None, name_texture_index: Optional[int]=None):
         super().__init__(path, name)
-        self.is_recent = (datetime.now() - datetime.fromtimestamp(path.stat().st_mtime)) <= timedelta(days=7)
-        self.tja = tja or TJAParser(path)
+        stat = path.stat()
+        self.is_recent = (datetime.now() - datetime.fromtimestamp(stat.st_mtime)) <= timedelta(days=7)
+        if tja is None:
+            encoding = song_index.get_encoding(path)
+            tja = TJAParser(path, metadata_only=True, encoding=encoding)
+            if encoding is None:
+                song_index.set_encoding(str(path), stat.st_size, stat.st_mtime_ns, tja.encoding)
+        self.tja = tja
         if self.is_recent:
             self.tja.ex_data.new = True
         title = self.tja.metadata.title.get(global_data.config['general']['language'].lower(), self.tja.metadata.title['en'])
@@ -737,6 +730,7 @@ class FileNavigator:
                 continue
 
             self._generate_objects_recursive(root_path)
+        song_index.commit()
 
         if self.favorite_folder is not None:
             song_list = self._read_song_list(self.favorite_folder.path)
@@ -1138,24 +1132,28 @@ class FileNavigator:
         texture_index = SongBox.DEFAULT_INDEX
         name = path.name
         collection = None
-        encoding = test_encodings(path / "box.def")
+        box_def_path = path / "box.def"
 
         try:
-            with open(path / "box.def", 'r', encoding=encoding) as box_def:
-                for line in box_def:
-                    line = line.strip()
-                    if line.startswith("#GENRE:"):
-                        genre = line.split(":", 1)[1].strip()
-                        texture_index = FileSystemItem.GENRE_MAP.get(genre, SongBox.DEFAULT_INDEX)
-                        if texture_index == SongBox.DEFAULT_INDEX:
-                            texture_index = FileSystemItem.GENRE_MAP_2.get(genre, SongBox.DEFAULT_INDEX)
-                    elif line.startswith("#TITLE:"):
+            encoding = song_index.get_encoding(box_def_path)
+            text, detected_encoding = read_text_file(box_def_path, encoding)
+            if encoding is None:
+                stat = box_def_path.stat()
+                song_index.set_encoding(str(box_def_path), stat.st_size, stat.st_mtime_ns, detected_encoding)
+            for line in text.splitlines():
+                line = line.strip()
+                if line.startswith("#GENRE:"):
+                    genre = line.split(":", 1)[1].strip()
+                    texture_index = FileSystemItem.GENRE_MAP.get(genre, SongBox.DEFAULT_INDEX)
+                    if texture_index == SongBox.DEFAULT_INDEX:
+                        texture_index = FileSystemItem.GENRE_MAP_2.get(genre, SongBox.DEFAULT_INDEX)
+                elif line.startswith("#TITLE:"):
+                    name = line.split(":", 1)[1].strip()
+                elif line.startswith("#TITLEJA:"):
+                    if global_data.config['general']['language'] == 'ja':
                         name = line.split(":", 1)[1].strip()
-                    elif line.startswith("#TITLEJA:"):
-                        if global_data.config['general']['language'] == 'ja':
-                            name = line.split(":", 1)[1].strip()
-                    elif line.startswith("#COLLECTION"):
-                        collection = line.split(":", 1)[1].strip()
+                elif line.startswith("#COLLECTION"):
+                    collection = line.split(":", 1)[1].strip()
         except Exception as e:
             print(f"Error parsing box.def in {path}: {e}")
 
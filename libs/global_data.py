@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
@@ -26,7 +27,8 @@ class SessionData:
     result_max_combo: The maximum combo achieved in the game.
     result_total_drumroll: The total drumroll achieved in the game.
     result_gauge_length: The length of the gauge achieved in the game.
-    prev_score: The previous score pulled from the database."""
+    prev_score: The previous score pulled from the database.
+    diff_hash: The indexed hash of the chart being played, empty if it has to be hashed again."""
     selected_difficulty: int = 0
     song_title: str = ''
     genre_index: int = 0
@@ -38,6 +40,7 @@ class SessionData:
     result_total_drumroll: int = 0
     result_gauge_length: int = 0
     prev_score: int = 0
+    diff_hash: str = ''
 
 @dataclass
 class GlobalData:
@@ -48,8 +51,8 @@ class GlobalData:
         selected_song (Path): The currently selected song.
         songs_played (int): The number of songs played.
         config (dict): The configuration settings.
-        song_hashes (dict[str, list[dict]]): A dictionary mapping song hashes to their metadata.
-        song_paths (dict[Path, str]): A dictionary mapping song paths to their hashes.
+        song_hashes (Mapping[str, list[dict]]): A mapping of song hashes to their metadata, backed by the song index.
+        song_paths (Mapping[Path, str]): A mapping of song paths to their hashes, backed by the song index.
         song_progress (float): The progress of the loading bar.
         total_songs (int): The total number of songs.
         hit_sound (list[int]): The indices of the hit sounds currently used.
@@ -61,8 +64,8 @@ class GlobalData:
     selected_song: Path = Path()
     songs_played: int = 0
     config: dict[str, Any] = field(default_factory=lambda: dict())
-    song_hashes: dict[str, list[dict]] = field(default_factory=lambda: dict()) #Hash to path
-    song_paths: dict[Path, str] = field(default_factory=lambda: dict()) #path to hash
+    song_hashes: Mapping[str, list[dict]] = field(default_factory=lambda: dict()) #Hash to path
+    song_paths: Mapping[Path, str] = field(default_factory=lambda: dict()) #path to hash
     song_progress: float = 0.0
     total_songs: int = 0
     hit_sound: list[int] = field(default_factory=lambda: [0, 0])
@@ -0,0 +1,110 @@
+import math
+from typing import Any
+
+import pyray as ray
+
+from libs.global_data import global_data
+
+PLAYERS = ('1', '2')
+
+# Bits of the drum state of a player
+L_DON = 1
+R_DON = 2
+L_KAT = 4
+R_KAT = 8
+DON = L_DON | R_DON
+KAT = L_KAT | R_KAT
+# Config key, bit, note type and side of every drum input
+DRUM_INPUTS = (('left_don', L_DON, 'DON', 'L'), ('right_don', R_DON, 'DON', 'R'),
+               ('left_kat', L_KAT, 'KAT', 'L'), ('right_kat', R_KAT, 'KAT', 'R'))
+
+class InputMap:
+    """The drum keys and gamepad buttons of both players, compiled from the config.
+
+    Key names are turned into key codes once, so reading input does not go
+    through the config. Compiled again by the settings screen when it saves.
+
+    Attributes:
+        keys (tuple[tuple[int, int, int], ...]): The key code, player index and drum bit of every key.
+        buttons (tuple[tuple[int, int], ...]): The button and drum bit of every gamepad button,
+            the gamepad plays for both players.
+        touch_enabled (bool): Whether taps on the drum are read.
+    """
+    def __init__(self):
+        self.keys: tuple[tuple[int, int, int], ...] = ()
+        self.buttons: tuple[tuple[int, int], ...] = ()
+        self.touch_enabled = False
+        self.compiled = False
+
+    def compile(self, config: dict[str, Any]):
+        """Read the drum bindings from a config."""
+        self.keys = tuple((ord(key), player, bit)
+                          for player, player_num in enumerate(PLAYERS)
+                          for key_name, bit, _, _ in DRUM_INPUTS
+                          for key in config[f"keys_{player_num}p"][key_name])
+        self.buttons = tuple((button, bit) for key_name, bit, _, _ in DRUM_INPUTS
+                             for button in config["gamepad"][key_name])
+        self.touch_enabled = config["general"]["touch_enabled"]
+        self.compiled = True
+
+def touched_drums() -> int:
+    """Return the drum bits of every drum area tapped this frame."""
+    gesture = ray.get_gesture_detected()
+    if gesture not in {ray.Gesture.GESTURE_TAP, ray.Gesture.GESTURE_DOUBLETAP} or not ray.is_gesture_detected(gesture):
+        return 0
+    mid_x, mid_y = (1280//2, 720)
+    drums = 0
+    for i in range(min(ray.get_touch_point_count(), 10)):
+        tap_pos = ray.get_touch_position(i)
+        is_don = math.dist((tap_pos.x, tap_pos.y), (mid_x, mid_y)) < 300
+        is_left = tap_pos.x <= mid_x
+        drums |= (L_DON if is_left else R_DON) if is_don else (L_KAT if is_left else R_KAT)
+    return drums
+
+class DrumInput:
+    """The drums pressed this frame by each player, read once per frame by poll().
+
+    Scenes read the snapshot with is_pressed instead of asking raylib themselves.
+    Taps on the drum and gamepad buttons count for both players. While
+    global_data.input_locked is set nothing reads as pressed.
+    """
+    def __init__(self, input_map: InputMap):
+        self.input_map = input_map
+        self.pressed = [0, 0]
+        self.touched = 0
+
+    def poll(self):
+        """Read the drums pressed this frame. Called once per frame before the screen updates."""
+        input_map = self.input_map
+        if not input_map.compiled:
+            input_map.compile(global_data.config)
+        pressed = [0, 0]
+        for key, player, bit in input_map.keys:
+            if ray.is_key_pressed(key):
+                pressed[player] |= bit
+        shared = 0
+        if input_map.buttons and ray.is_gamepad_available(0):
+            for button, bit in input_map.buttons:
+                if ray.is_gamepad_button_pressed(0, button):
+                    shared |= bit
+        self.touched = touched_drums() if input_map.touch_enabled else 0
+        shared |= self.touched
+        self.pressed = [pressed[0] | shared, pressed[1] | shared]
+
+    def is_pressed(self, drums: int, player_num: str = '0') -> bool:
+        """Check if any of the given drums was pressed this frame.
+
+        Args:
+            drums (int): The drum bits to check, for example L_DON or DON.
+            player_num (str): '1' or '2' for the keys of one player, '0' for either.
+        """
+        if global_data.input_locked:
+            return False
+        if player_num == '1':
+            return bool(self.pressed[0] & drums)
+        if player_num == '2':
+            return bool(self.pressed[1] & drums)
+        return bool((self.pressed[0] | self.pressed[1]) & drums)
+
+input_map = InputMap()
+drum_input = DrumInput(input_map)
@@ -0,0 +1,92 @@
+import gc
+from typing import Any
+
+from libs.profiler import profiler
+
+# gen0, gen1 and gen2 thresholds of the 'tuned' gc mode. Python's default collects
+# the youngest generation every 700 allocations, which during a drumroll is every
+# few frames
+TUNED_GC_THRESHOLDS = (10_000, 20, 100)
+GC_MODES = ('default', 'freeze', 'tuned')
+
+class ObjectPool:
+    """A fixed-size free list of objects that are reset and reused instead of created.
+
+    The pooled class must take the same arguments in reset() as in __init__, leave
+    the object as if it had just been created, and set is_finished when it is done.
+    Objects that are released while the free list is full are left to the garbage
+    collector.
+
+    Every object created, reused and dropped is counted in the profiler under the
+    name of the pool.
+    """
+    def __init__(self, factory: type, size: int):
+        self.factory = factory
+        self.size = size
+        self.free: list[Any] = []
+        name = factory.__name__
+        self.created_name = f"{name} new"
+        self.reused_name = f"{name} reused"
+        self.dropped_name = f"{name} dropped"
+
+    def prefill(self, *args, **kwargs):
+        """Create objects until the free list is full, so the first hits of a song do not allocate."""
+        while len(self.free) < self.size:
+            self.free.append(self.factory(*args, **kwargs))
+
+    def acquire(self, *args, **kwargs) -> Any:
+        """Return a free object reset with the given arguments, or a new one when there is none."""
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            profiler.count(self.reused_name)
+            return obj
+        profiler.count(self.created_name)
+        return self.factory(*args, **kwargs)
+
+    def release(self, obj: Any):
+        """Give an object that is no longer drawn back to the pool."""
+        if len(self.free) < self.size:
+            self.free.append(obj)
+        else:
+            profiler.count(self.dropped_name)
+
+class GameplayGC:
+    """Changes how the garbage collector runs while a song is played.
+
+    Modes:
+        default: The collector is left alone.
+        freeze: Everything loaded before the song is moved out of the collector's
+            reach with gc.freeze, so a full collection during the song only walks
+            the objects created since.
+        tuned: freeze, and the youngest generation is collected less often.
+    """
+    def __init__(self):
+        self.mode = 'default'
+        self.saved_thresholds = gc.get_threshold()
+
+    def begin(self, mode: str):
+        """Apply a gc mode, called when the song has been loaded."""
+        if mode not in GC_MODES:
+            print(f"Unknown gc_mode {mode}, using default")
+            mode = 'default'
+        self.end()
+        self.mode = mode
+        if mode == 'default':
+            return
+        gc.collect()
+        gc.freeze()
+        if mode == 'tuned':
+            self.saved_thresholds = gc.get_threshold()
+            gc.set_threshold(*TUNED_GC_THRESHOLDS)
+
+    def end(self):
+        """Put the collector back the way it was before begin."""
+        if self.mode == 'default':
+            return
+        if self.mode == 'tuned':
+            gc.set_threshold(*self.saved_thresholds)
+        gc.unfreeze()
+        self.mode = 'default'
+
+gameplay_gc = GameplayGC()
@@ -0,0 +1,198 @@
+import csv
+import gc
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pyray as ray
+from pyinstrument import Profiler
+
+PROFILE_DIR = Path("cache")
+HISTORY_FRAMES = 300
+# The height of the graph in milliseconds, two frames at 60fps
+GRAPH_MS = 1000 / 30
+
+_NULL_SECTION = nullcontext()
+
+class _Section:
+    """Times one named subsystem, adding to its total for the current frame."""
+    __slots__ = ('totals', 'name', 'start')
+
+    def __init__(self, totals: dict[str, float], name: str):
+        self.totals = totals
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.totals[self.name] = self.totals.get(self.name, 0.0) + time.perf_counter() - self.start
+
+class FrameProfiler:
+    """Records the wall time of every frame and of the subsystems measured in it.
+
+    Subsystems are measured with `with profiler.section(name):`. Sections only cost
+    a lookup while the profiler is disabled. The same section can run several
+    times a frame (for example once per player), its times are added together.
+
+    Events such as allocations are counted per frame with profiler.count(name), and
+    every garbage collection is timed as the 'gc' section and counted per generation.
+
+    The overlay draws a graph of the last HISTORY_FRAMES frame times with their
+    p50/p99/max, the average and worst time of every section and the average and
+    highest count of every counter. A trace of the
+    recorded frames can be written to a CSV file, and a pyinstrument session can be
+    recorded for a full call tree.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.frame_start: Optional[float] = None
+        self.totals: dict[str, float] = dict()
+        self.counts: dict[str, int] = dict()
+        self.frames: deque[tuple[float, dict[str, float], dict[str, int]]] = deque(maxlen=HISTORY_FRAMES)
+        self.sections: dict[str, _Section] = dict()
+        self.section_names: list[str] = []
+        self.count_names: list[str] = []
+        self.session: Optional[Profiler] = None
+        self.gc_start = 0.0
+        gc.callbacks.append(self._on_gc)
+
+    def toggle(self):
+        """Show or hide the overlay, recording frames while it is shown."""
+        self.enabled = not self.enabled
+        self.frames.clear()
+        self.totals = dict()
+        self.counts = dict()
+        self.sections.clear()
+        self.frame_start = None
+
+    def section(self, name: str):
+        """Return a context manager that times a subsystem for the current frame."""
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self.sections.get(name)
+        if section is None:
+            section = _Section(self.totals, name)
+            self.sections[name] = section
+            if name not in self.section_names:
+                self.section_names.append(name)
+        return section
+
+    def count(self, name: str, amount: int = 1):
+        """Add to a counter of the current frame."""
+        if not self.enabled:
+            return
+        counts = self.counts
+        if name not in counts:
+            counts[name] = 0
+            if name not in self.count_names:
+                self.count_names.append(name)
+        counts[name] += amount
+
+    def _on_gc(self, phase: str, info: dict[str, int]):
+        if not self.enabled:
+            return
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+            return
+        self.totals['gc'] = self.totals.get('gc', 0.0) + time.perf_counter() - self.gc_start
+        if 'gc' not in self.section_names:
+            self.section_names.append('gc')
+        self.count(f"gc gen{info['generation']}")
+
+    def begin_frame(self):
+        """Close the previous frame and start timing a new one. Called once per main loop iteration."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frames.append((now - self.frame_start, self.totals, self.counts))
+            self.totals = dict()
+            self.counts = dict()
+            for section in self.sections.values():
+                section.totals = self.totals
+        self.frame_start = now
+
+    def frame_stats(self) -> tuple[float, float, float]:
+        """Return the p50, p99 and max frame time in milliseconds over the recorded frames."""
+        if not self.frames:
+            return 0.0, 0.0, 0.0
+        frame_times = sorted(frame_time for frame_time, _, _ in self.frames)
+        count = len(frame_times)
+        return (frame_times[count // 2] * 1000, frame_times[min(count - 1, count * 99 // 100)] * 1000,
+                frame_times[-1] * 1000)
+
+    def dump_trace(self) -> Optional[Path]:
+        """Write the recorded frames to a CSV file in cache/, one row per frame with times in milliseconds."""
+        if not self.frames:
+            print("No frames recorded, press F3 to start the profiler")
+            return None
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"frame_trace_{datetime.now():%Y%m%d_%H%M%S}.csv"
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'frame_ms'] + self.section_names + self.count_names)
+            for i, (frame_time, totals, counts) in enumerate(self.frames):
+                writer.writerow([i, f"{frame_time * 1000:.3f}"] +
+                                [f"{totals.get(name, 0.0) * 1000:.3f}" for name in self.section_names] +
+                                [counts.get(name, 0) for name in self.count_names])
+        print(f"Frame trace written to {path}")
+        return path
+
+    def toggle_session(self) -> Optional[Path]:
+        """Start a pyinstrument session, or stop the running one and write it to an HTML file in cache/."""
+        if self.session is None:
+            self.session = Profiler()
+            self.session.start()
+            print("pyinstrument session started")
+            return None
+        self.session.stop()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"profile_{datetime.now():%Y%m%d_%H%M%S}.html"
+        path.write_text(self.session.output_html(), encoding='utf-8')
+        self.session = None
+        print(f"pyinstrument session written to {path}")
+        return path
+
+    def draw(self):
+        """Draw the frame time graph and section times in the top right corner."""
+        if not self.enabled:
+            return
+        graph_width = HISTORY_FRAMES
+        graph_height = 100
+        x = ray.get_screen_width() - graph_width - 10
+        y = 10
+        line_height = 18
+        text_height = (len(self.section_names) + len(self.count_names) + 1) * line_height + 10
+        ray.draw_rectangle(x - 5, y - 5, graph_width + 10, graph_height + text_height + 10, ray.fade(ray.BLACK, 0.75))
+
+        # Frame times, with the 60fps budget marked
+        scale = graph_height / GRAPH_MS
+        budget_y = y + graph_height - int(1000 / 60 * scale)
+        ray.draw_line(x, budget_y, x + graph_width, budget_y, ray.DARKGREEN)
+        for i, (frame_time, _, _) in enumerate(self.frames):
+            frame_ms = frame_time * 1000
+            height = min(graph_height, int(frame_ms * scale))
+            color = ray.GREEN if frame_ms <= 1000 / 60 else (ray.YELLOW if frame_ms <= GRAPH_MS else ray.RED)
+            ray.draw_line(x + i, y + graph_height, x + i, y + graph_height - height, color)
+
+        p50, p99, max_ms = self.frame_stats()
+        text_y = y + graph_height + 5
+        ray.draw_text(f"frame p50 {p50:.2f} p99 {p99:.2f} max {max_ms:.2f} ms", x, text_y, 16, ray.WHITE)
+        count = max(1, len(self.frames))
+        for name in self.section_names:
+            text_y += line_height
+            total = sum(totals.get(name, 0.0) for _, totals, _ in self.frames)
+            worst = max((totals.get(name, 0.0) for _, totals, _ in self.frames), default=0.0)
+            ray.draw_text(f"{name} avg {total / count * 1000:.2f} max {worst * 1000:.2f} ms", x, text_y, 16, ray.LIGHTGRAY)
+        for name in self.count_names:
+            text_y += line_height
+            total = sum(counts.get(name, 0) for _, _, counts in self.frames)
+            most = max((counts.get(name, 0) for _, _, counts in self.frames), default=0)
+            ray.draw_text(f"{name} avg {total / count:.2f} max {most} /frame", x, text_y, 16, ray.SKYBLUE)
+
+profiler = FrameProfiler()
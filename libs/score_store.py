@@ -0,0 +1,222 @@
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+SCORES_DB_PATH = Path("scores.db")
+WRITE_BATCH_SIZE = 256
+# SQLite limits the number of ? placeholders in one statement
+READ_CHUNK_SIZE = 500
+
+_SELECT_SCORES = "SELECT hash, score, good, ok, bad, clear FROM Scores"
+
+ScoreOperation = Callable[[sqlite3.Cursor], Optional[Iterable[str]]]
+
+class ScoreStore:
+    """Single point of access to the scores database.
+
+    One connection in WAL mode is shared by every thread and guarded by a lock.
+    Statements are written as constant SQL so sqlite3's prepared statement cache
+    reuses them. Reads are answered from an in-memory copy of the scores, which
+    preload() fills with a single query. Writes are queued and applied by a background
+    writer thread that commits everything queued so far in one transaction. The cached
+    rows a write touched are invalidated and read again by the writer once the
+    transaction commits, so the render thread never waits on the disk. The writer
+    holds the connection lock through the commit, so submit() never takes it.
+
+    Args:
+        db_path (Path): The path to the scores database.
+    """
+    def __init__(self, db_path: Path = SCORES_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self._connection = None
+        # hash -> (score, good, ok, bad, clear), or None for a hash without a score
+        self.cache: dict[str, Optional[tuple]] = dict()
+        self.cache_complete = False
+        self.queue: queue.Queue[Optional[ScoreOperation]] = queue.Queue()
+        self.writer = None
+        # Guards starting and stopping the writer only
+        self.writer_lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection to the scores database, created and migrated on first use."""
+        with self.lock:
+            if self._connection is None:
+                self._connection = self._connect()
+            return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode a commit only appends to the log, the log is synced on checkpoints
+        connection.execute("PRAGMA synchronous=NORMAL")
+        cursor = connection.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS Scores (
+                hash TEXT PRIMARY KEY,
+                en_name TEXT NOT NULL,
+                jp_name TEXT NOT NULL,
+                diff INTEGER,
+                score INTEGER,
+                good INTEGER,
+                ok INTEGER,
+                bad INTEGER,
+                drumroll INTEGER,
+                combo INTEGER,
+                clear INTEGER,
+                version INTEGER NOT NULL DEFAULT 1
+            );
+        ''')
+        connection.commit()
+        # The migrations will eventually be removed
+        # Migrate existing records: track which chart hash version each score is keyed by.
+        # Rows from before the column existed use the legacy hash and are re-keyed by build_song_hashes
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(Scores)")}
+        if 'version' not in columns:
+            cursor.execute("ALTER TABLE Scores ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            connection.commit()
+        # Migrate existing records: set clear=2 for full combos (bad=0)
+        cursor.execute("""
+            UPDATE Scores
+            SET clear = 2
+            WHERE bad = 0 AND (clear IS NULL OR clear <> 2)
+        """)
+        connection.commit()
+        return connection
+
+    def preload(self):
+        """Read every score into the cache, so later reads never touch the database."""
+        with self.lock:
+            rows = self.connection.execute(_SELECT_SCORES).fetchall()
+            self.cache = {row[0]: row[1:] for row in rows}
+            self.cache_complete = True
+
+    def get_scores(self, hashes: Iterable[str]) -> dict[str, Optional[tuple]]:
+        """Return the (score, good, ok, bad, clear) of every hash, or None for charts without a score."""
+        hashes = list(hashes)
+        cache = self.cache
+        if self.cache_complete:
+            return {hash_val: cache.get(hash_val) for hash_val in hashes}
+        missing = [hash_val for hash_val in hashes if hash_val not in cache]
+        if missing:
+            with self.lock:
+                self._read_rows(missing)
+            cache = self.cache
+        return {hash_val: cache.get(hash_val) for hash_val in hashes}
+
+    def get_score(self, hash_val: str) -> Optional[tuple]:
+        """Return the (score, good, ok, bad, clear) of a chart, or None if it has no score."""
+        return self.get_scores([hash_val])[hash_val]
+
+    def count_legacy_scores(self, hash_version: int) -> int:
+        """Return the number of scores still keyed by a hash older than hash_version."""
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM Scores WHERE version < ?", (hash_version,)).fetchone()[0]
+
+    def submit(self, operation: ScoreOperation):
+        """Queue a write to be run by the writer thread.
+
+        The operation is called with a cursor inside the writer's transaction and
+        returns the hashes of the rows it changed, or None if it may have changed any
+        row. It must not commit.
+        """
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, name='score_store', daemon=True)
+                self.writer.start()
+        self.queue.put(operation)
+
+    def save_score(self, hash_val: str, en_name: str, jp_name: str, diff: int, score: int, good: int,
+                   ok: int, bad: int, drumroll: int, combo: int, clear: int, hash_version: int):
+        """Queue a play, keeping the stored score and clear if they are better."""
+        def write(cursor: sqlite3.Cursor) -> list[str]:
+            cursor.execute("SELECT score, clear FROM Scores WHERE hash = ? LIMIT 1", (hash_val,))
+            result = cursor.fetchone()
+            existing_score = result[0] if result is not None else None
+            existing_clear = result[1] if result is not None and result[1] is not None else 0
+            if result is None or (existing_score is not None and score > existing_score):
+                cursor.execute('''
+                    INSERT OR REPLACE INTO Scores (hash, en_name, jp_name, diff, score, good, ok, bad, drumroll, combo, clear, version)
+                    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                ''', (hash_val, en_name, jp_name, diff, score, good, ok, bad, drumroll, combo,
+                      max(existing_clear, clear), hash_version))
+            elif clear > existing_clear:
+                # Score didn't improve; if clear improved, update only the clear column to preserve best crown
+                cursor.execute("UPDATE Scores SET clear = ? WHERE hash = ?", (clear, hash_val))
+            return [hash_val]
+        self.submit(write)
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        if self.writer is not None:
+            self.queue.join()
+
+    def close(self):
+        """Commit the queued writes, stop the writer and close the connection."""
+        with self.writer_lock:
+            if self.writer is not None:
+                self.queue.put(None)
+                self.writer.join()
+                self.writer = None
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _read_rows(self, hashes: list[str]):
+        """Read the rows of hashes into the cache. Called with the lock held."""
+        rows = dict()
+        for start in range(0, len(hashes), READ_CHUNK_SIZE):
+            chunk = hashes[start:start + READ_CHUNK_SIZE]
+            rows.update(dict.fromkeys(chunk))
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.connection.execute(f"{_SELECT_SCORES} WHERE hash IN ({placeholders})", chunk):
+                rows[row[0]] = row[1:]
+        # A single update, so readers outside the lock never see a half-read chunk
+        self.cache.update(rows)
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            changed: set[str] = set()
+            changed_all = False
+            with self.lock:
+                cursor = self.connection.cursor()
+                for operation in batch:
+                    if operation is None:
+                        continue
+                    try:
+                        result = operation(cursor)
+                    except sqlite3.Error as e:
+                        print(f"Database error while writing scores: {e}")
+                        continue
+                    if result is None:
+                        changed_all = True
+                    else:
+                        changed.update(result)
+                try:
+                    self.connection.commit()
+                except sqlite3.Error as e:
+                    print(f"Database error while committing scores: {e}")
+                if changed_all:
+                    if self.cache_complete:
+                        self.preload()
+                    else:
+                        self.cache = dict()
+                elif changed:
+                    self._read_rows(list(changed))
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+score_store = ScoreStore()
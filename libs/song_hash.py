@@ -1,32 +1,25 @@
 import configparser
 import csv
-import json
+import multiprocessing
+import os
 import sqlite3
 import sys
-import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Iterator, Optional
 
-from libs.tja import NoteList, TJAParser, test_encodings
+from libs.score_store import ScoreStore, score_store
+from libs.song_index import SongIndex, song_index
+from libs.tja import HASH_VERSION, NoteList, TJAParser, read_text_file
 from libs.utils import get_config, global_data
 
 
-def diff_hashes_object_hook(obj):
-    if "diff_hashes" in obj:
-        obj["diff_hashes"] = {
-            int(key): value
-            for key, value in obj["diff_hashes"].items()
-        }
-    return obj
-
-class DiffHashesDecoder(json.JSONDecoder):
-    def __init__(self, *args, **kwargs):
-        super().__init__(object_hook=diff_hashes_object_hook, *args, **kwargs)
-
 def read_tjap3_score(input_file: Path):
     """Read a TJAPlayer3 score.ini file and return the scores and clears."""
     score_ini = configparser.ConfigParser()
-    encoding = test_encodings(input_file)
-    score_ini.read(input_file, encoding=encoding)
+    text, _ = read_text_file(input_file)
+    score_ini.read_string(text, source=str(input_file))
     scores = [int(score_ini['HiScore.Drums']['HiScore1']),
               int(score_ini['HiScore.Drums']['HiScore2']),
               int(score_ini['HiScore.Drums']['HiScore3']),
@@ -51,28 +44,148 @@ def read_tjap3_score(input_file: Path):
     else:
         return scores, clears, None
 
-def build_song_hashes(output_dir=Path("cache")):
-    """Build a dictionary of song hashes and save it to a file."""
-    if not output_dir.exists():
-        output_dir.mkdir()
-    song_hashes: dict[str, list[dict]] = dict()
-    path_to_hash: dict[str, str] = dict()  # New index for O(1) path lookups
-    output_path = Path(output_dir / "song_hashes.json")
-    index_path = Path(output_dir / "path_to_hash.json")
-
-    # Load existing data
-    if output_path.exists():
-        with open(output_path, "r", encoding="utf-8") as f:
-            song_hashes = json.load(f, cls=DiffHashesDecoder)
-    if index_path.exists():
-        with open(index_path, "r", encoding="utf-8") as f:
-            path_to_hash = json.load(f)
-
-    saved_timestamp = 0.0
-    current_timestamp = time.time()
-    if (output_dir / 'timestamp.txt').exists():
-        with open(output_dir / 'timestamp.txt', 'r') as f:
-            saved_timestamp = float(f.read())
+# Below this many changed files, starting worker processes costs more than it saves
+PARALLEL_SCAN_MIN_FILES = 8
+
+def hash_tja_file(tja_path: Path, legacy_hashes: bool = False) -> Optional[dict]:
+    """Parse a TJA file and hash the notes of every difficulty.
+
+    This is the per-file work of build_song_hashes and runs inside a worker process,
+    so it only touches its arguments and returns plain data.
+
+    Args:
+        tja_path (Path): The path to the TJA file.
+        legacy_hashes (bool): Also compute the pre-HASH_VERSION 2 hash of every difficulty.
+
+    Returns:
+        Optional[dict]: The song hash entry, or None if the file could not be parsed or has no notes.
+    """
+    all_notes = NoteList()
+    diff_hashes = dict()
+    legacy_diff_hashes = dict()
+    try:
+        tja = TJAParser(tja_path)
+        for diff in tja.metadata.course_data:
+            # notes_to_position only advances current_ms, so rewind it instead of re-reading the file
+            tja.current_ms = tja.start_delay
+            diff_notes, _, _, _ = tja.notes_to_position(diff)
+            diff_hashes[diff] = tja.hash_note_data(diff_notes)
+            if legacy_hashes:
+                legacy_diff_hashes[diff] = tja.legacy_hash_note_data(diff_notes)
+            all_notes.play_notes.extend(diff_notes.play_notes)
+            all_notes.bars.extend(diff_notes.bars)
+    except Exception as e:
+        print(f"Failed to parse TJA {tja_path}: {e}")
+        return None
+
+    if all_notes == NoteList():
+        print(tja_path)
+        return None
+
+    return {
+        "hash": tja.hash_note_data(all_notes),
+        "file_path": str(tja_path),
+        "encoding": tja.encoding,
+        "title": tja.metadata.title,
+        "subtitle": tja.metadata.subtitle,
+        "diff_hashes": diff_hashes,
+        "legacy_diff_hashes": legacy_diff_hashes
+    }
+
+def scan_tja_files(tja_files: list[Path], legacy_hashes: bool = False) -> Iterator[Optional[dict]]:
+    """Hash a list of TJA files across all cores, yielding one result per file in order."""
+    if len(tja_files) < PARALLEL_SCAN_MIN_FILES:
+        for tja_path in tja_files:
+            yield hash_tja_file(tja_path, legacy_hashes)
+        return
+    workers = os.cpu_count() or 1
+    chunksize = max(1, min(16, len(tja_files) // (workers * 4)))
+    # Spawn rather than fork, the scan runs on a thread next to the window and audio device
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        yield from executor.map(partial(hash_tja_file, legacy_hashes=legacy_hashes), tja_files, chunksize=chunksize)
+
+def migrate_score_hashes(hash_migrations: list[tuple[str, str]], store: ScoreStore = score_store):
+    """Queue re-keying the scores saved under a legacy hash to the current one.
+
+    Args:
+        hash_migrations (list[tuple[str, str]]): Pairs of (current hash, legacy hash).
+        store (ScoreStore): The score store to write to.
+    """
+    def migrate(cursor: sqlite3.Cursor) -> None:
+        # OR IGNORE keeps a score already saved under the new hash instead of failing the batch
+        cursor.executemany("""
+            UPDATE OR IGNORE Scores SET hash = ?, version = ?
+            WHERE hash = ? AND version < ?
+        """, [(new_hash, HASH_VERSION, legacy_hash, HASH_VERSION) for new_hash, legacy_hash in hash_migrations])
+        print(f"Migrated {cursor.rowcount} scores to chart hash version {HASH_VERSION}")
+    store.submit(migrate)
+
+def import_tjap3_scores(imports: list[tuple], store: ScoreStore = score_store):
+    """Queue storing the scores read from TJAPlayer3 score.ini files that beat the stored ones.
+
+    Args:
+        imports (list[tuple]): (hash, English title, Japanese title, difficulty, score, clear, bad) of every score.
+        store (ScoreStore): The score store to write to.
+    """
+    def import_scores(cursor: sqlite3.Cursor) -> list[str]:
+        for diff_hash, en_name, jp_name, diff, score, clear, bads in imports:
+            cursor.execute("SELECT score FROM scores WHERE hash = ?", (diff_hash,))
+            existing_record = cursor.fetchone()
+            if existing_record and existing_record[0] >= score:
+                continue
+            cursor.execute("""
+                INSERT OR REPLACE INTO scores (hash, en_name, jp_name, diff, score, clear, bad, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (diff_hash, en_name, jp_name, diff, score, clear, bads, HASH_VERSION))
+            if cursor.rowcount > 0:
+                action = "Added" if not existing_record else "Updated"
+                print(f"{action} entry for {en_name} ({diff}) - Score: {score}")
+        return [diff_hash for diff_hash, *_ in imports]
+    store.submit(import_scores)
+
+def update_score_hashes(db_updates: list[tuple[str, str, str, int]], store: ScoreStore = score_store):
+    """Queue pointing the scores of every chart, matched by title and difficulty, at its current hash.
+
+    Args:
+        db_updates (list[tuple[str, str, str, int]]): (hash, English title, Japanese title, difficulty) of every chart.
+        store (ScoreStore): The score store to write to.
+    """
+    def update_hashes(cursor: sqlite3.Cursor) -> None:
+        for diff_hash, en_name, jp_name, diff in db_updates:
+            # Update existing entries that match by name and difficulty
+            cursor.execute("""
+                UPDATE scores
+                SET hash = ?, version = ?
+                WHERE (en_name = ? AND jp_name = ?) AND diff = ?
+            """, (diff_hash, HASH_VERSION, en_name, jp_name, diff))
+            if cursor.rowcount > 0:
+                print(f"Updated {cursor.rowcount} entries for {en_name} ({diff})")
+        print(f"Database update completed. Processed {len(db_updates)} difficulty hash updates.")
+    store.submit(update_hashes)
+
+def remove_legacy_song_hashes(index: SongIndex):
+    """Remove the song_hashes.json/timestamp.txt cache written by older versions.
+
+    Its chart hashes are from before HASH_VERSION 2, so every file it lists is
+    parsed again by build_song_hashes, which also finds the legacy hashes of the
+    scores to migrate.
+    """
+    cache_dir = index.db_path.parent
+    for legacy_file in ("song_hashes.json", "path_to_hash.json", "timestamp.txt"):
+        (cache_dir / legacy_file).unlink(missing_ok=True)
+
+def build_song_hashes(index: SongIndex = song_index):
+    """Bring the song index up to date with the song library.
+
+    Every TJA file is stat'ed and compared against its stored row; only new or changed
+    files are parsed. global_data.song_paths is pointed at the index.
+
+    Returns:
+        SongHashesView: A mapping of chart hash to song entries backed by the index.
+    """
+    remove_legacy_song_hashes(index)
+    stored_stats = index.file_stats()
 
     tja_paths = get_config()["paths"]["tja_path"]
     all_tja_files: list[Path] = []
@@ -82,28 +195,26 @@ def build_song_hashes(output_dir=Path("cache")):
 
     global_data.total_songs = len(all_tja_files)
     files_to_process = []
+    file_stats: dict[str, tuple[int, int, int]] = dict()
 
     for tja_path in all_tja_files:
         tja_path_str = str(tja_path)
-        current_modified = tja_path.stat().st_mtime
-        if current_modified <= saved_timestamp:
-            current_hash = path_to_hash.get(tja_path_str)
-            if current_hash is not None:
-                global_data.song_paths[tja_path] = current_hash
-                continue
-        current_hash = path_to_hash.get(tja_path_str)
-        if current_hash is None:
-            files_to_process.append(tja_path)
-        else:
+        stat = tja_path.stat()
+        # Rows hashed with an older HASH_VERSION are treated as changed so they get rehashed
+        file_stats[tja_path_str] = (stat.st_size, stat.st_mtime_ns, HASH_VERSION)
+        if stored_stats.get(tja_path_str) != file_stats[tja_path_str]:
             files_to_process.append(tja_path)
-            if current_hash in song_hashes:
-                del song_hashes[current_hash]
-            del path_to_hash[tja_path_str]
 
+    removed_files = stored_stats.keys() - file_stats.keys()
+    if removed_files:
+        index.remove(removed_files)
+        index.commit()
+    global_data.song_paths = index.paths
 
-    # Prepare database connection for updates
-    db_path = Path("scores.db")
     db_updates = []  # Store updates to batch process later
+    score_imports = []  # Scores read from TJAPlayer3 score.ini files
+    hash_migrations = []  # (new hash, legacy hash) pairs for scores saved under the old hash
+    migrate_scores = score_store.count_legacy_scores(HASH_VERSION) > 0
 
     # Process only files that need updating
     song_count = 0
@@ -111,59 +222,35 @@ def build_song_hashes(output_dir=Path("cache")):
     if total_songs > 0:
         global_data.total_songs = total_songs
 
-    for tja_path in files_to_process:
+    for tja_path, entry in zip(files_to_process, scan_tja_files(files_to_process, migrate_scores)):
+        song_count += 1
+        global_data.song_progress = song_count / total_songs
+        if song_count % 100 == 0:
+            index.commit()
         tja_path_str = str(tja_path)
-        current_modified = tja_path.stat().st_mtime
-        tja = TJAParser(tja_path)
-        all_notes = NoteList()
-        diff_hashes = dict()
-
-        try:
-            for diff in tja.metadata.course_data:
-                diff_notes, _, _, _ = TJAParser.notes_to_position(TJAParser(tja.file_path), diff)
-                diff_hashes[diff] = tja.hash_note_data(diff_notes)
-                all_notes.play_notes.extend(diff_notes.play_notes)
-                all_notes.bars.extend(diff_notes.bars)
-        except Exception as e:
-            print(f"Failed to parse TJA {tja_path}: {e}")
+        size, mtime_ns, _ = file_stats[tja_path_str]
+        if entry is None:
+            # Keep a row for the broken file so it is only retried once it changes
+            index.upsert(tja_path_str, size, mtime_ns, None, dict(), dict(), dict(), HASH_VERSION)
             continue
 
-        if all_notes == NoteList():
-            print(tja_path)
-            continue
-
-        hash_val = tja.hash_note_data(all_notes)
-        if hash_val not in song_hashes:
-            song_hashes[hash_val] = []
-
-        song_hashes[hash_val].append({
-            "file_path": tja_path_str,
-            "last_modified": current_modified,
-            "title": tja.metadata.title,
-            "subtitle": tja.metadata.subtitle,
-            "diff_hashes": diff_hashes
-        })
-
-        # Update both indexes
-        path_to_hash[tja_path_str] = hash_val
-        global_data.song_paths[tja_path] = hash_val
+        diff_hashes = entry["diff_hashes"]
+        index.upsert(tja_path_str, size, mtime_ns, entry["hash"], diff_hashes, entry["title"], entry["subtitle"], HASH_VERSION)
+        index.set_encoding(tja_path_str, size, mtime_ns, entry["encoding"])
+        for diff, legacy_hash in entry["legacy_diff_hashes"].items():
+            hash_migrations.append((diff_hashes[diff], legacy_hash))
 
         # Prepare database updates for each difficulty
-        en_name = tja.metadata.title.get('en', '') if isinstance(tja.metadata.title, dict) else str(tja.metadata.title)
-        jp_name = tja.metadata.title.get('jp', '') if isinstance(tja.metadata.title, dict) else ''
+        title = entry["title"]
+        en_name = title.get('en', '') if isinstance(title, dict) else str(title)
+        jp_name = title.get('jp', '') if isinstance(title, dict) else ''
 
         score_ini_path = tja_path.with_suffix('.tja.score.ini')
         if score_ini_path.exists():
             imported_scores, imported_clears, _ = read_tjap3_score(score_ini_path)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
             for i in range(len(imported_scores)):
                 if i not in diff_hashes or imported_scores[i] == 0:
                     continue
-                cursor.execute("SELECT score FROM scores WHERE hash = ?", (diff_hashes[i],))
-                existing_record = cursor.fetchone()
-                if existing_record and existing_record[0] >= imported_scores[i]:
-                    continue
                 if imported_clears[i] == 2:
                     bads = 0
                     clear = 2
@@ -173,57 +260,22 @@ def build_song_hashes(output_dir=Path("cache")):
                 else:
                     bads = None
                     clear = 0
-                cursor.execute("""
-                    INSERT OR REPLACE INTO scores (hash, en_name, jp_name, diff, score, clear, bad)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (diff_hashes[i], en_name, jp_name, i, imported_scores[i], clear, bads))
-                if cursor.rowcount > 0:
-                    action = "Added" if not existing_record else "Updated"
-                    print(f"{action} entry for {en_name} ({i}) - Score: {imported_scores[i]}")
-            conn.commit()
-            conn.close()
+                score_imports.append((diff_hashes[i], en_name, jp_name, i, imported_scores[i], clear, bads))
 
         for diff, diff_hash in diff_hashes.items():
             db_updates.append((diff_hash, en_name, jp_name, diff))
 
-        song_count += 1
-        global_data.song_progress = song_count / total_songs
+    # The score writes run on the score store's writer thread, in this order
+    if score_imports:
+        import_tjap3_scores(score_imports)
+    if hash_migrations:
+        migrate_score_hashes(hash_migrations)
+    if db_updates:
+        update_score_hashes(db_updates)
+
+    index.commit()
 
-    # Update database with new difficulty hashes
-    if db_updates and db_path.exists():
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            for diff_hash, en_name, jp_name, diff in db_updates:
-                # Update existing entries that match by name and difficulty
-                cursor.execute("""
-                    UPDATE scores
-                    SET hash = ?
-                    WHERE (en_name = ? AND jp_name = ?) AND diff = ?
-                """, (diff_hash, en_name, jp_name, diff))
-                if cursor.rowcount > 0:
-                    print(f"Updated {cursor.rowcount} entries for {en_name} ({diff})")
-
-            conn.commit()
-            conn.close()
-            print(f"Database update completed. Processed {len(db_updates)} difficulty hash updates.")
-
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-        except Exception as e:
-            print(f"Error updating database: {e}")
-    elif db_updates:
-        print(f"Warning: scores.db not found, skipping {len(db_updates)} database updates")
-
-    # Save both files
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(song_hashes, f, indent=2, ensure_ascii=False)
-    with open(index_path, "w", encoding="utf-8") as f:
-        json.dump(path_to_hash, f, indent=2, ensure_ascii=False)
-    with open(output_dir / 'timestamp.txt', 'w') as f:
-        f.write(str(current_timestamp))
-
-    return song_hashes
+    return index.hashes
 
 def process_tja_file(tja_file):
     """Process a single TJA file and return hash or None if error"""
@@ -265,7 +317,7 @@ def get_japanese_songs_for_version(csv_file_path, version_column):
         root_path = Path(root_dir)
         all_tja_files.extend(root_path.rglob("*.tja"))
     for tja in all_tja_files:
-        tja_parse = TJAParser(tja)
+        tja_parse = TJAParser(tja, metadata_only=True)
         tja_name = tja_parse.metadata.title.get(
             "ja", tja_parse.metadata.title["en"]
         )
@@ -326,7 +378,7 @@ def get_japanese_songs_for_version(csv_file_path, version_column):
         else:
             path = Path(input(f"NOT FOUND {title}: "))
         hash = process_tja_file(path)
-        tja_parse = TJAParser(Path(path))
+        tja_parse = TJAParser(Path(path), metadata_only=True)
         genre = Path(path).parent.parent.name
         if genre not in text_files:
             text_files[genre] = []
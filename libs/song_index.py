@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+SONG_INDEX_PATH = Path("cache/song_index.db")
+
+_ENTRY_COLUMNS = "path, mtime_ns, title, subtitle, diff_hashes"
+
+def _row_to_entry(row: tuple) -> dict:
+    path, mtime_ns, title, subtitle, diff_hashes = row
+    return {
+        "file_path": path,
+        "last_modified": mtime_ns / 1_000_000_000,
+        "title": json.loads(title),
+        "subtitle": json.loads(subtitle),
+        "diff_hashes": {int(diff): diff_hash for diff, diff_hash in json.loads(diff_hashes).items()}
+    }
+
+class SongIndex:
+    """SQLite index of every TJA file in the song library.
+
+    One row is stored per file together with the size and modification time it was
+    hashed at, so startup only has to stat the library and compare it against the
+    stored rows. Files that failed to parse are kept with a NULL hash so they are
+    not parsed again until they change. The detected text encoding of TJA and box.def
+    files is kept alongside so they can be decoded without trying every encoding.
+
+    Args:
+        db_path (Path): The path to the index database.
+    """
+    def __init__(self, db_path: Path = SONG_INDEX_PATH):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.hashes = SongHashesView(self)
+        self.paths = SongPathsView(self)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection to the index, opened on first use."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.db_path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS songs (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    hash TEXT,
+                    diff_hashes TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    subtitle TEXT NOT NULL,
+                    hash_version INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(songs)")}
+            if 'hash_version' not in columns:
+                connection.execute("ALTER TABLE songs ADD COLUMN hash_version INTEGER NOT NULL DEFAULT 1")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_songs_hash ON songs(hash)")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS file_encodings (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    encoding TEXT NOT NULL
+                )
+            """)
+            connection.commit()
+            self.local.connection = connection
+        return connection
+
+    def file_stats(self) -> dict[str, tuple[int, int, int]]:
+        """Return the size, modification time and hash version every indexed file was hashed at."""
+        cursor = self.connection.execute("SELECT path, size, mtime_ns, hash_version FROM songs")
+        return {path: (size, mtime_ns, hash_version) for path, size, mtime_ns, hash_version in cursor}
+
+    def upsert(self, path: str, size: int, mtime_ns: int, hash_val: Optional[str],
+               diff_hashes: dict[int, str], title: dict[str, str], subtitle: dict[str, str], hash_version: int):
+        """Insert or update the row for a single file. Changes are written on commit()."""
+        self.connection.execute("""
+            INSERT INTO songs (path, size, mtime_ns, hash, diff_hashes, title, subtitle, hash_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                hash = excluded.hash,
+                diff_hashes = excluded.diff_hashes,
+                title = excluded.title,
+                subtitle = excluded.subtitle,
+                hash_version = excluded.hash_version
+        """, (path, size, mtime_ns, hash_val, json.dumps(diff_hashes),
+              json.dumps(title, ensure_ascii=False), json.dumps(subtitle, ensure_ascii=False), hash_version))
+
+    def remove(self, paths: Iterable[str]):
+        """Remove the rows for files that no longer exist. Changes are written on commit()."""
+        rows = [(path,) for path in paths]
+        self.connection.executemany("DELETE FROM songs WHERE path = ?", rows)
+        self.connection.executemany("DELETE FROM file_encodings WHERE path = ?", rows)
+
+    def get_encoding(self, path: Path) -> Optional[str]:
+        """Return the stored text encoding of a file, or None if it is unknown or the file has changed since."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, encoding FROM file_encodings WHERE path = ?", (str(path),)).fetchone()
+        if row is None:
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (row[0], row[1]):
+            return None
+        return row[2]
+
+    def get_diff_hashes(self, path: Path, hash_version: int) -> dict[int, str]:
+        """Return the stored hash of every difficulty of a chart, or an empty dict if the
+        chart is not indexed, was hashed with another hash version or has changed since."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, hash_version, diff_hashes FROM songs WHERE path = ? AND hash IS NOT NULL",
+            (str(path),)).fetchone()
+        if row is None or row[2] != hash_version:
+            return {}
+        try:
+            stat = path.stat()
+        except OSError:
+            return {}
+        if (stat.st_size, stat.st_mtime_ns) != (row[0], row[1]):
+            return {}
+        return {int(diff): diff_hash for diff, diff_hash in json.loads(row[3]).items()}
+
+    def set_encoding(self, path: str, size: int, mtime_ns: int, encoding: Optional[str]):
+        """Store the text encoding detected for a file. Changes are written on commit()."""
+        if encoding is None:
+            return
+        self.connection.execute("""
+            INSERT INTO file_encodings (path, size, mtime_ns, encoding) VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                encoding = excluded.encoding
+        """, (path, size, mtime_ns, encoding))
+
+    def commit(self):
+        self.connection.commit()
+
+class SongHashesView(Mapping):
+    """Read-only mapping of chart hash to the songs with that hash, read from the song index on access."""
+    def __init__(self, index: SongIndex):
+        self.index = index
+
+    def __getitem__(self, hash_val: str) -> list[dict]:
+        rows = self.index.connection.execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM songs WHERE hash = ? ORDER BY rowid", (hash_val,)).fetchall()
+        if not rows:
+            raise KeyError(hash_val)
+        return [_row_to_entry(row) for row in rows]
+
+    def __contains__(self, hash_val) -> bool:
+        cursor = self.index.connection.execute("SELECT 1 FROM songs WHERE hash = ? LIMIT 1", (hash_val,))
+        return cursor.fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for hash_val, in self.index.connection.execute("SELECT DISTINCT hash FROM songs WHERE hash IS NOT NULL"):
+            yield hash_val
+
+    def __len__(self) -> int:
+        return self.index.connection.execute("SELECT COUNT(DISTINCT hash) FROM songs").fetchone()[0]
+
+    def items(self) -> Iterator[tuple[str, list[dict]]]:
+        """Iterate over every hash and its songs with a single query."""
+        cursor = self.index.connection.execute(
+            f"SELECT hash, {_ENTRY_COLUMNS} FROM songs WHERE hash IS NOT NULL ORDER BY hash, rowid")
+        current_hash = None
+        entries = []
+        for hash_val, *row in cursor:
+            if hash_val != current_hash and entries:
+                yield current_hash, entries
+                entries = []
+            current_hash = hash_val
+            entries.append(_row_to_entry(tuple(row)))
+        if entries:
+            yield current_hash, entries
+
+class SongPathsView(Mapping):
+    """Read-only mapping of song path to chart hash, read from the song index on access."""
+    def __init__(self, index: SongIndex):
+        self.index = index
+
+    def __getitem__(self, path: Path) -> str:
+        row = self.index.connection.execute(
+            "SELECT hash FROM songs WHERE path = ? AND hash IS NOT NULL", (str(path),)).fetchone()
+        if row is None:
+            raise KeyError(path)
+        return row[0]
+
+    def __contains__(self, path) -> bool:
+        cursor = self.index.connection.execute(
+            "SELECT 1 FROM songs WHERE path = ? AND hash IS NOT NULL", (str(path),))
+        return cursor.fetchone() is not None
+
+    def __iter__(self) -> Iterator[Path]:
+        for path, in self.index.connection.execute("SELECT path FROM songs WHERE hash IS NOT NULL"):
+            yield Path(path)
+
+    def __len__(self) -> int:
+        return self.index.connection.execute("SELECT COUNT(*) FROM songs WHERE hash IS NOT NULL").fetchone()[0]
+
+song_index = SongIndex()
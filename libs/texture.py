@@ -1,31 +1,193 @@
-import copy
 import json
 import os
-import tempfile
+import time
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Iterable, Optional, Union
 
 import pyray as ray
+from raylib import rl
 
 from libs.animation import BaseAnimation, parse_animations
+from libs.profiler import profiler
 
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
+# Threads decoding PNGs while textures load. raylib's decoder runs without the GIL
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Written into a zip by libs.atlas_packer, with its pages as atlas/<page>.png
+ATLAS_JSON = 'atlas.json'
+
+_decode_pool: Optional[ThreadPoolExecutor] = None
+# The texture drawn last by any wrapper, raylib starts a new draw call when it changes
+_last_texture_id = -1
+# Called straight through cffi by draw_sprites, skipping pyray's argument conversion
+draw_texture_pro_c = rl.DrawTexturePro
+# Reused for every sprite drawn by draw_sprites
+_sprite_source = ray.Rectangle(0, 0, 0, 0)
+_sprite_dest = ray.Rectangle(0, 0, 0, 0)
+_sprite_origin = ray.Vector2(0, 0)
+
+# (texture name, frame, x, y, color, x2) of a sprite drawn by TextureWrapper.draw_sprites
+Sprite = tuple[str, int, float, float, ray.Color, float]
+
+@dataclass(slots=True)
+class LoadReport:
+    """The time spent loading the textures of a screen.
+
+    Attributes:
+        zips (int): The zip files loaded.
+        images (int): The PNG files decoded.
+        bytes (int): The size of the PNG files.
+        read_ms (float): Time spent reading the zips on the main thread.
+        decode_ms (float): Time spent decoding, added up over the decode threads.
+        upload_ms (float): Time spent uploading to the GPU on the main thread.
+        wait_ms (float): Time the main thread waited for images still being decoded.
+        total_ms (float): Wall time of the whole load.
+        resident (int): The zips that were still resident and did not need loading.
+    """
+    zips: int = 0
+    images: int = 0
+    bytes: int = 0
+    read_ms: float = 0.0
+    decode_ms: float = 0.0
+    upload_ms: float = 0.0
+    wait_ms: float = 0.0
+    total_ms: float = 0.0
+    resident: int = 0
+
+    def __str__(self):
+        return (f"{self.zips} zips ({self.resident} resident), {self.images} images ({self.bytes / 1_000_000:.1f} MB) in {self.total_ms:.0f} ms: "
+                f"read {self.read_ms:.0f} ms, decode {self.decode_ms:.0f} ms on {DECODE_WORKERS} threads, "
+                f"waited {self.wait_ms:.0f} ms, upload {self.upload_ms:.0f} ms")
+
+def decode_png(data: bytes) -> tuple[ray.Image, int]:
+    """Decode a PNG into a CPU image, returning it with the nanoseconds the decode took."""
+    start = time.perf_counter_ns()
+    image = ray.load_image_from_memory('.png', data, len(data))
+    return image, time.perf_counter_ns() - start
+
+def get_decode_pool() -> ThreadPoolExecutor:
+    """Return the decode threads, starting them on first use."""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(DECODE_WORKERS, thread_name_prefix="decode")
+    return _decode_pool
+
+def decode_zip(zip: Path, report: LoadReport) -> tuple[dict[str, Any], list[Future],
+                                                   list[tuple[str, bool, list[Future], Optional[list[list[int]]]]]]:
+    """Read every texture of a zip into memory and start decoding them on the decode threads.
+
+    Args:
+        zip (Path): The zip file, holding a texture.json and a PNG or a folder of
+            numbered PNG frames for every texture in it. When it holds an atlas.json,
+            the textures packed in its atlas pages are not decoded by themselves.
+        report (LoadReport): Receives the number of images, their size and the read time.
+
+    Returns:
+        The contents of texture.json, a future of decode_png for every atlas page,
+        and for every texture its name, whether it has frames, a future of
+        decode_png for each of its images in order, and the [page, x, y, width, height]
+        of each of its frames if it is in an atlas instead.
+    """
+    pool = get_decode_pool()
+    start = time.perf_counter()
+    with zipfile.ZipFile(zip, 'r') as zip_ref:
+        names = zip_ref.namelist()
+        if 'texture.json' not in names:
+            raise Exception(f"texture.json file missing from {zip}")
+        with zip_ref.open('texture.json') as json_file:
+            tex_mapping_data = json.loads(json_file.read().decode('utf-8'))
+        atlas = {'pages': [], 'textures': {}}
+        if ATLAS_JSON in names:
+            with zip_ref.open(ATLAS_JSON) as json_file:
+                atlas = json.loads(json_file.read().decode('utf-8'))
+
+        # Every texture is checked before anything is decoded
+        textures = []
+        for tex_name in tex_mapping_data:
+            folder = f"{tex_name}/"
+            if tex_name in atlas['textures']:
+                packed = atlas['textures'][tex_name]
+                textures.append((tex_name, packed['frames'], [], packed['rects']))
+            elif folder in names:
+                frames = [name for name in names
+                          if name.startswith(folder) and name != folder and '/' not in name[len(folder):]]
+                textures.append((tex_name, True, sorted(frames, key=lambda name: int(Path(name).stem)), None))
+            elif f"{tex_name}.png" in names:
+                textures.append((tex_name, False, [f"{tex_name}.png"], None))
+            else:
+                raise Exception(f"Texture {tex_name} was not found in {zip}")
+
+        def submit(member: str) -> Future:
+            data = zip_ref.read(member)
+            report.images += 1
+            report.bytes += len(data)
+            return pool.submit(decode_png, data)
+
+        pages = [submit(page) for page in atlas['pages']]
+        pending = [(tex_name, is_frames, [submit(member) for member in members], rects)
+                   for tex_name, is_frames, members, rects in textures]
+    report.zips += 1
+    report.read_ms += (time.perf_counter() - start) * 1000
+    return tex_mapping_data, pages, pending
+
+def upload_image(future: Future, report: LoadReport) -> ray.Texture:
+    """Upload an image decoded on the decode threads to the GPU and unload it."""
+    wait_start = time.perf_counter()
+    image, decode_ns = future.result()
+    upload_start = time.perf_counter()
+    texture = ray.load_texture_from_image(image)
+    ray.unload_image(image)
+    report.decode_ms += decode_ns / 1_000_000
+    report.wait_ms += (upload_start - wait_start) * 1000
+    report.upload_ms += (time.perf_counter() - upload_start) * 1000
+    return texture
+
+def _unload_decoded(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        ray.unload_image(future.result()[0])
+
+def _discard_decoded_zip(future: Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    _, pages, pending = future.result()
+    for image_future in pages + [image_future for _, _, futures, _ in pending for image_future in futures]:
+        if not image_future.cancel():
+            image_future.add_done_callback(_unload_decoded)
+
+def discard_prefetch(future: Future):
+    """Free the images of a decode_zip future that will not be uploaded, without waiting for them."""
+    if not future.cancel():
+        future.add_done_callback(_discard_decoded_zip)
 
 class Texture:
-    """Texture class for managing textures and animations."""
-    def __init__(self, name: str, texture: Union[ray.Texture, list[ray.Texture]], init_vals: dict[str, int]):
+    """Texture class for managing textures and animations.
+
+    A texture packed in an atlas holds the atlas page of every frame, with the
+    position of the frame in it and the size of the frames."""
+    def __init__(self, name: str, texture: Union[ray.Texture, list[ray.Texture]], init_vals: dict[str, int],
+                 origins: Optional[list[tuple[int, int]]] = None, size: Optional[tuple[int, int]] = None):
         self.name = name
         self.texture = texture
         self.init_vals = init_vals
-        if isinstance(self.texture, list):
+        if size is not None:
+            self.width, self.height = size
+        elif isinstance(self.texture, list):
             self.width = self.texture[0].width
             self.height = self.texture[0].height
         else:
             self.width = self.texture.width
             self.height = self.texture.height
         self.is_frames = isinstance(self.texture, list)
+        # The top-left corner of every frame in its texture
+        if origins is None:
+            origins = [(0, 0)] * (len(self.texture) if isinstance(self.texture, list) else 1)
+        self.origins = origins
 
         self.x: list[int] = [0]
         self.y: list[int] = [0]
@@ -33,32 +195,90 @@ class Texture:
         self.y2: list[int] = [self.height]
         self.controllable: list[bool] = [False]
 
+    def frame_rect(self, frame: int = 0) -> ray.Rectangle:
+        """Return the source rectangle of a frame in its texture."""
+        origin_x, origin_y = self.origins[frame]
+        return ray.Rectangle(origin_x, origin_y, self.width, self.height)
+
+@dataclass(slots=True)
+class ResidentZip:
+    """The textures of a zip kept on the GPU.
+
+    Attributes:
+        textures (dict[str, Texture]): The textures of the zip by name.
+        uploaded (list[ray.Texture]): The GPU textures, each atlas page only once.
+        size (int): The bytes of GPU memory the textures take.
+        refs (int): The loads of the zip not released yet.
+    """
+    textures: dict[str, Texture]
+    uploaded: list[ray.Texture]
+    size: int
+    refs: int = 0
+
 class TextureWrapper:
-    """Texture wrapper class for managing textures and animations."""
-    def __init__(self):
+    """Texture wrapper class for managing textures and animations.
+
+    Loaded zips stay resident after unload_textures while they fit in the budget,
+    so a screen that is entered again does not load them again. The least
+    recently used zips are unloaded first once the budget is exceeded."""
+    def __init__(self, budget_mb: float = 0):
+        # The textures in use, by zip name
         self.textures: dict[str, dict[str, Texture]] = dict()
+        # Every zip on the GPU, least recently used first
+        self.resident: OrderedDict[Path, ResidentZip] = OrderedDict()
+        self.resident_size = 0
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.in_use: list[Path] = []
+        # Zips of a screen being read and decoded ahead of time, a future of decode_zip each
+        self.prefetched: dict[Path, Future] = dict()
+        # Prefetched zips that were already there at the last unload_textures
+        self.stale_prefetches: set[Path] = set()
+        # Read-only prototypes, and the animations shared by everything that does not ask for a copy
+        self.prototypes: dict[int, BaseAnimation] = dict()
         self.animations: dict[int, BaseAnimation] = dict()
         self.graphics_path = Path("Graphics")
+        self.load_reports: dict[str, LoadReport] = dict()
+
+    def set_budget(self, budget_mb: float):
+        """Set how many MB of textures may stay resident when they are not in use."""
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.evict()
 
     def unload_textures(self):
-        """Unload all textures and animations."""
-        for zip in self.textures:
-            for file in self.textures[zip]:
-                tex_object = self.textures[zip][file]
-                if isinstance(tex_object.texture, list):
-                    for texture in tex_object.texture:
-                        ray.unload_texture(texture)
-                else:
-                    ray.unload_texture(tex_object.texture)
+        """Release the textures in use, unloading the ones that do not fit in the budget.
+
+        A screen is prefetched before the current one ends, so prefetched zips are
+        kept through one unload and discarded at the next if they were not loaded."""
+        for zip in self.in_use:
+            self.resident[zip].refs -= 1
+        self.in_use.clear()
+        self.textures.clear()
+        for zip in self.stale_prefetches & self.prefetched.keys():
+            discard_prefetch(self.prefetched.pop(zip))
+        self.stale_prefetches = set(self.prefetched)
+        self.evict()
+
+    def evict(self):
+        """Unload the least recently used zips not in use until the rest fit in the budget."""
+        for zip in list(self.resident):
+            if self.resident_size <= self.budget:
+                break
+            resident = self.resident[zip]
+            if resident.refs > 0:
+                continue
+            for texture in resident.uploaded:
+                ray.unload_texture(texture)
+            self.resident_size -= resident.size
+            del self.resident[zip]
 
     def get_animation(self, index: int, is_copy: bool = False):
         """Get an animation by ID and returns a reference.
-        Returns a copy of the animation if is_copy is True."""
+        Returns a new animation cloned from its prototype if is_copy is True."""
         if index not in self.animations:
             raise Exception(f"Unable to find id {index} in loaded animations")
         if is_copy:
-            new_anim = copy.deepcopy(self.animations[index])
-            if self.animations[index].loop:
+            new_anim = self.prototypes[index].clone()
+            if new_anim.loop:
                 new_anim.start()
             return new_anim
         if self.animations[index].loop:
@@ -87,69 +307,83 @@ class TextureWrapper:
             tex_object.y2 = [tex_mapping.get("y2", tex_object.height)]
             tex_object.controllable = [tex_mapping.get("controllable", False)]
 
+    def set_animations(self, prototypes: dict[int, BaseAnimation]):
+        """Use a set of animation prototypes, cloning the shared animations from them."""
+        self.prototypes = prototypes
+        self.animations = {index: prototype.clone() for index, prototype in prototypes.items()}
+
     def load_animations(self, screen_name: str):
         """Load animations for a screen."""
         screen_path = self.graphics_path / screen_name
         if (screen_path / 'animation.json').exists():
             with open(screen_path / 'animation.json') as json_file:
-                self.animations = parse_animations(json.loads(json_file.read()))
+                self.set_animations(parse_animations(json.loads(json_file.read())))
 
     def load_zip(self, screen_name: str, subset: str):
-        """Load textures from a zip file."""
+        """Load textures from a zip file.
+
+        A resident zip is only put back in use. Otherwise the PNGs are decoded from
+        memory on the decode threads, and every image is uploaded to the GPU on this
+        thread as soon as it is decoded. The time spent is added to the load report
+        of the screen."""
         zip = (self.graphics_path / screen_name / subset).with_suffix('.zip')
-        if screen_name in self.textures and subset in self.textures[screen_name]:
+        if zip in self.in_use:
             return
-        with zipfile.ZipFile(zip, 'r') as zip_ref:
-            if 'texture.json' not in zip_ref.namelist():
-                raise Exception(f"texture.json file missing from {zip}")
-
-            with zip_ref.open('texture.json') as json_file:
-                tex_mapping_data = json.loads(json_file.read().decode('utf-8'))
-                self.textures[zip.stem] = dict()
-
-            for tex_name in tex_mapping_data:
-                if f"{tex_name}/" in zip_ref.namelist():
-                    tex_mapping = tex_mapping_data[tex_name]
-
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        zip_ref.extractall(temp_dir, members=[name for name in zip_ref.namelist()
-                                                            if name.startswith(tex_name)])
-
-                        extracted_path = Path(temp_dir) / tex_name
-                        if extracted_path.is_dir():
-                            frames = [ray.load_texture(str(frame)) for frame in sorted(extracted_path.iterdir(),
-                                      key=lambda x: int(x.stem)) if frame.is_file()]
-                        else:
-                            frames = [ray.load_texture(str(extracted_path))]
-                    self.textures[zip.stem][tex_name] = Texture(tex_name, frames, tex_mapping)
-                    self._read_tex_obj_data(tex_mapping, self.textures[zip.stem][tex_name])
-                elif f"{tex_name}.png" in zip_ref.namelist():
-                    tex_mapping = tex_mapping_data[tex_name]
-
-                    png_filename = f"{tex_name}.png"
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                        temp_file.write(zip_ref.read(png_filename))
-                        temp_path = temp_file.name
-
-                    try:
-                        tex = ray.load_texture(temp_path)
-                        self.textures[zip.stem][tex_name] = Texture(tex_name, tex, tex_mapping)
-                        self._read_tex_obj_data(tex_mapping, self.textures[zip.stem][tex_name])
-                    finally:
-                        os.unlink(temp_path)
+        start = time.perf_counter()
+        report = self.load_reports.setdefault(screen_name, LoadReport())
+        resident = self.resident.get(zip)
+        if resident is not None:
+            report.resident += 1
+        else:
+            if zip in self.prefetched:
+                tex_mapping_data, pages, pending = self.prefetched.pop(zip).result()
+            else:
+                tex_mapping_data, pages, pending = decode_zip(zip, report)
+            resident = ResidentZip(dict(), [], 0)
+            page_textures = [upload_image(future, report) for future in pages]
+            resident.uploaded.extend(page_textures)
+            for tex_name, is_frames, futures, rects in pending:
+                tex_mapping = tex_mapping_data[tex_name]
+                if rects is not None:
+                    frames = [page_textures[page] for page, _, _, _, _ in rects]
+                    tex_object = Texture(tex_name, frames if is_frames else frames[0], tex_mapping,
+                                         origins=[(x, y) for _, x, y, _, _ in rects], size=(rects[0][3], rects[0][4]))
                 else:
-                    raise Exception(f"Texture {tex_name} was not found in {zip}")
+                    frames = [upload_image(future, report) for future in futures]
+                    resident.uploaded.extend(frames)
+                    tex_object = Texture(tex_name, frames if is_frames else frames[0], tex_mapping)
+                resident.textures[tex_name] = tex_object
+                self._read_tex_obj_data(tex_mapping, tex_object)
+            resident.size = sum(texture.width * texture.height * 4 for texture in resident.uploaded)
+            self.resident[zip] = resident
+            self.resident_size += resident.size
+        self.resident.move_to_end(zip)
+        resident.refs += 1
+        self.in_use.append(zip)
+        self.textures[zip.stem] = resident.textures
+        report.total_ms += (time.perf_counter() - start) * 1000
+
+    def prefetch_screen(self, screen_name: str) -> None:
+        """Start reading and decoding the textures of a screen that are not resident
+        on the decode threads, so that load_screen_textures only has to upload them.
+        Meant to be called when a transition to the screen starts."""
+        for zip in (self.graphics_path / screen_name).glob('*.zip'):
+            if zip in self.resident or zip in self.prefetched:
+                continue
+            self.prefetched[zip] = get_decode_pool().submit(decode_zip, zip, LoadReport())
 
     def load_screen_textures(self, screen_name: str) -> None:
-        """Load textures for a screen."""
+        """Load textures for a screen, printing how long it took."""
         screen_path = self.graphics_path / screen_name
         if (screen_path / 'animation.json').exists():
             with open(screen_path / 'animation.json') as json_file:
-                self.animations = parse_animations(json.loads(json_file.read()))
+                self.set_animations(parse_animations(json.loads(json_file.read())))
+        self.load_reports[screen_name] = LoadReport()
         for zip in screen_path.iterdir():
             if zip.is_dir() or zip.suffix != ".zip":
                 continue
             self.load_zip(screen_name, zip.name)
+        print(f"Loaded {screen_name} textures: {self.load_reports[screen_name]}")
 
     def control(self, tex_object: Texture, index: int = 0):
         '''debug function'''
@@ -200,26 +434,88 @@ class TextureWrapper:
         else:
             final_color = color
         tex_object = self.textures[subset][texture]
-        if src is not None:
-            source_rect = src
-        else:
-            source_rect = ray.Rectangle(0, 0, tex_object.width * mirror_x, tex_object.height * mirror_y)
-        if center:
-            dest_rect = ray.Rectangle(tex_object.x[index] + (tex_object.width//2) - ((tex_object.width * scale)//2) + x, tex_object.y[index] + (tex_object.height//2) - ((tex_object.height * scale)//2) + y, tex_object.x2[index]*scale + x2, tex_object.y2[index]*scale + y2)
-        else:
-            dest_rect = ray.Rectangle(tex_object.x[index] + x, tex_object.y[index] + y, tex_object.x2[index]*scale + x2, tex_object.y2[index]*scale + y2)
-
         if tex_object.is_frames:
             if not isinstance(tex_object.texture, list):
                 raise Exception("Texture was marked as multiframe but is only 1 texture")
             if frame >= len(tex_object.texture):
                 raise Exception(f"Frame {frame} not available in iterable texture {tex_object.name}")
-            ray.draw_texture_pro(tex_object.texture[frame], source_rect, dest_rect, origin, rotation, final_color)
+            frame_texture = tex_object.texture[frame]
         else:
             if isinstance(tex_object.texture, list):
                 raise Exception("Texture is multiframe but was called as 1 texture")
-            ray.draw_texture_pro(tex_object.texture, source_rect, dest_rect, origin, rotation, final_color)
+            frame_texture = tex_object.texture
+            frame = 0
+        origin_x, origin_y = tex_object.origins[frame]
+        if src is not None:
+            source_rect = ray.Rectangle(src.x + origin_x, src.y + origin_y, src.width, src.height)
+        else:
+            source_rect = ray.Rectangle(origin_x, origin_y, tex_object.width * mirror_x, tex_object.height * mirror_y)
+        if center:
+            dest_rect = ray.Rectangle(tex_object.x[index] + (tex_object.width//2) - ((tex_object.width * scale)//2) + x, tex_object.y[index] + (tex_object.height//2) - ((tex_object.height * scale)//2) + y, tex_object.x2[index]*scale + x2, tex_object.y2[index]*scale + y2)
+        else:
+            dest_rect = ray.Rectangle(tex_object.x[index] + x, tex_object.y[index] + y, tex_object.x2[index]*scale + x2, tex_object.y2[index]*scale + y2)
+
+        if profiler.enabled:
+            global _last_texture_id
+            if frame_texture.id != _last_texture_id:
+                profiler.count('texture binds')
+                _last_texture_id = frame_texture.id
+        ray.draw_texture_pro(frame_texture, source_rect, dest_rect, origin, rotation, final_color)
         if tex_object.controllable[index]:
             self.control(tex_object)
 
+    def draw_sprites(self, subset: str, sprites: Iterable[Sprite]) -> None:
+        """
+        Draw many textures of a subset in order with the same source and destination
+        rectangles, changed in place for every sprite. A sprite is drawn as
+        draw_texture(subset, texture, color=color, frame=frame, x=x, y=y, x2=x2) would,
+        at its first position and without scaling, mirroring or rotation.
+        Parameters:
+            subset (str): The subset of textures to use.
+            sprites (Iterable[Sprite]): The (texture name, frame, x, y, color, x2) of every sprite.
+        """
+        global _last_texture_id
+        textures = self.textures[subset]
+        source = _sprite_source
+        dest = _sprite_dest
+        count_binds = profiler.enabled
+        for texture, frame, x, y, color, x2 in sprites:
+            tex_object = textures[texture]
+            if tex_object.is_frames:
+                frame_texture = tex_object.texture[frame]
+            else:
+                frame_texture = tex_object.texture
+                frame = 0
+            source.x, source.y = tex_object.origins[frame]
+            source.width = tex_object.width
+            source.height = tex_object.height
+            dest.x = tex_object.x[0] + x
+            dest.y = tex_object.y[0] + y
+            dest.width = tex_object.x2[0] + x2
+            dest.height = tex_object.y2[0]
+            if count_binds and frame_texture.id != _last_texture_id:
+                profiler.count('texture binds')
+                _last_texture_id = frame_texture.id
+            draw_texture_pro_c(frame_texture, source, dest, _sprite_origin, 0.0, color)
+
+class SpriteBatch:
+    """Collects the sprites of a subset over a frame and draws them with one
+    draw_sprites call. The list of sprites is kept between frames."""
+    __slots__ = ('wrapper', 'subset', 'sprites')
+
+    def __init__(self, wrapper: TextureWrapper, subset: str):
+        self.wrapper = wrapper
+        self.subset = subset
+        self.sprites: list[Sprite] = []
+
+    def add(self, texture: str, frame: int, x: float, y: float, color: ray.Color = ray.WHITE, x2: float = 0) -> None:
+        """Queue a sprite, drawn over the sprites queued before it."""
+        self.sprites.append((texture, frame, x, y, color, x2))
+
+    def flush(self) -> None:
+        """Draw the queued sprites and empty the queue."""
+        if self.sprites:
+            self.wrapper.draw_sprites(self.subset, self.sprites)
+            self.sprites.clear()
+
 tex = TextureWrapper()
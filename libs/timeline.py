@@ -0,0 +1,100 @@
+import csv
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from libs.audio import audio
+
+LOG_DIR = Path("cache")
+DRIFT_LOG_FRAMES = 7200
+# Share of the measured drift corrected every frame. The played time of a music
+# stream only advances once per audio buffer, so the drift is averaged over many
+# frames instead of followed frame by frame
+DRIFT_GAIN = 0.02
+# A drift larger than this is a stall or a seek, not clock drift, and is corrected at once
+SNAP_MS = 100.0
+
+class SongTimeline:
+    """The clock of the game screen, locked to the music.
+
+    The time runs on perf_counter_ns from the moment start() is called, in the same
+    epoch as get_current_ms so animations keep working with it, but not rounded.
+    Once the music is playing, the position reported by get_music_time_played is
+    compared with the clock every frame and the clock is slowly pulled towards it,
+    or moved at once when they are more than SNAP_MS apart. The time never goes
+    backwards, if the music falls behind the clock waits for it.
+
+    Every correction is recorded in a drift log of the last DRIFT_LOG_FRAMES frames,
+    which can be written to a CSV file.
+    """
+    def __init__(self):
+        self.anchor_ns = time.perf_counter_ns()
+        self.anchor_ms = time.time() * 1000
+        self.correction_ms = 0.0
+        self.time_ms = self.anchor_ms
+        self.frame_ns = self.anchor_ns
+        self.music: Optional[str] = None
+        self.music_start_ms = 0.0
+        # (time of the frame in ms since start, drift in ms, correction in ms, whether it snapped)
+        self.drift_log: deque[tuple[float, float, float, bool]] = deque(maxlen=DRIFT_LOG_FRAMES)
+
+    def start(self):
+        """Restart the clock from the current time, without music."""
+        self.anchor_ns = time.perf_counter_ns()
+        self.anchor_ms = time.time() * 1000
+        self.correction_ms = 0.0
+        self.time_ms = self.anchor_ms
+        self.frame_ns = self.anchor_ns
+        self.music = None
+        self.drift_log.clear()
+
+    def sync_to_music(self, music: str, start_ms: float):
+        """Lock the clock to a music stream.
+
+        Args:
+            music (str): The name of the music stream.
+            start_ms (float): The time on this clock the start of the music belongs to.
+        """
+        self.music = music
+        self.music_start_ms = start_ms
+
+    def to_time_ms(self, time_ns: int) -> float:
+        """Convert a perf_counter_ns reading into a time on this clock."""
+        return self.anchor_ms + (time_ns - self.anchor_ns) / 1_000_000 + self.correction_ms
+
+    def update(self) -> float:
+        """Read the clock for a new frame, correcting it against the music. Called once per frame.
+
+        Returns:
+            float: The time of the frame in milliseconds.
+        """
+        self.frame_ns = time.perf_counter_ns()
+        clock_ms = self.to_time_ms(self.frame_ns)
+        if self.music is not None and audio.is_music_stream_playing(self.music):
+            music_ms = self.music_start_ms + audio.get_music_time_played(self.music) * 1000
+            drift = music_ms - clock_ms
+            snapped = abs(drift) > SNAP_MS
+            self.correction_ms += drift if snapped else drift * DRIFT_GAIN
+            clock_ms = self.to_time_ms(self.frame_ns)
+            self.drift_log.append((clock_ms - self.anchor_ms, drift, self.correction_ms, snapped))
+        self.time_ms = max(self.time_ms, clock_ms)
+        return self.time_ms
+
+    def dump_drift_log(self) -> Optional[Path]:
+        """Write the drift log to a CSV file in cache/, one row per frame with times in milliseconds."""
+        if not self.drift_log:
+            print("No drift recorded, the clock is only compared with the music while a song plays")
+            return None
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        path = LOG_DIR / f"drift_log_{datetime.now():%Y%m%d_%H%M%S}.csv"
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time_ms', 'drift_ms', 'correction_ms', 'snapped'])
+            for time_ms, drift, correction, snapped in self.drift_log:
+                writer.writerow([f"{time_ms:.3f}", f"{drift:.3f}", f"{correction:.3f}", int(snapped)])
+        print(f"Drift log written to {path}")
+        return path
+
+song_timeline = SongTimeline()
@@ -1,12 +1,20 @@
 import bisect
 import hashlib
+import heapq
+import locale
 import math
 import random
+import struct
+from array import array
 from collections import deque
-from dataclasses import dataclass, field, fields
+from dataclasses import InitVar, dataclass, field, fields
 from functools import lru_cache
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
+import numpy as np
+
+from libs.chart_cache import chart_cache
 from libs.global_data import Modifiers
 from libs.utils import get_pixels_per_frame, global_data, strip_comments
 
@@ -24,10 +32,13 @@ def get_pixels_per_ms(pixels_per_frame: float):
     """Calculate the number of pixels per millisecond."""
     return pixels_per_frame / (1000 / 60)
 
-@dataclass()
+@dataclass(slots=True)
 class Note:
     """A note in a TJA file.
 
+    Notes are slotted, so a field that was never assigned raises AttributeError
+    (hasattr() is used to check for optional fields like branch_params).
+
     Attributes:
         type (int): The type (color) of the note.
         hit_ms (float): The time at which the note should be hit.
@@ -90,61 +101,66 @@ class Note:
 
     def __hash__(self) -> int:
         """Make instances hashable for use in sets/dicts"""
-        return int(self.get_hash('md5')[:8], 16)  # Use first 8 chars of MD5 as int
+        return hash((self.type, self.hit_ms, self.load_ms))
+
+    def _copy_fields(self, source_note: 'Note'):
+        for field_name in Note.__slots__:
+            if hasattr(source_note, field_name):
+                setattr(self, field_name, getattr(source_note, field_name))
 
     def __repr__(self):
-        return str(self.__dict__)
+        return str({f.name: getattr(self, f.name) for f in fields(self) if hasattr(self, f.name)})
 
-@dataclass
+@dataclass(slots=True)
 class Drumroll(Note):
     """A drumroll note in a TJA file.
 
     Attributes:
-        _source_note (Note): The source note.
+        _source_note (Note): The note the drumroll is built from. Its fields are copied, the note itself is not kept.
         color (int): The color of the drumroll. (0-255 where 255 is red)
+        tail (Note): The roll end (type 8) that closes the drumroll. Unset if the end is in another branch section.
     """
-    _source_note: Note
+    _source_note: InitVar[Note]
     color: int = field(init=False)
+    tail: Note = field(init=False)
 
     def __repr__(self):
-        return str(self.__dict__)
+        return Note.__repr__(self)
 
     def __eq__(self, other):
         return self.hit_ms == other.hit_ms
 
-    def __post_init__(self):
-        for field_name in [f.name for f in fields(Note)]:
-            if hasattr(self._source_note, field_name):
-                setattr(self, field_name, getattr(self._source_note, field_name))
+    def __post_init__(self, _source_note: Note):
+        self._copy_fields(_source_note)
 
-@dataclass
+@dataclass(slots=True)
 class Balloon(Note):
     """A balloon note in a TJA file.
 
     Attributes:
-        _source_note (Note): The source note.
+        _source_note (Note): The note the balloon is built from. Its fields are copied, the note itself is not kept.
         count (int): The number of hits it takes to pop.
         popped (bool): Whether the balloon has been popped.
         is_kusudama (bool): Whether the balloon is a kusudama.
+        tail (Note): The roll end (type 8) that closes the balloon. Unset if the end is in another branch section.
     """
-    _source_note: Note
+    _source_note: InitVar[Note]
     count: int = field(init=False)
     popped: bool = False
     is_kusudama: bool = False
+    tail: Note = field(init=False)
 
     def __repr__(self):
-        return str(self.__dict__)
+        return Note.__repr__(self)
 
     def __eq__(self, other):
         return self.hit_ms == other.hit_ms
 
-    def __post_init__(self):
-        for field_name in [f.name for f in fields(Note)]:
-            if hasattr(self._source_note, field_name):
-                setattr(self, field_name, getattr(self._source_note, field_name))
+    def __post_init__(self, _source_note: Note):
+        self._copy_fields(_source_note)
 
     def _get_hash_data(self) -> bytes:
-        """Override to include source note and balloon-specific data"""
+        """Override to include balloon-specific data"""
         hash_fields = ['type', 'hit_ms', 'load_ms', 'count']
         field_values = []
 
@@ -156,27 +172,54 @@ class Balloon(Note):
         hash_string = str(field_values)
         return hash_string.encode('utf-8')
 
+@dataclass(slots=True)
+class BranchPoint:
+    """The condition of a #BRANCHSTART, worked out when the chart is positioned.
+
+    The notes before a branch can be in the sections of an earlier branch, so the
+    values that depend on them have one entry per branch level, in the order
+    normal, expert, master.
+
+    Attributes:
+        condition (str): 'p' for accuracy, 'r' for drumroll hits.
+        expert_req (float): The value needed for the expert branch.
+        master_req (float): The value needed for the master branch.
+        start_ms (float): The time the condition starts being counted, when the bar it is attached to is loaded.
+        end_ms (tuple[float, float, float]): The time the branch is decided, the first bar of the branch
+            being loaded for accuracy, the end of the last drumroll before it for drumroll hits.
+    """
+    condition: str
+    expert_req: float
+    master_req: float
+    start_ms: float
+    end_ms: tuple[float, float, float]
+
 @dataclass
 class NoteList:
     """A collection of notes
     play_notes: A list of notes, drumrolls, and balloons that are played by the player
     draw_notes: A list of notes, drumrolls, and balloons that are drawn by the player
-    bars: A list of bars"""
+    bars: A list of bars
+    branch_points: The condition of every branch, in the order of the branch sections. Only
+        set on the notes outside of branches"""
     play_notes: list[Note | Drumroll | Balloon] = field(default_factory=lambda: [])
     draw_notes: list[Note | Drumroll | Balloon] = field(default_factory=lambda: [])
     bars: list[Note] = field(default_factory=lambda: [])
+    branch_points: list[BranchPoint] = field(default_factory=lambda: [])
 
     def __add__(self, other: 'NoteList') -> 'NoteList':
         return NoteList(
             play_notes=self.play_notes + other.play_notes,
             draw_notes=self.draw_notes + other.draw_notes,
-            bars=self.bars + other.bars
+            bars=self.bars + other.bars,
+            branch_points=self.branch_points + other.branch_points
         )
 
     def __iadd__(self, other: 'NoteList') -> 'NoteList':
         self.play_notes += other.play_notes
         self.draw_notes += other.draw_notes
         self.bars += other.bars
+        self.branch_points += other.branch_points
         return self
 
 @dataclass
@@ -233,6 +276,274 @@ class TJAEXData:
     limited_time: bool = False
     new: bool = False
 
+CHART_CACHE_VERSION = 4
+_CHART_MAGIC = b'PTCC'
+_CHART_HEADER = struct.Struct('<4sHdHHH')
+_NOTE_LIST_HEADER = struct.Struct('<III')
+_NOTE_RECORD = struct.Struct('<BHBbdddddiiiH')
+_BRANCH_POINT_RECORD = struct.Struct('<Idddddd')
+_NOTE_FIELDS = [f.name for f in fields(Note)]
+_KIND_NOTE, _KIND_DRUMROLL, _KIND_BALLOON = 0, 1, 2
+_FLAG_DISPLAY, _FLAG_GOGO, _FLAG_BRANCH_START, _FLAG_POPPED, _FLAG_KUSUDAMA = 1, 2, 4, 8, 16
+# Times the parser gives back as ints, see _parse_notes
+_FLAG_INT_HIT, _FLAG_INT_LOAD = 32, 64
+
+def _pack_note(note: Note | Drumroll | Balloon, out: bytearray):
+    # Fields declared with init=False only exist once they have been assigned,
+    # so a presence mask is stored alongside the values to keep hasattr() checks intact
+    present = 0
+    for bit, field_name in enumerate(_NOTE_FIELDS):
+        if hasattr(note, field_name):
+            present |= 1 << bit
+    flags = ((_FLAG_DISPLAY if getattr(note, 'display', False) else 0) |
+             (_FLAG_GOGO if getattr(note, 'gogo_time', False) else 0) |
+             (_FLAG_BRANCH_START if getattr(note, 'is_branch_start', False) else 0) |
+             (_FLAG_INT_HIT if type(getattr(note, 'hit_ms', None)) is int else 0) |
+             (_FLAG_INT_LOAD if type(getattr(note, 'load_ms', None)) is int else 0))
+    if isinstance(note, Drumroll):
+        kind = _KIND_DRUMROLL
+        extra = note.color
+    elif isinstance(note, Balloon):
+        kind = _KIND_BALLOON
+        extra = note.count
+        flags |= (_FLAG_POPPED if note.popped else 0) | (_FLAG_KUSUDAMA if note.is_kusudama else 0)
+    else:
+        kind = _KIND_NOTE
+        extra = 0
+    branch_params = getattr(note, 'branch_params', '').encode('utf-8')
+    out += _NOTE_RECORD.pack(kind, present, flags, getattr(note, 'type', 0),
+                             getattr(note, 'hit_ms', 0), getattr(note, 'load_ms', 0),
+                             getattr(note, 'pixels_per_frame_x', 0), getattr(note, 'pixels_per_frame_y', 0),
+                             getattr(note, 'bpm', 0), getattr(note, 'index', 0), getattr(note, 'moji', 0),
+                             extra, len(branch_params))
+    out += branch_params
+
+@lru_cache(maxsize=None)
+def _present_fields(present: int) -> tuple[int, ...]:
+    return tuple(bit for bit in range(len(_NOTE_FIELDS)) if present & (1 << bit))
+
+def _unpack_note(data: bytes, offset: int, shared: dict[float, float]) -> tuple[Note | Drumroll | Balloon, int]:
+    (kind, present, flags, note_type, hit_ms, load_ms, pixels_per_frame_x, pixels_per_frame_y,
+     bpm, index, moji, extra, params_length) = _NOTE_RECORD.unpack_from(data, offset)
+    offset += _NOTE_RECORD.size
+    # Scroll speed and bpm repeat across most of a chart, share one float object per value like the parser does
+    pixels_per_frame_x = shared.setdefault(pixels_per_frame_x, pixels_per_frame_x)
+    pixels_per_frame_y = shared.setdefault(pixels_per_frame_y, pixels_per_frame_y)
+    bpm = shared.setdefault(bpm, bpm)
+    branch_params = data[offset:offset + params_length].decode('utf-8') if params_length else ''
+    offset += params_length
+    if flags & _FLAG_INT_HIT:
+        hit_ms = int(hit_ms)
+    if flags & _FLAG_INT_LOAD:
+        load_ms = int(load_ms)
+    # Same order as _NOTE_FIELDS
+    values = (note_type, hit_ms, load_ms, pixels_per_frame_x, pixels_per_frame_y,
+              bool(flags & _FLAG_DISPLAY), index, bpm, bool(flags & _FLAG_GOGO), moji,
+              bool(flags & _FLAG_BRANCH_START), branch_params)
+    if kind == _KIND_DRUMROLL:
+        note = Drumroll.__new__(Drumroll)
+        note.color = extra
+    elif kind == _KIND_BALLOON:
+        note = Balloon.__new__(Balloon)
+        note.count = extra
+        note.popped = bool(flags & _FLAG_POPPED)
+        note.is_kusudama = bool(flags & _FLAG_KUSUDAMA)
+    else:
+        note = Note.__new__(Note)
+    # Fields that were never set on the parsed note are left absent, matching the parser
+    for bit in _present_fields(present):
+        setattr(note, _NOTE_FIELDS[bit], values[bit])
+    return note, offset
+
+def _pack_note_list(notes: NoteList, out: bytearray):
+    out += _NOTE_LIST_HEADER.pack(len(notes.play_notes), len(notes.draw_notes), len(notes.bars))
+    for note in notes.play_notes:
+        _pack_note(note, out)
+    # draw_notes holds the same objects as play_notes, so only their order is stored
+    play_index = {id(note): i for i, note in enumerate(notes.play_notes)}
+    out += array('I', [play_index[id(note)] for note in notes.draw_notes]).tobytes()
+    # The play index of every roll's tail, -1 for notes without one
+    out += array('i', [play_index[id(note.tail)] if isinstance(note, (Drumroll, Balloon)) and hasattr(note, 'tail') else -1
+                       for note in notes.play_notes]).tobytes()
+    for bar in notes.bars:
+        _pack_note(bar, out)
+
+def _unpack_note_list(data: bytes, offset: int, shared: dict[float, float]) -> tuple[NoteList, int]:
+    play_count, draw_count, bar_count = _NOTE_LIST_HEADER.unpack_from(data, offset)
+    offset += _NOTE_LIST_HEADER.size
+    notes = NoteList()
+    for _ in range(play_count):
+        note, offset = _unpack_note(data, offset, shared)
+        notes.play_notes.append(note)
+    draw_order = array('I')
+    draw_order.frombytes(data[offset:offset + draw_count * draw_order.itemsize])
+    offset += draw_count * draw_order.itemsize
+    notes.draw_notes = [notes.play_notes[i] for i in draw_order]
+    tails = array('i')
+    tails.frombytes(data[offset:offset + play_count * tails.itemsize])
+    offset += play_count * tails.itemsize
+    for note, tail in zip(notes.play_notes, tails):
+        if tail != -1:
+            note.tail = notes.play_notes[tail]
+    for _ in range(bar_count):
+        bar, offset = _unpack_note(data, offset, shared)
+        notes.bars.append(bar)
+    return notes, offset
+
+def serialize_chart(master_notes: NoteList, branch_m: list[NoteList], branch_e: list[NoteList],
+                    branch_n: list[NoteList], end_ms: float) -> bytes:
+    """Serialize a positioned chart into the compact binary format used by the chart cache.
+
+    Args:
+        master_notes (NoteList): The notes outside of any branch.
+        branch_m (list[NoteList]): The master branch sections.
+        branch_e (list[NoteList]): The expert branch sections.
+        branch_n (list[NoteList]): The normal branch sections.
+        end_ms (float): The parser's current_ms after positioning the notes.
+
+    Returns:
+        bytes: The compiled chart.
+    """
+    out = bytearray(_CHART_HEADER.pack(_CHART_MAGIC, CHART_CACHE_VERSION, end_ms,
+                                       len(branch_m), len(branch_e), len(branch_n)))
+    _pack_note_list(master_notes, out)
+    out += struct.pack('<I', len(master_notes.branch_points))
+    for point in master_notes.branch_points:
+        out += _BRANCH_POINT_RECORD.pack(ord(point.condition), point.expert_req, point.master_req, point.start_ms,
+                                         *point.end_ms)
+    for section in branch_m + branch_e + branch_n:
+        _pack_note_list(section, out)
+    return bytes(out)
+
+def deserialize_chart(data: bytes) -> tuple[NoteList, list[NoteList], list[NoteList], list[NoteList], float]:
+    """Rebuild a chart produced by serialize_chart.
+
+    Args:
+        data (bytes): The compiled chart.
+
+    Returns:
+        tuple: The master notes, the master/expert/normal branch sections and the end time.
+    """
+    magic, version, end_ms, m_count, e_count, n_count = _CHART_HEADER.unpack_from(data, 0)
+    if magic != _CHART_MAGIC or version != CHART_CACHE_VERSION:
+        raise ValueError("Compiled chart has an unknown format")
+    offset = _CHART_HEADER.size
+    shared = dict()
+    master_notes, offset = _unpack_note_list(data, offset, shared)
+    point_count, = struct.unpack_from('<I', data, offset)
+    offset += 4
+    for _ in range(point_count):
+        condition, expert_req, master_req, start_ms, *end_ms = _BRANCH_POINT_RECORD.unpack_from(data, offset)
+        offset += _BRANCH_POINT_RECORD.size
+        master_notes.branch_points.append(BranchPoint(chr(condition), expert_req, master_req, start_ms, tuple(end_ms)))
+    sections = []
+    for _ in range(m_count + e_count + n_count):
+        section, offset = _unpack_note_list(data, offset, shared)
+        sections.append(section)
+    branch_m = sections[:m_count]
+    branch_e = sections[m_count:m_count + e_count]
+    branch_n = sections[m_count + e_count:]
+    return master_notes, branch_m, branch_e, branch_n, end_ms
+
+
+@dataclass(slots=True)
+class _BranchParams:
+    """A #BRANCHSTART command, applied to the bars positioned before it."""
+    params: str
+    drumroll: bool
+    step: int
+    curr_list: int
+    branch_m: Optional[int]
+    branch_e: Optional[int]
+    branch_n: Optional[int]
+
+@dataclass(slots=True)
+class _NoteTokens:
+    """The flattened note data of a chart, produced by TJAParser._tokenize_notes.
+
+    note_lists holds the master section followed by every branch section in the order
+    they appear, and is indexed by part_list. Each measure part has one entry in each
+    part_* column. chars holds one character per time step: the note characters of
+    every part with '.' removed, or a single '0' for an empty part. runs holds the
+    first step of every run of steps and the position in the accumulated times its
+    start time is read from, None for the start delay or 0. ops holds part indices
+    (one bar line each) and branch parameters in the order they appear in the chart.
+    """
+    note_lists: list[NoteList] = field(default_factory=list)
+    branch_m: list[NoteList] = field(default_factory=list)
+    branch_e: list[NoteList] = field(default_factory=list)
+    branch_n: list[NoteList] = field(default_factory=list)
+    runs: list[tuple[int, Optional[int]]] = field(default_factory=lambda: [(0, None)])
+    ops: list[int | _BranchParams] = field(default_factory=list)
+    chars: str = ''
+    part_list: tuple[int, ...] = ()
+    part_step: tuple[int, ...] = ()
+    part_run: tuple[int, ...] = ()
+    part_step_size: tuple[float, ...] = ()
+    part_step_count: tuple[int, ...] = ()
+    part_ms_per_measure: tuple[float, ...] = ()
+    part_bpm: tuple[float, ...] = ()
+    part_pixels_per_frame_x: tuple[float, ...] = ()
+    part_pixels_per_frame_y: tuple[float, ...] = ()
+    part_display: tuple[bool, ...] = ()
+    part_gogo_time: tuple[bool, ...] = ()
+    part_branch_start: tuple[bool, ...] = ()
+
+# 口唱歌 of each note type. Note '1' has three possible sound effects and '2' has two
+_MOJI = np.array([-1, 0, 3, 5, 6, 7, 8, 9, 10, 11])
+_MOJI_FAST = np.array([-1, 1, 4, 5, 6, 7, 8, 9, 10, 11])
+_MOJI_TRIPLET = 2
+
+def _get_moji(types: np.ndarray, hit_ms: np.ndarray, ms_per_measure: np.ndarray,
+              list_start: np.ndarray, same_list: np.ndarray) -> np.ndarray:
+    """
+    Assign 口唱歌 (note phoneticization) to notes.
+
+    The notes of every section are laid out one section after the other, each in
+    play order. The result is the same as assigning the moji note by note while the
+    notes are appended: every note gets the moji of its type, a 1 or 2 followed
+    closely by another note is sung faster, and the middle of three fast 1s with
+    space around them gets its own moji.
+
+    Args:
+        types (np.ndarray): The type of every note.
+        hit_ms (np.ndarray): The hit time of every note.
+        ms_per_measure (np.ndarray): The duration of the measure every note is in.
+        list_start (np.ndarray): The position of the first note of each note's section.
+        same_list (np.ndarray): Whether each note is in the same section as the note after it.
+
+    Returns:
+        np.ndarray: The moji of every note.
+    """
+    count = len(types)
+    has_next = np.zeros(count, dtype=bool)
+    has_next[:-1] = same_list
+    has_prev = np.zeros(count, dtype=bool)
+    has_prev[1:] = same_list
+    # The moji of the note after the note just appended only depends on the
+    # measure of the note just appended
+    threshold = ms_per_measure / 8
+    gap = np.zeros(count)
+    gap[1:] = hit_ms[1:] - hit_ms[:-1]
+
+    moji = _MOJI[types]
+    # A section with a single note never gets its moji assigned
+    moji[~has_prev & ~has_next] = -1
+    fast = np.zeros(count, dtype=bool)
+    fast[:-1] = has_next[:-1] & ((types[:-1] == 1) | (types[:-1] == 2)) & (gap[1:] <= threshold[1:] - 1)
+    moji[fast] = _MOJI_FAST[types[fast]]
+
+    if count > 3:
+        middle = slice(1, count - 2)
+        after_next = threshold[3:]
+        triplet = (has_prev[middle] & has_next[middle] & has_next[2:count - 1] &
+                   (types[:count - 3] == 1) & (types[middle] == 1) & (types[2:count - 1] == 1) &
+                   (gap[middle] < after_next) & (gap[2:count - 1] < after_next))
+        spaced = (((np.arange(1, count - 2) - list_start[middle]) < 3) |
+                  ((gap[:count - 3] >= after_next) & (gap[3:] >= after_next)))
+        moji[middle][triplet & spaced] = _MOJI_TRIPLET
+    return moji
+
 
 def calculate_base_score(notes: NoteList) -> int:
     """Calculate the base score for a song based on the number of notes, balloons, and drumrolls.
@@ -264,6 +575,56 @@ def calculate_base_score(notes: NoteList) -> int:
         return 1000000
     return math.ceil((1000000 - (balloon_count * 100) - (16.920079999994086 * drumroll_msec / 1000 * 100)) / total_notes / 10) * 10
 
+# Version of the chart hash produced by TJAParser.hash_note_data, stored next to every score
+HASH_VERSION = 2
+_HASH_RECORD = struct.Struct('<Bbddi')
+_HASH_KINDS = {Note: _KIND_NOTE, Drumroll: _KIND_DRUMROLL, Balloon: _KIND_BALLOON}
+
+def _hit_ms(note: Note) -> float:
+    return note.hit_ms
+
+def _load_ms(note: Note) -> float:
+    return note.load_ms
+
+def _with_ints(times: np.ndarray, is_int: np.ndarray) -> list[float]:
+    """Return the times as a list, with those where is_int is set as ints."""
+    values = times.tolist()
+    for i in np.flatnonzero(is_int).tolist():
+        values[i] = int(values[i])
+    return values
+
+def scored_note_times(master_notes: NoteList, sections: list[NoteList]) -> list[float]:
+    """Return the hit times of the don and kat notes played on one branch level, in order.
+
+    Args:
+        master_notes (NoteList): The notes outside of branches.
+        sections (list[NoteList]): The branch sections of the level.
+    """
+    notes = heapq.merge(master_notes.play_notes, *(section.play_notes for section in sections), key=_hit_ms)
+    return [note.hit_ms for note in notes if 0 < note.type < 5]
+
+TJA_ENCODINGS = ['utf-8-sig', 'shift-jis', 'utf-8']
+
+def read_text_file(file_path: Path, encoding: Optional[str] = None) -> tuple[str, Optional[str]]:
+    """Read a file once and decode it with the first encoding that works.
+
+    Args:
+        file_path (Path): The path to the file to read.
+        encoding (str): A previously detected encoding to try first.
+
+    Returns:
+        tuple[str, str]: The decoded text and the encoding that decoded it, or None
+        if only the locale's default encoding worked.
+    """
+    raw = file_path.read_bytes()
+    encodings = TJA_ENCODINGS if encoding is None else [encoding] + [e for e in TJA_ENCODINGS if e != encoding]
+    for candidate in encodings:
+        try:
+            return raw.decode(candidate), candidate
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return raw.decode(locale.getpreferredencoding(False)), None
+
 def test_encodings(file_path):
     """Test the encoding of a file by trying different encodings.
 
@@ -273,17 +634,10 @@ def test_encodings(file_path):
     Returns:
         str: The encoding that successfully decoded the file.
     """
-    encodings = ['utf-8-sig', 'shift-jis', 'utf-8']
-    final_encoding = None
-
-    for encoding in encodings:
-        try:
-            _ = file_path.read_text(encoding=encoding).splitlines()
-            final_encoding = encoding
-            break
-        except UnicodeDecodeError:
-            continue
-    return final_encoding
+    try:
+        return read_text_file(file_path)[1]
+    except UnicodeDecodeError:
+        return None
 
 
 class TJAParser:
@@ -298,9 +652,11 @@ class TJAParser:
         metadata (TJAMetadata): The metadata extracted from the TJA file.
         ex_data (TJAEXData): The extended data extracted from the TJA file.
         data (list): The data extracted from the TJA file.
+        encoding (str): The encoding the TJA file was decoded with.
     """
     DIFFS = {0: "easy", 1: "normal", 2: "hard", 3: "oni", 4: "edit", 5: "tower", 6: "dan"}
-    def __init__(self, path: Path, start_delay: int = 0, distance: int = 866):
+    def __init__(self, path: Path, start_delay: int = 0, distance: int = 866, metadata_only: bool = False,
+                 encoding: Optional[str] = None):
         """
         Initialize a TJA object.
 
@@ -308,28 +664,62 @@ class TJAParser:
             path (Path): The path to the TJA file.
             start_delay (int): The delay in milliseconds before the first note.
             distance (int): The distance between notes.
+            metadata_only (bool): Only parse the header lines. The note data is read
+                from disk the first time it is needed, e.g. by notes_to_position.
+            encoding (str): The file's encoding if already known, e.g. from the song index.
         """
         self.file_path: Path = path
-
-        encoding = test_encodings(self.file_path)
-        lines = self.file_path.read_text(encoding=encoding).splitlines()
-        self.data = [cleaned for line in lines
-                     if (cleaned := strip_comments(line).strip())]
+        self.encoding = encoding
+        self._data: Optional[list[str]] = None
 
         self.metadata = TJAMetadata()
         self.ex_data = TJAEXData()
-        self.get_metadata()
+        lines = self._read_lines()
+        if metadata_only:
+            self.get_metadata(self._header_lines(lines))
+        else:
+            self._data = self._clean_lines(lines)
+            self.get_metadata(self._data)
 
         self.distance = distance
+        self.start_delay = start_delay
         self.current_ms: float = start_delay
 
-    def get_metadata(self):
+    def _read_lines(self) -> list[str]:
+        text, self.encoding = read_text_file(self.file_path, self.encoding)
+        return text.splitlines()
+
+    def _clean_lines(self, lines: list[str]) -> list[str]:
+        return [cleaned for line in lines
+                if (cleaned := strip_comments(line).strip())]
+
+    def _header_lines(self, lines: list[str]) -> Iterator[str]:
+        # Note lines (digits and commas) are never read by get_metadata,
+        # so they are skipped before paying for comment stripping
+        for line in lines:
+            stripped = line.lstrip()
+            if not stripped or stripped[0].isdigit() or stripped[0] == ',':
+                continue
+            if (cleaned := strip_comments(line).strip()):
+                yield cleaned
+
+    @property
+    def data(self) -> list[str]:
+        """The comment-stripped lines of the TJA file, loaded on first access in metadata_only mode."""
+        if self._data is None:
+            self._data = self._clean_lines(self._read_lines())
+        return self._data
+
+    def get_metadata(self, lines: Optional[Iterable[str]] = None):
         """
         Extract metadata from the TJA file.
+
+        Args:
+            lines (Iterable[str]): The comment-stripped lines to read, defaults to self.data.
         """
         current_diff = None  # Track which difficulty we're currently processing
 
-        for item in self.data:
+        for item in (self.data if lines is None else lines):
             if item.startswith('#BRANCH') and current_diff is not None:
                 self.metadata.course_data[current_diff].is_branching = True
             elif item.startswith("#") or item[0].isdigit():
@@ -489,343 +879,444 @@ class TJAParser:
 
         return notes
 
-    def get_moji(self, play_note_list: list[Note], ms_per_measure: float) -> None:
-        """
-        Assign 口唱歌 (note phoneticization) to notes.
+    def notes_to_position(self, diff: int, use_cache: bool = False, rebuild: bool = False):
+        """Parse a TJA's notes into a NoteList.
 
         Args:
-            play_note_list (list[Note]): The list of notes to process.
-            ms_per_measure (float): The duration of a measure in milliseconds.
+            diff (int): The difficulty level.
+            use_cache (bool): Load the compiled chart from the chart cache, compiling and storing it on a miss.
+            rebuild (bool): Ignore any compiled chart in the cache and parse the TJA again.
 
         Returns:
-            None
+            tuple: The master notes and the master/expert/normal branch sections.
         """
-        se_notes = {
-            1: [0, 1, 2],  # Note '1' has three possible sound effects
-            2: [3, 4],     # Note '2' has two possible sound effects
-            3: 5,
-            4: 6,
-            5: 7,
-            6: 8,
-            7: 9,
-            8: 10,
-            9: 11
-        }
-
-        if len(play_note_list) <= 1:
-            return
-
-        current_note = play_note_list[-1]
-        if current_note.type in {1, 2}:
-            current_note.moji = se_notes[current_note.type][0]
-        else:
-            current_note.moji = se_notes[current_note.type]
+        # The cache key is built from the start delay, so a parser that has already
+        # positioned notes (and advanced current_ms) always parses from text
+        if not use_cache or self.current_ms != self.start_delay:
+            return self._parse_notes(diff)
+        key = chart_cache.make_key(self.file_path, self.start_delay, self.distance, diff, CHART_CACHE_VERSION)
+        if key is None:
+            return self._parse_notes(diff)
+        if not rebuild:
+            data = chart_cache.get(key)
+            if data is not None:
+                try:
+                    master_notes, branch_m, branch_e, branch_n, self.current_ms = deserialize_chart(data)
+                    return master_notes, branch_m, branch_e, branch_n
+                except (ValueError, IndexError, UnicodeDecodeError, struct.error) as e:
+                    print(f"Discarding compiled chart for {self.file_path}: {e}")
+        master_notes, branch_m, branch_e, branch_n = self._parse_notes(diff)
+        chart_cache.put(key, serialize_chart(master_notes, branch_m, branch_e, branch_n, self.current_ms))
+        return master_notes, branch_m, branch_e, branch_n
 
-        prev_note = play_note_list[-2]
+    def _tokenize_notes(self, diff: int) -> '_NoteTokens':
+        """First stage of positioning notes: run the chart commands and flatten the note data.
 
-        if prev_note.type in {1, 2}:
-            timing_threshold = ms_per_measure / 8 - 1
-            if current_note.hit_ms - prev_note.hit_ms <= timing_threshold:
-                prev_note.moji = se_notes[prev_note.type][1]
-            else:
-                prev_note.moji = se_notes[prev_note.type][0]
-        else:
-            prev_note.moji = se_notes[prev_note.type]
-
-        if len(play_note_list) > 3:
-            notes_minus_4 = play_note_list[-4]
-            notes_minus_3 = play_note_list[-3]
-            notes_minus_2 = play_note_list[-2]
-
-            consecutive_ones = (
-                notes_minus_4.type == 1 and
-                notes_minus_3.type == 1 and
-                notes_minus_2.type == 1
-            )
-
-            if consecutive_ones:
-                rapid_timing = (
-                    notes_minus_3.hit_ms - notes_minus_4.hit_ms < (ms_per_measure / 8) and
-                    notes_minus_2.hit_ms - notes_minus_3.hit_ms < (ms_per_measure / 8)
-                )
-
-                if rapid_timing:
-                    if len(play_note_list) > 5:
-                        spacing_before = play_note_list[-4].hit_ms - play_note_list[-5].hit_ms >= (ms_per_measure / 8)
-                        spacing_after = play_note_list[-1].hit_ms - play_note_list[-2].hit_ms >= (ms_per_measure / 8)
-
-                        if spacing_before and spacing_after:
-                            play_note_list[-3].moji = se_notes[1][2]
-                    else:
-                        play_note_list[-3].moji = se_notes[1][2]
-
-    def notes_to_position(self, diff: int):
-        """Parse a TJA's notes into a NoteList."""
-        master_notes = NoteList()
-        branch_m: list[NoteList] = []
-        branch_e: list[NoteList] = []
-        branch_n: list[NoteList] = []
-        notes = self.data_to_notes(diff)
-        balloon = self.metadata.course_data[diff].balloon.copy()
-        count = 0
-        index = 0
+        Commands (BPMCHANGE, MEASURE, SCROLL, GOGO, BARLINE and branches) only change
+        between measure parts, so the state they set is stored once per part instead
+        of once per note, and the note characters of every part are concatenated into
+        a single string with one character per time step.
+        """
+        tokens = _NoteTokens()
+        tokens.note_lists.append(NoteList())
+        parts = []
+        chars = []
+        step_count = 0
         time_signature = 4/4
         bpm = self.metadata.bpm
         x_scroll_modifier = 1
         y_scroll_modifier = 0
         barline_display = True
         gogo_time = False
-        curr_note_list = master_notes.play_notes
-        curr_draw_list = master_notes.draw_notes
-        curr_bar_list = master_notes.bars
-        start_branch_ms = 0
+        pixels_per_frame = None
+        curr_list = 0
+        branch_ids = {'#M': None, '#E': None, '#N': None}
+        branch_sections = {'#M': tokens.branch_m, '#E': tokens.branch_e, '#N': tokens.branch_n}
+        snapshot = None
         start_branch_bpm = bpm
         start_branch_time_sig = time_signature
         start_branch_x_scroll = x_scroll_modifier
         start_branch_y_scroll = y_scroll_modifier
         start_branch_barline = barline_display
         start_branch_gogo = gogo_time
-        branch_balloon_count = 0
         is_branching = False
-        for bar in notes:
+        for bar in self.data_to_notes(diff):
             #Length of the bar is determined by number of notes excluding commands
             bar_length = sum(len(part) for part in bar if '#' not in part)
             barline_added = False
             for part in bar:
-                if part.startswith('#BRANCHSTART'):
-                    start_branch_ms = self.current_ms
-                    start_branch_bpm = bpm
-                    start_branch_time_sig = time_signature
-                    start_branch_x_scroll = x_scroll_modifier
-                    start_branch_y_scroll = y_scroll_modifier
-                    start_branch_barline = barline_display
-                    start_branch_gogo = gogo_time
-                    branch_balloon_count = count
-                    branch_params = part[13:]
-
-                    if branch_params[0] == 'r':
-                        # Helper function to find and set drumroll branch params
-                        def set_drumroll_branch_params(note_list, bar_list):
-                            for i in range(len(note_list)-1, -1, -1):
-                                if 5 <= note_list[i].type <= 7 or note_list[i].type == 9:
-                                    drumroll_ms = note_list[i].hit_ms
-                                    for bar_idx in range(len(bar_list)-1, -1, -1):
-                                        if bar_list[bar_idx].hit_ms <= drumroll_ms:
-                                            bar_list[bar_idx].branch_params = branch_params
-                                            return True
-                                    break
-                            return False
-
-                        # Always try to set in master notes
-                        set_drumroll_branch_params(master_notes.play_notes, master_notes.bars)
-
-                        # If we have existing branches, also apply to them
-                        if branch_m and len(branch_m) > 0:
-                            set_drumroll_branch_params(branch_m[-1].play_notes, branch_m[-1].bars)
-                        if branch_e and len(branch_e) > 0:
-                            set_drumroll_branch_params(branch_e[-1].play_notes, branch_e[-1].bars)
-                        if branch_n and len(branch_n) > 0:
-                            set_drumroll_branch_params(branch_n[-1].play_notes, branch_n[-1].bars)
-                    else:
-                        if len(curr_bar_list) > 1:
-                            curr_bar_list[-2].branch_params = branch_params
-                        elif len(curr_bar_list) > 0:
-                            curr_bar_list[-1].branch_params = branch_params
-
-                        if branch_m and len(branch_m[-1].bars) > 1:
-                            branch_m[-1].bars[-2].branch_params = branch_params
-                        elif branch_m and len(branch_m[-1].bars) > 0:
-                            branch_m[-1].bars[-1].branch_params = branch_params
-                        if branch_e and len(branch_e[-1].bars) > 1:
-                            branch_e[-1].bars[-2].branch_params = branch_params
-                        elif branch_e and len(branch_e[-1].bars) > 0:
-                            branch_e[-1].bars[-1].branch_params = branch_params
-                        if branch_n and len(branch_n[-1].bars) > 1:
-                            branch_n[-1].bars[-2].branch_params = branch_params
-                        elif branch_n and len(branch_n[-1].bars) > 0:
-                            branch_n[-1].bars[-1].branch_params = branch_params
-                        if branch_m and len(branch_m[-1].bars) > 0:
-                            branch_m[-1].bars[-1].branch_params = branch_params
-                    continue
-                elif part.startswith('#BRANCHEND'):
-                    curr_note_list = master_notes.play_notes
-                    curr_draw_list = master_notes.draw_notes
-                    curr_bar_list = master_notes.bars
-                    continue
-                if part == '#M':
-                    branch_m.append(NoteList())
-                    curr_note_list = branch_m[-1].play_notes
-                    curr_draw_list = branch_m[-1].draw_notes
-                    curr_bar_list = branch_m[-1].bars
-                    self.current_ms = start_branch_ms
-                    bpm = start_branch_bpm
-                    time_signature = start_branch_time_sig
-                    x_scroll_modifier = start_branch_x_scroll
-                    y_scroll_modifier = start_branch_y_scroll
-                    barline_display = start_branch_barline
-                    gogo_time = start_branch_gogo
-                    count = branch_balloon_count
-                    is_branching = True
-                    continue
-                elif part == '#E':
-                    branch_e.append(NoteList())
-                    curr_note_list = branch_e[-1].play_notes
-                    curr_draw_list = branch_e[-1].draw_notes
-                    curr_bar_list = branch_e[-1].bars
-                    self.current_ms = start_branch_ms
-                    bpm = start_branch_bpm
-                    time_signature = start_branch_time_sig
-                    x_scroll_modifier = start_branch_x_scroll
-                    y_scroll_modifier = start_branch_y_scroll
-                    barline_display = start_branch_barline
-                    gogo_time = start_branch_gogo
-                    count = branch_balloon_count
-                    is_branching = True
-                    continue
-                elif part == '#N':
-                    branch_n.append(NoteList())
-                    curr_note_list = branch_n[-1].play_notes
-                    curr_draw_list = branch_n[-1].draw_notes
-                    curr_bar_list = branch_n[-1].bars
-                    self.current_ms = start_branch_ms
-                    bpm = start_branch_bpm
-                    time_signature = start_branch_time_sig
-                    x_scroll_modifier = start_branch_x_scroll
-                    y_scroll_modifier = start_branch_y_scroll
-                    barline_display = start_branch_barline
-                    gogo_time = start_branch_gogo
-                    count = branch_balloon_count
-                    is_branching = True
-                    continue
-                if '#LYRIC' in part:
-                    continue
-                if '#JPOSSCROLL' in part:
-                    continue
-                elif '#NMSCROLL' in part:
-                    continue
-                elif '#MEASURE' in part:
-                    divisor = part.find('/')
-                    time_signature = float(part[9:divisor]) / float(part[divisor+1:])
-                    continue
-                elif '#SCROLL' in part:
-                    scroll_value = part[7:]
-                    if 'i' in scroll_value:
-                        normalized = scroll_value.replace('.i', 'j').replace('i', 'j')
-                        c = complex(normalized)
-                        x_scroll_modifier = c.real
-                        y_scroll_modifier = c.imag
-                    else:
-                        x_scroll_modifier = float(scroll_value)
-                        y_scroll_modifier = 0.0
-                    continue
-                elif '#BPMCHANGE' in part:
-                    bpm = float(part[11:])
-                    continue
-                elif '#BARLINEOFF' in part:
-                    barline_display = False
-                    continue
-                elif '#BARLINEON' in part:
-                    barline_display = True
-                    continue
-                elif '#GOGOSTART' in part:
-                    gogo_time = True
-                    continue
-                elif '#GOGOEND' in part:
-                    gogo_time = False
-                    continue
+                if '#' in part:
+                    if part.startswith('#BRANCHSTART'):
+                        # The time a branch starts at is only known once the steps
+                        # are accumulated, so keep the position it will be stored at
+                        snapshot = step_count + len(tokens.runs) - 1
+                        start_branch_bpm = bpm
+                        start_branch_time_sig = time_signature
+                        start_branch_x_scroll = x_scroll_modifier
+                        start_branch_y_scroll = y_scroll_modifier
+                        start_branch_barline = barline_display
+                        start_branch_gogo = gogo_time
+                        branch_params = part[13:]
+                        tokens.ops.append(_BranchParams(branch_params, branch_params[0] == 'r', step_count, curr_list,
+                                                        branch_ids['#M'], branch_ids['#E'], branch_ids['#N']))
+                        continue
+                    elif part.startswith('#BRANCHEND'):
+                        curr_list = 0
+                        continue
+                    if part in branch_sections:
+                        curr_list = len(tokens.note_lists)
+                        branch_ids[part] = curr_list
+                        tokens.note_lists.append(NoteList())
+                        branch_sections[part].append(tokens.note_lists[-1])
+                        tokens.runs.append((step_count, snapshot))
+                        bpm = start_branch_bpm
+                        time_signature = start_branch_time_sig
+                        x_scroll_modifier = start_branch_x_scroll
+                        y_scroll_modifier = start_branch_y_scroll
+                        barline_display = start_branch_barline
+                        gogo_time = start_branch_gogo
+                        pixels_per_frame = None
+                        is_branching = True
+                        continue
+                    if '#LYRIC' in part:
+                        continue
+                    if '#JPOSSCROLL' in part:
+                        continue
+                    elif '#NMSCROLL' in part:
+                        continue
+                    elif '#MEASURE' in part:
+                        divisor = part.find('/')
+                        time_signature = float(part[9:divisor]) / float(part[divisor+1:])
+                        pixels_per_frame = None
+                        continue
+                    elif '#SCROLL' in part:
+                        scroll_value = part[7:]
+                        if 'i' in scroll_value:
+                            normalized = scroll_value.replace('.i', 'j').replace('i', 'j')
+                            c = complex(normalized)
+                            x_scroll_modifier = c.real
+                            y_scroll_modifier = c.imag
+                        else:
+                            x_scroll_modifier = float(scroll_value)
+                            y_scroll_modifier = 0.0
+                        pixels_per_frame = None
+                        continue
+                    elif '#BPMCHANGE' in part:
+                        bpm = float(part[11:])
+                        pixels_per_frame = None
+                        continue
+                    elif '#BARLINEOFF' in part:
+                        barline_display = False
+                        continue
+                    elif '#BARLINEON' in part:
+                        barline_display = True
+                        continue
+                    elif '#GOGOSTART' in part:
+                        gogo_time = True
+                        continue
+                    elif '#GOGOEND' in part:
+                        gogo_time = False
+                        continue
                 #Unrecognized commands will be skipped for now
-                elif len(part) > 0 and not part[0].isdigit():
+                if len(part) > 0 and not part[0].isdigit():
                     continue
 
-                ms_per_measure = get_ms_per_measure(bpm, time_signature)
-
-                #Create note object
-                bar_line = Note()
-
-                #Determines how quickly the notes need to move across the screen to reach the judgment circle in time
-                bar_line.pixels_per_frame_x = get_pixels_per_frame(bpm * time_signature * x_scroll_modifier, time_signature*4, self.distance)
-                bar_line.pixels_per_frame_y = get_pixels_per_frame(bpm * time_signature * y_scroll_modifier, time_signature*4, self.distance)
-                pixels_per_ms = get_pixels_per_ms(bar_line.pixels_per_frame_x)
-
-                bar_line.hit_ms = self.current_ms
-                if pixels_per_ms == 0:
-                    bar_line.load_ms = bar_line.hit_ms
+                if pixels_per_frame is None:
+                    ms_per_measure = get_ms_per_measure(bpm, time_signature)
+                    #Determines how quickly the notes need to move across the screen to reach the judgment circle in time
+                    pixels_per_frame = (get_pixels_per_frame(bpm * time_signature * x_scroll_modifier, time_signature*4, self.distance),
+                                        get_pixels_per_frame(bpm * time_signature * y_scroll_modifier, time_signature*4, self.distance))
+                #Empty bar is still a bar, otherwise every character but '.' advances the time
+                if len(part) == 0:
+                    part = '0'
+                    step = ms_per_measure
                 else:
-                    bar_line.load_ms = bar_line.hit_ms - (self.distance / pixels_per_ms)
-                bar_line.type = 0
-                bar_line.display = barline_display
-                bar_line.gogo_time = gogo_time
-                bar_line.bpm = bpm
-                if barline_added:
-                    bar_line.display = False
-
-                if is_branching:
-                    bar_line.is_branch_start = True
-                    is_branching = False
-
-                bisect.insort(curr_bar_list, bar_line, key=lambda x: x.load_ms)
+                    part = part.replace('.', '')
+                    if not part.isascii():
+                        part = ''.join(str(int(item)) if item.isdigit() else item for item in part)
+                    step = ms_per_measure / bar_length
+                tokens.ops.append(len(parts))
+                parts.append((curr_list, step_count, len(tokens.runs) - 1, step, len(part), ms_per_measure, bpm,
+                              pixels_per_frame[0], pixels_per_frame[1], barline_display and not barline_added,
+                              gogo_time, is_branching))
+                is_branching = False
                 barline_added = True
+                chars.append(part)
+                step_count += len(part)
+        tokens.chars = ''.join(chars)
+        if parts:
+            (tokens.part_list, tokens.part_step, tokens.part_run, tokens.part_step_size, tokens.part_step_count,
+             tokens.part_ms_per_measure, tokens.part_bpm, tokens.part_pixels_per_frame_x, tokens.part_pixels_per_frame_y,
+             tokens.part_display, tokens.part_gogo_time, tokens.part_branch_start) = zip(*parts)
+        return tokens
+
+    def _parse_notes(self, diff: int):
+        tokens = self._tokenize_notes(diff)
+        note_lists = tokens.note_lists
+        master_notes, branch_m, branch_e, branch_n = note_lists[0], tokens.branch_m, tokens.branch_e, tokens.branch_n
+
+        # Second stage: accumulate the time steps into the time before every step.
+        # A branch section restarts the time at the start of its branch as a new run
+        # of steps, so step i of run r is stored at times[i + r]
+        steps = np.repeat(np.array(tokens.part_step_size, dtype=np.float64), tokens.part_step_count)
+        run_ends = [first_step for first_step, _ in tokens.runs[1:]] + [len(steps)]
+        times = np.empty(len(steps) + len(tokens.runs), dtype=np.float64)
+        # Advancing the time note by note kept an int start as an int until a step
+        # was added to it. The legacy hash is built from str() of the times, so the
+        # times still at an int start are given back as ints
+        int_times = np.zeros(len(times), dtype=bool)
+        for run, ((first_step, snapshot), end) in enumerate(zip(tokens.runs, run_ends)):
+            if run == 0:
+                start = self.start_delay
+                int_times[0] = isinstance(start, int)
+            else:
+                start = 0 if snapshot is None else times[snapshot]
+                int_times[first_step + run] = snapshot is None or int_times[snapshot]
+            # add.accumulate adds the steps one after the other, so the times are
+            # exactly those of advancing the time note by note
+            times[first_step + run:end + run + 1] = np.add.accumulate(np.concatenate(([start], steps[first_step:end])))
+        if len(times) > 1:
+            self.current_ms = int(times[-1]) if int_times[-1] else times[-1].item()
+        step_run = np.repeat(np.arange(len(tokens.runs)), [end - first_step for (first_step, _), end in zip(tokens.runs, run_ends)])
+
+        part_list = np.array(tokens.part_list, dtype=np.int64)
+        part_pixels_per_ms = np.array(tokens.part_pixels_per_frame_x, dtype=np.float64) / (1000 / 60)
+        step_part = np.repeat(np.arange(len(part_list)), tokens.part_step_count)
+
+        # Notes are the characters 1-9. A '9' right after another '9' in the same
+        # section extends the kusudama instead of starting a new one
+        codes = np.frombuffer(tokens.chars.encode('utf-32-le'), dtype=np.uint32)
+        note_steps = np.flatnonzero((codes >= ord('1')) & (codes <= ord('9')))
+        note_types = codes[note_steps].astype(np.int64) - ord('0')
+        candidate_lists = part_list[step_part[note_steps]]
+        by_list = np.argsort(candidate_lists, kind='stable')
+        sorted_lists = candidate_lists[by_list]
+        sorted_types = note_types[by_list]
+        repeated = np.zeros(len(by_list), dtype=bool)
+        repeated[1:] = (sorted_lists[1:] == sorted_lists[:-1]) & (sorted_types[1:] == 9) & (sorted_types[:-1] == 9)
+        keep = np.ones(len(note_steps), dtype=bool)
+        keep[by_list[repeated]] = False
+        note_steps = note_steps[keep]
+        note_types = note_types[keep]
+        note_parts = step_part[note_steps]
+        note_list_ids = part_list[note_parts]
+        note_slots = note_steps + step_run[note_steps]
+        hit_ms = times[note_slots]
+
+        # Work on the notes grouped by section, each section in play order
+        by_list = np.argsort(note_list_ids, kind='stable')
+        sorted_lists = note_list_ids[by_list]
+        sorted_types = note_types[by_list]
+        list_start = np.searchsorted(sorted_lists, sorted_lists)
+        same_list = sorted_lists[1:] == sorted_lists[:-1]
+
+        # A roll end moves at the speed of the note before it
+        position = np.arange(len(by_list))
+        source = np.maximum.accumulate(np.where(sorted_types != 8, position, -1)) if len(by_list) else position
+        if np.any(source < list_start):
+            raise Exception("Roll end found before any other note")
+        source_parts = np.empty_like(note_parts)
+        source_parts[by_list] = note_parts[by_list][source]
+        pixels_per_ms = part_pixels_per_ms[source_parts]
+        distance_ms = np.divide(self.distance, pixels_per_ms, out=np.zeros_like(pixels_per_ms), where=pixels_per_ms != 0)
+        load_ms = np.where(pixels_per_ms == 0, hit_ms, hit_ms - distance_ms)
+
+        moji = np.empty_like(note_types)
+        moji[by_list] = _get_moji(sorted_types, hit_ms[by_list],
+                                  np.array(tokens.part_ms_per_measure, dtype=np.float64)[note_parts[by_list]],
+                                  list_start, same_list)
 
-                #Empty bar is still a bar, otherwise start increment
-                if len(part) == 0:
-                    self.current_ms += ms_per_measure
-                    increment = 0
-                else:
-                    increment = ms_per_measure / bar_length
+        balloon = self.metadata.course_data[diff].balloon.copy()
+        play_lists = [note_list.play_notes for note_list in note_lists]
+        # The drumroll or balloon of each section still waiting for its roll end
+        open_rolls: list[Optional[Drumroll | Balloon]] = [None] * len(note_lists)
+        part_lists = tokens.part_list
+        pixels_per_frame_x = tokens.part_pixels_per_frame_x
+        pixels_per_frame_y = tokens.part_pixels_per_frame_y
+        part_bpm = tokens.part_bpm
+        part_gogo_time = tokens.part_gogo_time
+        note_hit_ms = _with_ints(hit_ms, int_times[note_slots])
+        note_load_ms = _with_ints(load_ms, int_times[note_slots] & (pixels_per_ms == 0))
+        for index, (note_type, note_hit_ms, note_load_ms, note_moji, part, source_part) in enumerate(zip(
+                note_types.tolist(), note_hit_ms, note_load_ms, moji.tolist(),
+                note_parts.tolist(), source_parts.tolist())):
+            note = Note()
+            note.hit_ms = note_hit_ms
+            note.display = True
+            note.pixels_per_frame_x = pixels_per_frame_x[source_part]
+            note.pixels_per_frame_y = pixels_per_frame_y[part]
+            note.load_ms = note_load_ms
+            note.type = note_type
+            note.index = index
+            note.bpm = part_bpm[part]
+            note.gogo_time = part_gogo_time[part]
+            note.moji = note_moji
+            if note_type == 5 or note_type == 6:
+                note = Drumroll(note)
+                note.color = 255
+            elif note_type == 7 or note_type == 9:
+                if balloon is None:
+                    raise Exception("Balloon note found, but no count was specified")
+                note = Balloon(note, is_kusudama=note_type == 9)
+                note.count = 1 if not balloon else balloon.pop(0)
+            list_id = part_lists[part]
+            if note_type == 8:
+                head = open_rolls[list_id]
+                if head is not None:
+                    head.tail = note
+                    open_rolls[list_id] = None
+            elif note_type >= 5:
+                open_rolls[list_id] = note # type: ignore
+            play_lists[list_id].append(note)
 
-                for item in part:
-                    if item == '.':
-                        continue
-                    if item == '0' or (not item.isdigit()):
-                        self.current_ms += increment
-                        continue
-                    if item == '9' and curr_note_list and curr_note_list[-1].type == 9:
-                        self.current_ms += increment
-                        continue
-                    note = Note()
-                    note.hit_ms = self.current_ms
-                    note.display = True
-                    note.pixels_per_frame_x = bar_line.pixels_per_frame_x
-                    note.pixels_per_frame_y = bar_line.pixels_per_frame_y
-                    pixels_per_ms = get_pixels_per_ms(note.pixels_per_frame_x)
-                    note.load_ms = (note.hit_ms if pixels_per_ms == 0
-                                    else note.hit_ms - (self.distance / pixels_per_ms))
-                    note.type = int(item)
-                    note.index = index
-                    note.bpm = bpm
-                    note.gogo_time = gogo_time
-                    note.moji = -1
-                    if item in {'5', '6'}:
-                        note = Drumroll(note)
-                        note.color = 255
-                    elif item in {'7', '9'}:
-                        count += 1
-                        if balloon is None:
-                            raise Exception("Balloon note found, but no count was specified")
-                        if item == '9':
-                            note = Balloon(note, is_kusudama=True)
-                        else:
-                            note = Balloon(note)
-                        note.count = 1 if not balloon else balloon.pop(0)
-                    elif item == '8':
-                        new_pixels_per_ms = curr_note_list[-1].pixels_per_frame_x / (1000 / 60)
-                        if new_pixels_per_ms == 0:
-                            note.load_ms = note.hit_ms
-                        else:
-                            note.load_ms = note.hit_ms - (self.distance / new_pixels_per_ms)
-                        note.pixels_per_frame_x = curr_note_list[-1].pixels_per_frame_x
-                    self.current_ms += increment
-                    curr_note_list.append(note)
-                    bisect.insort(curr_draw_list, note, key=lambda x: x.load_ms)
-                    self.get_moji(curr_note_list, ms_per_measure)
-                    index += 1
         # Sorting by load_ms is necessary for drawing, as some notes appear on the
-        # screen slower regardless of when they reach the judge circle
-        # Bars can be sorted like this because they don't need hit detection
+        # screen slower regardless of when they reach the judge circle. A stable
+        # sort keeps notes that load together in play order
+        list_bounds = np.searchsorted(sorted_lists, np.arange(len(note_lists) + 1)).tolist()
+        list_steps = []
+        for list_id, note_list in enumerate(note_lists):
+            section = by_list[list_bounds[list_id]:list_bounds[list_id + 1]]
+            play_notes = note_list.play_notes
+            note_list.draw_notes = [play_notes[i] for i in np.argsort(load_ms[section], kind='stable').tolist()]
+            list_steps.append(note_steps[section].tolist())
+
+        bar_slots = np.array(tokens.part_step, dtype=np.int64) + np.array(tokens.part_run, dtype=np.int64)
+        bar_hit_ms = times[bar_slots]
+        bar_distance_ms = np.divide(self.distance, part_pixels_per_ms, out=np.zeros_like(part_pixels_per_ms), where=part_pixels_per_ms != 0)
+        bar_load_ms = _with_ints(np.where(part_pixels_per_ms == 0, bar_hit_ms, bar_hit_ms - bar_distance_ms),
+                                 int_times[bar_slots] & (part_pixels_per_ms == 0))
+        bar_hit_ms = _with_ints(bar_hit_ms, int_times[bar_slots])
+        # Bars can be sorted like this because they don't need hit detection. Branch
+        # parameters are attached to the bars positioned before them, so those are
+        # sorted up to that point first. Sorting is stable, which keeps the order the
+        # bars would have had if each one had been inserted in place
+        branch_starts = []
+        for op in tokens.ops:
+            if isinstance(op, _BranchParams):
+                for list_id in {0, op.curr_list, op.branch_m, op.branch_e, op.branch_n} - {None}:
+                    note_lists[list_id].bars.sort(key=_load_ms)
+                branch_starts.append((op, self._set_branch_params(op, note_lists, list_steps)))
+                continue
+            bar_line = Note()
+            bar_line.pixels_per_frame_x = pixels_per_frame_x[op]
+            bar_line.pixels_per_frame_y = pixels_per_frame_y[op]
+            bar_line.hit_ms = bar_hit_ms[op]
+            bar_line.load_ms = bar_load_ms[op]
+            bar_line.type = 0
+            bar_line.display = tokens.part_display[op]
+            bar_line.gogo_time = part_gogo_time[op]
+            bar_line.bpm = part_bpm[op]
+            if tokens.part_branch_start[op]:
+                bar_line.is_branch_start = True
+            note_lists[part_lists[op]].bars.append(bar_line)
+        for note_list in note_lists:
+            note_list.bars.sort(key=_load_ms)
+        master_notes.branch_points = self._branch_points(branch_starts, master_notes, branch_m, branch_e, branch_n)
         return master_notes, branch_m, branch_e, branch_n
 
+    def _set_branch_params(self, op: _BranchParams, note_lists: list[NoteList], list_steps: list[list[int]]) -> Optional[float]:
+        """Attach the parameters of a #BRANCHSTART to the bar the branch is decided at.
+
+        Returns:
+            Optional[float]: The latest load_ms of the bars the parameters were attached to, None if there were none.
+        """
+        branch_params = op.params
+        marked: list[Note] = []
+        if op.drumroll:
+            # Helper function to find and set drumroll branch params
+            def set_drumroll_branch_params(list_id):
+                note_list = note_lists[list_id].play_notes
+                bar_list = note_lists[list_id].bars
+                for i in range(bisect.bisect_left(list_steps[list_id], op.step)-1, -1, -1):
+                    if 5 <= note_list[i].type <= 7 or note_list[i].type == 9:
+                        drumroll_ms = note_list[i].hit_ms
+                        for bar_idx in range(len(bar_list)-1, -1, -1):
+                            if bar_list[bar_idx].hit_ms <= drumroll_ms:
+                                bar_list[bar_idx].branch_params = branch_params
+                                marked.append(bar_list[bar_idx])
+                                return True
+                        break
+                return False
+
+            # Always try to set in master notes
+            set_drumroll_branch_params(0)
+
+            # If we have existing branches, also apply to them
+            for list_id in (op.branch_m, op.branch_e, op.branch_n):
+                if list_id is not None:
+                    set_drumroll_branch_params(list_id)
+        else:
+            for list_id in (op.curr_list, op.branch_m, op.branch_e, op.branch_n):
+                if list_id is None:
+                    continue
+                bars = note_lists[list_id].bars
+                if len(bars) > 1:
+                    bars[-2].branch_params = branch_params
+                    marked.append(bars[-2])
+                elif len(bars) > 0:
+                    bars[-1].branch_params = branch_params
+                    marked.append(bars[-1])
+            if op.branch_m is not None and len(note_lists[op.branch_m].bars) > 0:
+                note_lists[op.branch_m].bars[-1].branch_params = branch_params
+        return max((bar.load_ms for bar in marked), default=None)
+
+    def _branch_points(self, branch_starts: list[tuple[_BranchParams, Optional[float]]], master_notes: NoteList,
+                       branch_m: list[NoteList], branch_e: list[NoteList], branch_n: list[NoteList]) -> list[BranchPoint]:
+        """Work out the condition of every #BRANCHSTART, so the player only has to look it up.
+
+        Args:
+            branch_starts (list): Every #BRANCHSTART with the load_ms of the bar its parameters were attached to.
+            master_notes (NoteList): The notes outside of branches.
+            branch_m (list[NoteList]): The master branch sections.
+            branch_e (list[NoteList]): The expert branch sections.
+            branch_n (list[NoteList]): The normal branch sections.
+
+        Returns:
+            list[BranchPoint]: One branch point per #BRANCHSTART, in chart order.
+        """
+        # The roll ends a player on each branch level plays, outside of branches or in that level's sections
+        level_roll_end_ms = []
+        for sections in (branch_n, branch_e, branch_m):
+            notes = heapq.merge(master_notes.play_notes, *(section.play_notes for section in sections), key=_hit_ms)
+            level_roll_end_ms.append([note.hit_ms for note in notes if note.type == 8])
+
+        branch_points = []
+        for i, (op, start_ms) in enumerate(branch_starts):
+            condition, expert_req, master_req = op.params.split(',')
+            section = next((sections[i] for sections in (branch_m, branch_e, branch_n) if i < len(sections) and sections[i].bars), None)
+            decide_ms = section.bars[0].load_ms if section is not None else start_ms
+            if start_ms is None:
+                start_ms = decide_ms if decide_ms is not None else 0.0
+            if decide_ms is None:
+                decide_ms = start_ms
+            end_ms = []
+            for roll_end_ms in level_roll_end_ms:
+                if condition == 'r':
+                    last_roll = bisect.bisect_right(roll_end_ms, decide_ms) - 1
+                    end_ms.append(roll_end_ms[last_roll] if last_roll >= 0 else start_ms)
+                else:
+                    end_ms.append(decide_ms)
+            branch_points.append(BranchPoint(condition, float(expert_req), float(master_req), start_ms, tuple(end_ms)))
+        return branch_points
+
     def hash_note_data(self, notes: NoteList):
-        """Hashes the note data for the given NoteList."""
+        """Hashes the note data for the given NoteList.
+
+        Every note and bar is packed into a fixed binary record and streamed into
+        a single SHA-256 in hit order. HASH_VERSION must be bumped whenever the
+        record changes, since scores are keyed by this hash.
+        """
+        pack = _HASH_RECORD.pack
+        records = b''.join(
+            pack(_HASH_KINDS[type(item)], item.type, item.hit_ms, item.load_ms, getattr(item, 'count', 0))
+            for item in heapq.merge(notes.play_notes, notes.bars, key=_hit_ms))
+        return hashlib.sha256(records).hexdigest()
+
+    def legacy_hash_note_data(self, notes: NoteList):
+        """Hashes the note data the way versions before HASH_VERSION 2 did.
+
+        Only used to find scores saved under the old hashes so they can be migrated.
+        """
         n = hashlib.sha256()
         list1 = notes.play_notes
         list2 = notes.bars
@@ -1,6 +1,5 @@
 import ctypes
 import hashlib
-import math
 import sys
 import time
 import json
@@ -91,132 +90,6 @@ def save_config(config: dict[str, Any]) -> None:
     with open(Path('config.toml'), "w", encoding="utf-8") as f:
         tomlkit.dump(config, f)
 
-def is_l_don_pressed(player_num: str = '0') -> bool:
-    """Check if the left don button is pressed"""
-    if global_data.input_locked:
-        return False
-    if player_num == '0':
-        keys = global_data.config["keys_1p"]["left_don"] + global_data.config["keys_2p"]["left_don"]
-    elif player_num == '1':
-        keys = global_data.config["keys_1p"]["left_don"]
-    elif player_num == '2':
-        keys = global_data.config["keys_2p"]["left_don"]
-    gamepad_buttons = global_data.config["gamepad"]["left_don"]
-    for key in keys:
-        if ray.is_key_pressed(ord(key)):
-            return True
-
-    if ray.is_gamepad_available(0):
-        for button in gamepad_buttons:
-            if ray.is_gamepad_button_pressed(0, button):
-                return True
-
-    mid_x, mid_y = (1280//2, 720)
-    allowed_gestures = {ray.Gesture.GESTURE_TAP, ray.Gesture.GESTURE_DOUBLETAP}
-    if ray.get_gesture_detected() in allowed_gestures and ray.is_gesture_detected(ray.get_gesture_detected()):
-        for i in range(min(ray.get_touch_point_count(), 10)):
-            tap_pos = (ray.get_touch_position(i).x, ray.get_touch_position(i).y)
-            if math.dist(tap_pos, (mid_x, mid_y)) < 300 and tap_pos[0] <= mid_x:
-                return True
-
-    return False
-
-def is_r_don_pressed(player_num: str = '0') -> bool:
-    """Check if the right don button is pressed"""
-    if global_data.input_locked:
-        return False
-    if player_num == '0':
-        keys = global_data.config["keys_1p"]["right_don"] + global_data.config["keys_2p"]["right_don"]
-    elif player_num == '1':
-        keys = global_data.config["keys_1p"]["right_don"]
-    elif player_num == '2':
-        keys = global_data.config["keys_2p"]["right_don"]
-    gamepad_buttons = global_data.config["gamepad"]["right_don"]
-    for key in keys:
-        if ray.is_key_pressed(ord(key)):
-            return True
-
-    if ray.is_gamepad_available(0):
-        for button in gamepad_buttons:
-            if ray.is_gamepad_button_pressed(0, button):
-                return True
-
-    if not global_data.config["general"]["touch_enabled"]:
-        return False
-    mid_x, mid_y = (1280//2, 720)
-    allowed_gestures = {ray.Gesture.GESTURE_TAP, ray.Gesture.GESTURE_DOUBLETAP}
-    if ray.get_gesture_detected() in allowed_gestures and ray.is_gesture_detected(ray.get_gesture_detected()):
-        for i in range(min(ray.get_touch_point_count(), 10)):
-            tap_pos = (ray.get_touch_position(i).x, ray.get_touch_position(i).y)
-            if math.dist(tap_pos, (mid_x, mid_y)) < 300 and tap_pos[0] > mid_x:
-                return True
-
-    return False
-
-def is_l_kat_pressed(player_num: str = '0') -> bool:
-    """Check if the left kat button is pressed"""
-    if global_data.input_locked:
-        return False
-    if player_num == '0':
-        keys = global_data.config["keys_1p"]["left_kat"] + global_data.config["keys_2p"]["left_kat"]
-    elif player_num == '1':
-        keys = global_data.config["keys_1p"]["left_kat"]
-    elif player_num == '2':
-        keys = global_data.config["keys_2p"]["left_kat"]
-    gamepad_buttons = global_data.config["gamepad"]["left_kat"]
-    for key in keys:
-        if ray.is_key_pressed(ord(key)):
-            return True
-
-    if ray.is_gamepad_available(0):
-        for button in gamepad_buttons:
-            if ray.is_gamepad_button_pressed(0, button):
-                return True
-
-    if not global_data.config["general"]["touch_enabled"]:
-        return False
-    mid_x, mid_y = (1280//2, 720)
-    allowed_gestures = {ray.Gesture.GESTURE_TAP, ray.Gesture.GESTURE_DOUBLETAP}
-    if ray.get_gesture_detected() in allowed_gestures and ray.is_gesture_detected(ray.get_gesture_detected()):
-        for i in range(min(ray.get_touch_point_count(), 10)):
-            tap_pos = (ray.get_touch_position(i).x, ray.get_touch_position(i).y)
-            if math.dist(tap_pos, (mid_x, mid_y)) >= 300 and tap_pos[0] <= mid_x:
-                return True
-
-    return False
-
-def is_r_kat_pressed(player_num: str = '0') -> bool:
-    """Check if the right kat button is pressed"""
-    if global_data.input_locked:
-        return False
-    if player_num == '0':
-        keys = global_data.config["keys_1p"]["right_kat"] + global_data.config["keys_2p"]["right_kat"]
-    elif player_num == '1':
-        keys = global_data.config["keys_1p"]["right_kat"]
-    elif player_num == '2':
-        keys = global_data.config["keys_2p"]["right_kat"]
-    gamepad_buttons = global_data.config["gamepad"]["right_kat"]
-    for key in keys:
-        if ray.is_key_pressed(ord(key)):
-            return True
-
-    if ray.is_gamepad_available(0):
-        for button in gamepad_buttons:
-            if ray.is_gamepad_button_pressed(0, button):
-                return True
-
-    if not global_data.config["general"]["touch_enabled"]:
-        return False
-    mid_x, mid_y = (1280//2, 720)
-    allowed_gestures = {ray.Gesture.GESTURE_TAP, ray.Gesture.GESTURE_DOUBLETAP}
-    if ray.get_gesture_detected() in allowed_gestures and ray.is_gesture_detected(ray.get_gesture_detected()):
-        for i in range(min(ray.get_touch_point_count(), 10)):
-            tap_pos = (ray.get_touch_position(i).x, ray.get_touch_position(i).y)
-            if math.dist(tap_pos, (mid_x, mid_y)) >= 300 and tap_pos[0] > mid_x:
-                return True
-
-    return False
-
 global_tex = TextureWrapper()
 
 text_cache = set()
@@ -1,32 +1,95 @@
+import threading
+from collections import deque
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pyray as ray
 from moviepy import VideoFileClip
 
 from libs.audio import audio
+from libs.profiler import profiler
 from libs.utils import get_current_ms
 
+# Decoded frames waiting to be shown, about a sixth of a second at 60fps
+RING_FRAMES = 10
+# GPU textures the frames are uploaded into in turn, so a frame is never written while it is drawn
+TEXTURE_POOL = 2
 
 class VideoPlayer:
+    """Plays a video with the frames decoded ahead on a background thread.
+
+    The decoder thread reads frames in order into a ring buffer of RING_FRAMES raw
+    frames, waiting while it is full. update picks the frame that belongs to the
+    clock it is given, usually the song clock, and uploads it with update_texture
+    into one of TEXTURE_POOL textures created once. When the decoder falls behind
+    the clock it skips ahead to the frame the player wants.
+
+    A frame skipped between two frames that were shown is counted as dropped, and
+    a frame that was not decoded yet by the time it was due is counted as late.
+    """
     def __init__(self, path: Path):
         """Initialize a video player instance"""
+        self.path = Path(path)
         self.is_finished_list = [False, False]
         self.video = VideoFileClip(path)
+        self.audio = None
         if self.video.audio is not None:
             self.video.audio.write_audiofile("cache/temp_audio.wav")
             self.audio = audio.load_music_stream(Path("cache/temp_audio.wav"), 'video')
 
-        self.buffer_size = 10  # Number of frames to keep in memory
-        self.frame_buffer: dict[float, ray.Texture] = dict()  # Dictionary to store frames {timestamp: texture}
-        self.frame_timestamps: list[float] = [(i * 1000) / self.video.fps for i in range(int(self.video.duration * self.video.fps) + 1)]
-
-        self.start_ms = None
-        self.frame_index = 0
-        self.current_frame = None
         self.fps = self.video.fps
         self.frame_duration = 1000 / self.fps
+        self.frame_count = int(self.video.duration * self.fps) + 1
+        self.width, self.height = self.video.w, self.video.h
+
+        # (frame index, RGB pixels) in index order, shared with the decoder thread
+        self.ring: deque[tuple[int, np.ndarray]] = deque()
+        self.ring_lock = threading.Condition()
+        self.decode_index = 0
+        self.wanted_index = 0
+        # Raised by start() when it sends the decoder back to the first frame
+        self.generation = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._decode, name="video", daemon=True)
+        self.thread.start()
+
+        self.textures: list[ray.Texture] = []
+        self.texture_index = 0
+        self.current_frame: Optional[ray.Texture] = None
+        self.shown_index = -1
+        self.late_index = -1
+        self.shown_frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+
+        self.start_ms = None
         self.audio_played = False
 
+    def _decode(self):
+        while True:
+            with self.ring_lock:
+                while self.running and (len(self.ring) >= RING_FRAMES or self.decode_index >= self.frame_count):
+                    self.ring_lock.wait()
+                if not self.running:
+                    return
+                # Behind the clock, start again from the frame the player wants
+                index = max(self.decode_index, self.wanted_index)
+                generation = self.generation
+            try:
+                frame_data = np.ascontiguousarray(self.video.get_frame(index / self.fps), dtype=np.uint8)
+            except Exception as e:
+                print(f"Error decoding frame {index} of {self.path.name}: {e}")
+                frame_data = None
+            with self.ring_lock:
+                if self.generation != generation:
+                    continue
+                if frame_data is None:
+                    self.decode_index = self.frame_count
+                    continue
+                self.ring.append((index, frame_data))
+                self.decode_index = index + 1
+
     def _audio_manager(self):
         if self.audio is None:
             return
@@ -38,58 +101,34 @@ class VideoPlayer:
         audio.update_music_stream(self.audio)
         self.is_finished_list[1] = audio.get_music_time_length(self.audio) <= audio.get_music_time_played(self.audio)
 
-    def _load_frame(self, index: int):
-        """Load a specific frame into the buffer"""
-        if index >= len(self.frame_timestamps) or index < 0:
-            return None
-
-        timestamp = self.frame_timestamps[index]
-
-        if timestamp in self.frame_buffer:
-            return self.frame_buffer[timestamp]
-
-        try:
-            time_sec = timestamp / 1000
-            frame_data = self.video.get_frame(time_sec)
-
-            image = ray.Image(frame_data, self.video.w, self.video.h, 1, ray.PixelFormat.PIXELFORMAT_UNCOMPRESSED_R8G8B8)
-            texture = ray.load_texture_from_image(image)
-
-            self.frame_buffer[timestamp] = texture
-
-            self._manage_buffer()
-
-            return texture
-        except Exception as e:
-            print(f"Error loading frame at index {index}: {e}")
-            return None
-
-    def _manage_buffer(self):
-        if len(self.frame_buffer) > self.buffer_size:
-            keep_range = set()
-            half_buffer = self.buffer_size // 2
-
-            for i in range(max(0, self.frame_index - half_buffer),
-                          min(len(self.frame_timestamps), self.frame_index + half_buffer + 1)):
-                keep_range.add(self.frame_timestamps[i])
-
-            buffer_timestamps = list(self.frame_buffer.keys())
-            buffer_timestamps.sort()
-
-            for ts in buffer_timestamps:
-                if ts not in keep_range and len(self.frame_buffer) > self.buffer_size:
-                    texture = self.frame_buffer.pop(ts)
-                    ray.unload_texture(texture)
+    def _upload(self, frame_data: np.ndarray) -> ray.Texture:
+        """Copy a frame into the next texture of the pool, creating the pool on the first frame."""
+        if not self.textures:
+            image = ray.Image(frame_data, self.width, self.height, 1, ray.PixelFormat.PIXELFORMAT_UNCOMPRESSED_R8G8B8)
+            self.textures = [ray.load_texture_from_image(image) for _ in range(TEXTURE_POOL)]
+        texture = self.textures[self.texture_index]
+        self.texture_index = (self.texture_index + 1) % len(self.textures)
+        ray.update_texture(texture, ray.ffi.from_buffer(frame_data))
+        return texture
 
     def is_started(self) -> bool:
         """Returns boolean value if the video has begun"""
         return self.start_ms is not None
 
     def start(self, current_ms: float) -> None:
-        """Start video playback at call time"""
+        """Start video playback at call time, from the first frame"""
         self.start_ms = current_ms
-        for i in range(min(self.buffer_size, len(self.frame_timestamps))):
-            self._load_frame(i)
+        self.shown_index = -1
+        self.late_index = -1
+        self.is_finished_list[0] = False
+        with self.ring_lock:
+            if self.ring and self.ring[0][0] == 0:
+                return
+            self.ring.clear()
+            self.decode_index = 0
+            self.wanted_index = 0
+            self.generation += 1
+            self.ring_lock.notify()
 
     def is_finished(self) -> bool:
         """Check if video is finished playing"""
@@ -97,32 +136,50 @@ class VideoPlayer:
 
     def set_volume(self, volume: float) -> None:
         """Set video volume, takes float value from 0.0 to 1.0"""
-        audio.set_music_volume(self.audio, volume)
+        if self.audio is not None:
+            audio.set_music_volume(self.audio, volume)
 
-    def update(self):
-        """Updates video playback, advancing frames and audio"""
+    def update(self, current_ms: Optional[float] = None):
+        """Updates video playback, advancing frames and audio
+
+        Args:
+            current_ms (Optional[float]): The time on the clock start was given, get_current_ms if None.
+        """
         self._audio_manager()
 
-        if self.frame_index >= len(self.frame_timestamps):
-            self.is_finished_list[0] = True
+        if self.start_ms is None or self.is_finished_list[0]:
             return
 
-        if self.start_ms is None:
+        elapsed_time = (get_current_ms() if current_ms is None else current_ms) - self.start_ms
+        wanted = int(elapsed_time // self.frame_duration)
+        if wanted >= self.frame_count:
+            self.is_finished_list[0] = True
+            return
+        if wanted <= self.shown_index:
             return
 
-        elapsed_time = get_current_ms() - self.start_ms
-
-        while (self.frame_index < len(self.frame_timestamps) and
-               elapsed_time >= self.frame_timestamps[self.frame_index]):
-            self.frame_index += 1
-
-        current_index = max(0, self.frame_index - 1)
-
-        self.current_frame = self._load_frame(current_index)
+        frame = None
+        with self.ring_lock:
+            while self.ring and self.ring[0][0] <= wanted:
+                frame = self.ring.popleft()
+            self.wanted_index = wanted
+            self.ring_lock.notify()
+        if frame is None or frame[0] < wanted:
+            if self.late_index != wanted:
+                self.late_index = wanted
+                self.late_frames += 1
+                profiler.count('video late')
+        if frame is None:
+            return
 
-        for i in range(1, 5):
-            if current_index + i < len(self.frame_timestamps):
-                self._load_frame(current_index + i)
+        index, frame_data = frame
+        dropped = index - self.shown_index - 1
+        if dropped > 0:
+            self.dropped_frames += dropped
+            profiler.count('video dropped', dropped)
+        self.shown_index = index
+        self.shown_frames += 1
+        self.current_frame = self._upload(frame_data)
 
     def draw(self):
         """Draw video frames to the raylib canvas"""
@@ -130,12 +187,22 @@ class VideoPlayer:
             ray.draw_texture(self.current_frame, 0, 0, ray.WHITE)
 
     def stop(self):
-        """Stops the video, audio, and clears its buffer"""
+        """Stops the video, audio, and decoder and prints the dropped and late frames"""
+        with self.ring_lock:
+            self.running = False
+            self.ring.clear()
+            self.ring_lock.notify()
+        self.thread.join()
         self.video.close()
-        for timestamp, texture in self.frame_buffer.items():
+        for texture in self.textures:
             ray.unload_texture(texture)
-        self.frame_buffer.clear()
+        self.textures.clear()
+        self.current_frame = None
+        print(f"Video {self.path.name}: {self.shown_frames} frames shown, "
+              f"{self.dropped_frames} dropped, {self.late_frames} late")
 
+        if self.audio is None:
+            return
         if audio.is_music_stream_playing(self.audio):
             audio.stop_music_stream(self.audio)
         audio.unload_music_stream(self.audio)
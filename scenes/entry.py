@@ -3,15 +3,12 @@ import pyray as ray
 from libs.audio import audio
 from libs.chara_2d import Chara2D
 from libs.global_objects import AllNetIcon, CoinOverlay, Nameplate, Indicator, EntryOverlay, Timer
+from libs.input import DON, L_DON, L_KAT, R_DON, R_KAT, drum_input
 from libs.texture import tex
 from libs.utils import (
     OutlinedText,
     get_current_ms,
     global_data,
-    is_l_don_pressed,
-    is_l_kat_pressed,
-    is_r_don_pressed,
-    is_r_kat_pressed,
 )
 
 
@@ -64,7 +61,7 @@ class EntryScreen:
 
     def handle_input(self):
         if self.state == State.SELECT_SIDE:
-            if is_l_don_pressed() or is_r_don_pressed():
+            if drum_input.is_pressed(DON):
                 if self.side == 1:
                     return self.on_screen_end("TITLE")
                 global_data.player_num = round((self.side/3) + 1)
@@ -83,7 +80,7 @@ class EntryScreen:
                 audio.play_sound(f'entry_start_{global_data.player_num}p', 'voice')
                 self.state = State.SELECT_MODE
                 audio.play_sound('don', 'sound')
-            if is_l_kat_pressed():
+            if drum_input.is_pressed(L_KAT):
                 audio.play_sound('kat', 'sound')
                 if self.players[0] and self.players[0].player_num == 1:
                     self.side = 1
@@ -91,7 +88,7 @@ class EntryScreen:
                     self.side = 0
                 else:
                     self.side = max(0, self.side - 1)
-            if is_r_kat_pressed():
+            if drum_input.is_pressed(R_KAT):
                 audio.play_sound('kat', 'sound')
                 if self.players[0] and self.players[0].player_num == 1:
                     self.side = 2
@@ -103,7 +100,7 @@ class EntryScreen:
             for player in self.players:
                 if player:
                     player.handle_input()
-            if self.players[0] and self.players[0].player_num == 1 and is_l_don_pressed('2') or is_r_don_pressed('2'):
+            if self.players[0] and self.players[0].player_num == 1 and drum_input.is_pressed(L_DON, '2') or drum_input.is_pressed(R_DON, '2'):
                 audio.play_sound('don', 'sound')
                 self.state = State.SELECT_SIDE
                 plate_info = global_data.config['nameplate_2p']
@@ -111,7 +108,7 @@ class EntryScreen:
                 self.chara = Chara2D(1, 100)
                 self.side_select_fade.restart()
                 self.side = 1
-            elif self.players[0] and self.players[0].player_num == 2 and is_l_don_pressed('1') or is_r_don_pressed('1'):
+            elif self.players[0] and self.players[0].player_num == 2 and drum_input.is_pressed(L_DON, '1') or drum_input.is_pressed(R_DON, '1'):
                 audio.play_sound('don', 'sound')
                 self.state = State.SELECT_SIDE
                 self.side_select_fade.restart()
@@ -343,13 +340,13 @@ class EntryPlayer:
         if self.box_manager.is_box_selected():
             return
 
-        if is_l_don_pressed(str(self.player_num)) or is_r_don_pressed(str(self.player_num)):
+        if drum_input.is_pressed(L_DON, str(self.player_num)) or drum_input.is_pressed(R_DON, str(self.player_num)):
             audio.play_sound('don', 'sound')
             self.box_manager.select_box()
-        if is_l_kat_pressed(str(self.player_num)):
+        if drum_input.is_pressed(L_KAT, str(self.player_num)):
             audio.play_sound('kat', 'sound')
             self.box_manager.move_left()
-        if is_r_kat_pressed(str(self.player_num)):
+        if drum_input.is_pressed(R_KAT, str(self.player_num)):
             audio.play_sound('kat', 'sound')
             self.box_manager.move_right()
 
@@ -411,15 +408,15 @@ class Box:
         self.moving_right = True
 
     def _draw_highlighted(self, color):
-        texture_left = tex.textures['mode_select']['box_highlight_left'].texture
-        if isinstance(texture_left, list):
+        texture_left = tex.textures['mode_select']['box_highlight_left']
+        if texture_left.is_frames:
             raise Exception("highlight textures cannot be iterable")
         tex.draw_texture('mode_select', 'box_highlight_center', x=self.left_x + texture_left.width, y=self.y, x2=self.right_x - self.left_x -15, color=color)
         tex.draw_texture('mode_select', 'box_highlight_left', x=self.left_x, y=self.y, color=color)
         tex.draw_texture('mode_select', 'box_highlight_right', x=self.right_x, y=self.y, color=color)
 
     def _draw_text(self, color):
-        text_x = self.x + (self.texture.width//2) - (self.text.texture.width//2)
+        text_x = self.x + (self.box_tex_obj.width//2) - (self.text.texture.width//2)
         if self.is_selected:
             text_x += self.open.attribute
         text_y = self.y + 20
@@ -431,7 +428,7 @@ class Box:
 
     def draw(self, fade: float):
         color = ray.fade(ray.WHITE, fade)
-        ray.draw_texture(self.texture, self.x, self.y, color)
+        ray.draw_texture_rec(self.texture, self.box_tex_obj.frame_rect(), ray.Vector2(self.x, self.y), color)
         if self.is_selected and self.move.is_finished:
             self._draw_highlighted(color)
         self._draw_text(color)
@@ -452,7 +449,7 @@ class BoxManager:
         self.is_2p = False
 
         spacing = 80
-        box_width = self.boxes[0].texture.width
+        box_width = self.boxes[0].box_tex_obj.width
         total_width = self.num_boxes * box_width + (self.num_boxes - 1) * spacing
         start_x = 640 - total_width//2
         for i, box in enumerate(self.boxes):
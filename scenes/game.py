@@ -1,6 +1,7 @@
 import bisect
+import heapq
 import math
-import sqlite3
+import threading
 from collections import deque
 from pathlib import Path
 from typing import Optional
@@ -11,10 +12,18 @@ from libs.animation import Animation
 from libs.audio import audio
 from libs.background import Background
 from libs.chara_2d import Chara2D
-from libs.global_data import Modifiers
+from libs.chart_cache import chart_cache
+from libs.global_data import Modifiers, SessionData
 from libs.global_objects import AllNetIcon, Nameplate
-from libs.texture import tex
+from libs.input import DRUM_INPUTS, drum_input
+from libs.pool import ObjectPool, gameplay_gc
+from libs.profiler import profiler
+from libs.score_store import score_store
+from libs.song_index import song_index
+from libs.timeline import song_timeline
+from libs.texture import SpriteBatch, tex
 from libs.tja import (
+    HASH_VERSION,
     Balloon,
     Drumroll,
     Note,
@@ -22,23 +31,38 @@ from libs.tja import (
     TJAParser,
     apply_modifiers,
     calculate_base_score,
+    scored_note_times,
 )
 from libs.transition import Transition
 from libs.utils import (
     OutlinedText,
-    get_current_ms,
     global_data,
     global_tex,
-    is_l_don_pressed,
-    is_l_kat_pressed,
-    is_r_don_pressed,
-    is_r_kat_pressed,
     rounded
 )
 from libs.video import VideoPlayer
 
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
+# Free objects kept for each kind of hit effect, enough for a fast drumroll
+EFFECT_POOL_SIZE = 32
+
+def save_score(hash: str, score: tuple, run_clear: int, session_data: SessionData):
+    """Queue the score of a play and record the score it beat for the result screen.
+
+    Args:
+        hash (str): The hash of the chart.
+        score (tuple): The English and Japanese title, difficulty, score, good, ok,
+            bad, drumroll and max combo of the play.
+        run_clear (int): 2 for a full combo, 1 for a clear and 0 otherwise.
+        session_data (SessionData): The session data that receives the previous score.
+    """
+    existing = score_store.get_score(hash)
+    if existing is None:
+        session_data.prev_score = 0
+    elif existing[0] is not None and score[3] > existing[0]:
+        session_data.prev_score = existing[0] if isinstance(existing[0], int) else 0
+    score_store.save_score(hash, *score, run_clear, HASH_VERSION)
 
 class GameScreen:
     JUDGE_X = 414
@@ -65,7 +89,11 @@ class GameScreen:
 
     def init_tja(self, song: Path):
         """Initialize the TJA file"""
-        self.tja = TJAParser(song, start_delay=self.start_delay, distance=SCREEN_WIDTH - GameScreen.JUDGE_X)
+        self.tja = TJAParser(song, start_delay=self.start_delay, distance=SCREEN_WIDTH - GameScreen.JUDGE_X,
+                             encoding=song_index.get_encoding(song))
+        # A restart replaces the video, its decoder thread and textures are released first
+        if self.movie is not None:
+            self.movie.stop()
         if self.tja.metadata.bgmovie != Path() and self.tja.metadata.bgmovie.exists():
             self.movie = VideoPlayer(self.tja.metadata.bgmovie)
             self.movie.set_volume(0.0)
@@ -75,8 +103,11 @@ class GameScreen:
         if self.tja.metadata.wave.exists() and self.tja.metadata.wave.is_file() and self.song_music is None:
             self.song_music = audio.load_music_stream(self.tja.metadata.wave, 'song')
 
-        self.player_1 = Player(self.tja, global_data.player_num, global_data.session_data[global_data.player_num-1].selected_difficulty, False, global_data.modifiers[0])
-        self.start_ms = (get_current_ms() - self.tja.metadata.offset*1000)
+        session_data = global_data.session_data[global_data.player_num-1]
+        session_data.diff_hash = song_index.get_diff_hashes(song, HASH_VERSION).get(session_data.selected_difficulty, '')
+        self.player_1 = Player(self.tja, global_data.player_num, session_data.selected_difficulty, False, global_data.modifiers[0])
+        song_timeline.start()
+        self.start_ms = (song_timeline.time_ms - self.tja.metadata.offset*1000)
 
     def on_screen_start(self):
         if not self.screen_init:
@@ -102,9 +133,11 @@ class GameScreen:
             self.transition = Transition(session_data.song_title, subtitle, is_second=True)
             self.allnet_indicator = AllNetIcon()
             self.transition.start()
+            gameplay_gc.begin(global_data.config['general'].get('gc_mode', 'default'))
 
     def on_screen_end(self, next_screen):
         self.screen_init = False
+        gameplay_gc.end()
         tex.unload_textures()
         audio.unload_all_sounds()
         audio.unload_all_music()
@@ -117,55 +150,39 @@ class GameScreen:
         return next_screen
 
     def write_score(self):
-        """Write the score to the database"""
+        """Write the score to the database
+
+        The chart hash stored in the song index is used when the chart has not changed
+        since it was indexed. Otherwise the chart is hashed again on a background
+        thread, so the end of the song never waits on parsing."""
         if self.tja is None:
             return
         if global_data.modifiers[global_data.player_num-1].auto:
             return
-        with sqlite3.connect('scores.db') as con:
-            session_data = global_data.session_data[global_data.player_num-1]
-            cursor = con.cursor()
-            notes, _, _, _ = TJAParser.notes_to_position(TJAParser(self.tja.file_path), self.player_1.difficulty)
-            hash = self.tja.hash_note_data(notes)
-            check_query = "SELECT score, clear FROM Scores WHERE hash = ? LIMIT 1"
-            cursor.execute(check_query, (hash,))
-            result = cursor.fetchone()
-            existing_score = result[0] if result is not None else None
-            existing_clear = result[1] if result is not None and len(result) > 1 and result[1] is not None else 0
-
-            # Determine clear value for this run: 2 for full combo (no bads), 1 for clear gauge, 0 otherwise
-            run_clear = 2 if session_data.result_bad == 0 else (1 if self.player_1.gauge.is_clear else 0)
-            best_clear = max(existing_clear, run_clear)
-
-            if result is None or (existing_score is not None and session_data.result_score > existing_score):
-                if result is None:
-                    session_data.prev_score = 0
-                else:
-                    if not isinstance(existing_score, int):
-                        session_data.prev_score = 0
-                    else:
-                        session_data.prev_score = existing_score
-                insert_query = '''
-                INSERT OR REPLACE INTO Scores (hash, en_name, jp_name, diff, score, good, ok, bad, drumroll, combo, clear)
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-                '''
-                data = (hash, self.tja.metadata.title['en'],
-                        self.tja.metadata.title.get('ja', ''), self.player_1.difficulty,
-                        session_data.result_score, session_data.result_good,
-                        session_data.result_ok, session_data.result_bad,
-                        session_data.result_total_drumroll, session_data.result_max_combo, best_clear)
-                cursor.execute(insert_query, data)
-                con.commit()
-            else:
-                # Score didn't improve; if clear improved, update only the clear column to preserve best crown
-                if run_clear > existing_clear:
-                    cursor.execute("UPDATE Scores SET clear = ? WHERE hash = ?", (run_clear, hash))
-                    con.commit()
+        session_data = global_data.session_data[global_data.player_num-1]
+        # Determine clear value for this run: 2 for full combo (no bads), 1 for clear gauge, 0 otherwise
+        run_clear = 2 if session_data.result_bad == 0 else (1 if self.player_1.gauge.is_clear else 0)
+        score = (self.tja.metadata.title['en'], self.tja.metadata.title.get('ja', ''), self.player_1.difficulty,
+                 session_data.result_score, session_data.result_good, session_data.result_ok,
+                 session_data.result_bad, session_data.result_total_drumroll, session_data.result_max_combo)
+        if session_data.diff_hash:
+            save_score(session_data.diff_hash, score, run_clear, session_data)
+            return
+        tja_path, encoding = self.tja.file_path, self.tja.encoding
+        def hash_and_save():
+            try:
+                tja = TJAParser(tja_path, encoding=encoding)
+                notes, _, _, _ = tja.notes_to_position(score[2])
+                save_score(tja.hash_note_data(notes), score, run_clear, session_data)
+            except Exception as e:
+                print(f"Failed to save score for {tja_path}: {e}")
+        threading.Thread(target=hash_and_save, name='write_score').start()
 
     def start_song(self, current_time):
         if (self.current_ms >= self.tja.metadata.offset*1000 + self.start_delay - global_data.config["general"]["judge_offset"]) and not self.song_started:
             if self.song_music is not None:
                 audio.play_music_stream(self.song_music)
+                song_timeline.sync_to_music(self.song_music, self.start_ms + self.tja.metadata.offset*1000 + self.start_delay - global_data.config["general"]["judge_offset"])
                 print(f"Song started at {self.current_ms}")
             if self.movie is not None:
                 self.movie.start(current_time)
@@ -175,6 +192,9 @@ class GameScreen:
         if ray.is_key_pressed(ray.KeyboardKey.KEY_F1):
             if self.song_music is not None:
                 audio.stop_music_stream(self.song_music)
+            if ray.is_key_down(ray.KeyboardKey.KEY_LEFT_SHIFT):
+                # Shift+F1 recompiles the chart instead of loading it from the cache
+                chart_cache.invalidate(global_data.selected_song)
             self.init_tja(global_data.selected_song)
             audio.play_sound('restart', 'sound')
             self.song_started = False
@@ -194,7 +214,7 @@ class GameScreen:
 
     def update_background(self, current_time):
         if self.movie is not None:
-            self.movie.update()
+            self.movie.update(current_time)
         else:
             if len(self.player_1.current_bars) > 0:
                 self.bpm = self.player_1.bpm
@@ -203,14 +223,15 @@ class GameScreen:
 
     def update(self):
         self.on_screen_start()
-        current_time = get_current_ms()
+        current_time = song_timeline.update()
         self.transition.update(current_time)
         self.current_ms = current_time - self.start_ms
         self.start_song(current_time)
         self.update_background(current_time)
 
         if self.song_music is not None:
-            audio.update_music_stream(self.song_music)
+            with profiler.section('audio'):
+                audio.update_music_stream(self.song_music)
 
         self.player_1.update(self.current_ms, current_time, self.background)
         self.song_info.update(current_time)
@@ -226,6 +247,7 @@ class GameScreen:
                     if self.player_1.ending_anim is None:
                         self.write_score()
                         self.spawn_ending_anims()
+                        tex.prefetch_screen('result')
                 if current_time >= self.end_ms + 8533.34:
                     if not self.result_transition.is_started:
                         self.result_transition.start()
@@ -264,12 +286,15 @@ class Player:
         self.difficulty = difficulty
         self.visual_offset = global_data.config["general"]["visual_offset"]
         self.modifiers = modifiers
+        self.note_batch = SpriteBatch(tex, 'notes')
 
-        notes, self.branch_m, self.branch_e, self.branch_n = tja.notes_to_position(self.difficulty)
-        self.play_notes, self.draw_note_list, self.draw_bar_list = apply_modifiers(notes, self.modifiers)
+        notes, self.branch_m, self.branch_e, self.branch_n = tja.notes_to_position(self.difficulty, use_cache=True)
+        # The don and kat hit times on each branch level, counted when an accuracy branch starts
+        self.level_scored_ms = [scored_note_times(notes, sections) for sections in (self.branch_n, self.branch_e, self.branch_m)]
+        play_notes, self.draw_note_list, self.draw_bar_list = apply_modifiers(notes, self.modifiers)
         self.end_time = 0
-        if self.play_notes:
-            self.end_time = self.play_notes[-1].hit_ms
+        if play_notes:
+            self.end_time = play_notes[-1].hit_ms
         if self.branch_m:
             for section in self.branch_m:
                 if section.play_notes:
@@ -283,10 +308,10 @@ class Player:
                 if section.play_notes:
                     self.end_time = max(self.end_time, section.play_notes[-1].hit_ms)
 
-        self.don_notes = deque([note for note in self.play_notes if note.type in {1, 3}])
-        self.kat_notes = deque([note for note in self.play_notes if note.type in {2, 4}])
-        self.other_notes = deque([note for note in self.play_notes if note.type not in {1, 2, 3, 4}])
-        self.total_notes = len([note for note in self.play_notes if 0 < note.type < 5])
+        self.don_notes = deque([note for note in play_notes if note.type in {1, 3}])
+        self.kat_notes = deque([note for note in play_notes if note.type in {2, 4}])
+        self.other_notes = deque([note for note in play_notes if note.type not in {1, 2, 3, 4}])
+        self.total_notes = len([note for note in play_notes if 0 < note.type < 5])
         total_notes = notes
         if self.branch_m:
             for section in self.branch_m:
@@ -296,17 +321,23 @@ class Player:
 
         #Note management
         self.current_bars: list[Note] = []
-        self.current_notes_draw: list[Note | Drumroll | Balloon] = []
+        # Notes on screen keyed by their index, in index order
+        self.current_notes_draw: dict[int, Note | Drumroll | Balloon] = dict()
+        # Indices of roll ends put on screen early, together with their drumroll or balloon
+        self.drawn_tails: set[int] = set()
         self.is_drumroll = False
         self.curr_drumroll_count = 0
         self.is_balloon = False
         self.curr_balloon_count = 0
         self.is_branch = False
+        self.branch_points = deque(notes.branch_points)
+        # The branch being played, 0 for normal, 1 for expert and 2 for master
+        self.branch_level = 0
         self.curr_branch_reqs = []
         self.branch_condition_count = 0
         self.branch_condition = ''
         self.balloon_index = 0
-        self.bpm = self.play_notes[0].bpm if self.play_notes else 120
+        self.bpm = play_notes[0].bpm if play_notes else 120
 
         #Score management
         self.good_count = 0
@@ -319,6 +350,20 @@ class Player:
 
         self.arc_points = 25
 
+        # Hit effects are taken from pools and given back when they finish
+        self.judge_pool = ObjectPool(Judgement, EFFECT_POOL_SIZE)
+        self.judge_pool.prefill('GOOD', False, self.is_2p)
+        self.lane_hit_pool = ObjectPool(LaneHitEffect, EFFECT_POOL_SIZE)
+        self.lane_hit_pool.prefill('DON', self.is_2p)
+        self.drum_hit_pool = ObjectPool(DrumHitEffect, EFFECT_POOL_SIZE)
+        self.drum_hit_pool.prefill('DON', 'L', self.is_2p)
+        self.arc_pool = ObjectPool(NoteArc, EFFECT_POOL_SIZE)
+        self.arc_pool.prefill(1, 0, self.is_2p + 1, False, False)
+        self.gauge_hit_pool = ObjectPool(GaugeHitEffect, EFFECT_POOL_SIZE)
+        self.gauge_hit_pool.prefill(1, False, self.is_2p)
+        self.score_anim_pool = ObjectPool(ScoreCounterAnimation, EFFECT_POOL_SIZE)
+        self.score_anim_pool.prefill(self.player_number, 100, self.is_2p)
+
         self.draw_judge_list: list[Judgement] = []
         self.lane_hit_effect: Optional[LaneHitEffect] = None
         self.draw_arc_list: list[NoteArc] = []
@@ -351,21 +396,30 @@ class Player:
         self.last_subdivision = -1
 
     def merge_branch_section(self, branch_section: NoteList, current_ms: float):
-        """Merges the branch notes into the current notes"""
-        self.play_notes.extend(branch_section.play_notes)
-        self.draw_note_list.extend(branch_section.draw_notes)
-        self.draw_bar_list.extend(branch_section.bars)
-        self.play_notes = deque(sorted(self.play_notes))
-        self.draw_note_list = deque(sorted(self.draw_note_list, key=lambda x: x.load_ms))
-        self.draw_bar_list = deque(sorted(self.draw_bar_list, key=lambda x: x.load_ms))
+        """Merges the branch notes into the notes that are left to play and draw
+
+        The parser hands out every list of a section already in order, so each one is
+        merged with what is left of the matching list in a single pass instead of
+        sorting the whole chart again. Notes that have been judged are not brought back."""
+        self.draw_note_list = deque(heapq.merge(self.draw_note_list, branch_section.draw_notes, key=lambda x: x.load_ms))
+        self.draw_bar_list = deque(heapq.merge(self.draw_bar_list, branch_section.bars, key=lambda x: x.load_ms))
         timing_threshold = current_ms - Player.TIMING_BAD
-        total_don = [note for note in self.play_notes if note.type in {1, 3}]
-        total_kat = [note for note in self.play_notes if note.type in {2, 4}]
-        total_other = [note for note in self.play_notes if note.type not in {1, 2, 3, 4}]
+        branch_don = []
+        branch_kat = []
+        branch_other = []
+        for note in branch_section.play_notes:
+            if note.hit_ms <= timing_threshold:
+                continue
+            if note.type in {1, 3}:
+                branch_don.append(note)
+            elif note.type in {2, 4}:
+                branch_kat.append(note)
+            else:
+                branch_other.append(note)
 
-        self.don_notes = deque([note for note in total_don if note.hit_ms > timing_threshold])
-        self.kat_notes = deque([note for note in total_kat if note.hit_ms > timing_threshold])
-        self.other_notes = deque([note for note in total_other if note.hit_ms > timing_threshold])
+        self.don_notes = deque(heapq.merge(self.don_notes, branch_don, key=lambda x: x.hit_ms))
+        self.kat_notes = deque(heapq.merge(self.kat_notes, branch_kat, key=lambda x: x.hit_ms))
+        self.other_notes = deque(heapq.merge(self.other_notes, branch_other, key=lambda x: x.hit_ms))
 
     def get_result_score(self):
         """Returns the score, good count, ok count, bad count, max combo, and total drumroll"""
@@ -381,7 +435,7 @@ class Player:
         time_diff = load_ms - current_ms
         return int((pixels_per_frame * 0.06 * time_diff) + ((866 * pixels_per_frame) / pixels_per_frame_x))
 
-    def animation_manager(self, animation_list: list, current_time: float):
+    def animation_manager(self, animation_list: list, current_time: float, pool: Optional[ObjectPool] = None):
         if not animation_list:
             return
 
@@ -391,6 +445,8 @@ class Player:
             animation.update(current_time)
             if not animation.is_finished:
                 remaining_animations.append(animation)
+            elif pool is not None:
+                pool.release(animation)
 
         # Replace the original list contents
         animation_list[:] = remaining_animations
@@ -414,53 +470,19 @@ class Player:
             if position >= removal_threshold:
                 bars_to_keep.append(bar)
         self.current_bars = bars_to_keep
-        if self.current_bars and hasattr(self.current_bars[-1], 'branch_params'):
-            self.branch_condition, e_req, m_req = self.current_bars[-1].branch_params.split(',')
-            delattr(self.current_bars[-1], 'branch_params')
-            e_req = float(e_req)
-            m_req = float(m_req)
-            if not self.is_branch:
-                self.is_branch = True
-                if self.branch_condition == 'r':
-                    end_time = self.branch_m[0].bars[0].load_ms
-                    end_roll = -1
-
-                    note_lists = [
-                        self.current_notes_draw,
-                        self.branch_n[0].draw_notes if self.branch_n else [],
-                        self.branch_e[0].draw_notes if self.branch_e else [],
-                        self.branch_m[0].draw_notes if self.branch_m else [],
-                        self.draw_note_list if self.draw_note_list else []
-                    ]
-
-                    end_roll = -1
-                    for notes in note_lists:
-                        for i in range(len(notes)-1, -1, -1):
-                            if notes[i].type == 8 and notes[i].hit_ms <= end_time:
-                                end_roll = notes[i].hit_ms
-                                break
-                        if end_roll != -1:
-                            break
-                    self.curr_branch_reqs = [e_req, m_req, end_roll, 1]
-                elif self.branch_condition == 'p':
-                    start_time = self.current_bars[0].hit_ms if self.current_bars else self.current_bars[-1].hit_ms
-                    branch_start_time = self.branch_m[0].bars[0].load_ms
-
-                    note_lists = [
-                        self.current_notes_draw,
-                        self.branch_n[0].draw_notes if self.branch_n else [],
-                        self.branch_e[0].draw_notes if self.branch_e else [],
-                        self.branch_m[0].draw_notes if self.branch_m else [],
-                        self.draw_note_list if self.draw_note_list else []
-                    ]
-
-                    seen_notes = set()
-                    for notes in note_lists:
-                        for note in notes:
-                            if note.type <= 4 and start_time <= note.hit_ms < branch_start_time:
-                                seen_notes.add(note)
-
-                    self.curr_branch_reqs = [e_req, m_req, branch_start_time, max(len(seen_notes), 1)]
+
+        #Start counting the condition of the next branch once the bar it is attached to is loaded
+        if not self.is_branch and self.current_bars and self.branch_points and self.branch_m and current_ms > self.branch_points[0].start_ms:
+            branch_point = self.branch_points.popleft()
+            end_ms = branch_point.end_ms[self.branch_level]
+            total_notes = 1
+            if branch_point.condition == 'p':
+                # Accuracy is counted over the notes from the first bar on screen to the decision
+                scored_ms = self.level_scored_ms[self.branch_level]
+                total_notes = max(bisect.bisect_left(scored_ms, end_ms) - bisect.bisect_left(scored_ms, self.current_bars[0].hit_ms), 1)
+            self.is_branch = True
+            self.branch_condition = branch_point.condition
+            self.curr_branch_reqs = [branch_point.expert_req, branch_point.master_req, end_ms, total_notes]
     def play_note_manager(self, current_ms: float, background: Optional[Background]):
         """Manages the play_notes and removes if necessary"""
         if self.don_notes and self.don_notes[0].hit_ms + Player.TIMING_BAD < current_ms:
@@ -511,33 +533,52 @@ class Player:
             elif note.type == 7 or note.type == 9:
                 self.is_balloon = True
 
+    def add_note_draw(self, note: Note):
+        """Puts a note on screen, keeping current_notes_draw in index order"""
+        notes_draw = self.current_notes_draw
+        out_of_order = notes_draw and note.index < next(reversed(notes_draw))
+        notes_draw[note.index] = note
+        if out_of_order:
+            # Only happens when a note scrolls in ahead of an earlier one, and only sorts what is on screen
+            self.current_notes_draw = dict(sorted(notes_draw.items()))
+
+    def roll_tail(self, head: Drumroll | Balloon) -> Note:
+        """Returns the roll end of a drumroll or balloon"""
+        if hasattr(head, 'tail'):
+            return head.tail
+        # A roll end in another branch section is not linked by the parser
+        return next((note for note in self.current_notes_draw.values() if note.type == 8 and note.index > head.index), head)
+
     def draw_note_manager(self, current_ms: float):
         """Manages the draw_notes and removes if necessary"""
+        # Roll ends already on screen with their drumroll or balloon are skipped
+        while self.draw_note_list and self.draw_note_list[0].index in self.drawn_tails:
+            self.drawn_tails.discard(self.draw_note_list.popleft().index)
         if self.draw_note_list and current_ms + 1000 >= self.draw_note_list[0].load_ms:
             current_note = self.draw_note_list.popleft()
+            self.add_note_draw(current_note)
             if 5 <= current_note.type <= 7:
-                bisect.insort_left(self.current_notes_draw, current_note, key=lambda x: x.index)
-                try:
-                    tail_note = next((note for note in self.draw_note_list if note.type == 8))
-                    bisect.insort_left(self.current_notes_draw, tail_note, key=lambda x: x.index)
-                    self.draw_note_list.remove(tail_note)
-                except Exception as e:
-                    raise(e)
-            else:
-                bisect.insort_left(self.current_notes_draw, current_note, key=lambda x: x.index)
+                if hasattr(current_note, 'tail'):
+                    tail_note = current_note.tail
+                else:
+                    tail_note = next((note for note in self.draw_note_list if note.type == 8 and note.index not in self.drawn_tails))
+                if tail_note.index not in self.current_notes_draw:
+                    self.add_note_draw(tail_note)
+                    self.drawn_tails.add(tail_note.index)
 
         if not self.current_notes_draw:
             return
 
-        if isinstance(self.current_notes_draw[0], Drumroll) and 255 > self.current_notes_draw[0].color > 0:
-            self.current_notes_draw[0].color += 1
+        first_index = next(iter(self.current_notes_draw))
+        note = self.current_notes_draw[first_index]
+        if isinstance(note, Drumroll) and 255 > note.color > 0:
+            note.color += 1
 
-        note = self.current_notes_draw[0]
         if note.type in {5, 6, 7} and len(self.current_notes_draw) > 1:
-            note = self.current_notes_draw[1]
+            note = self.roll_tail(note)
         position = self.get_position_x(SCREEN_WIDTH, current_ms, note.hit_ms, note.pixels_per_frame_x)
         if position < GameScreen.JUDGE_X + 650:
-            self.current_notes_draw.pop(0)
+            del self.current_notes_draw[first_index]
 
     def note_manager(self, current_ms: float, background: Optional[Background]):
         self.bar_manager(current_ms)
@@ -553,7 +594,6 @@ class Player:
         elif note.type not in {1, 2, 3, 4} and self.other_notes and self.other_notes[0] == note:
             self.other_notes.popleft()
 
-        index = note.index
         if note.type == 7:
             if self.other_notes:
                 self.other_notes.popleft()
@@ -568,15 +608,13 @@ class Player:
                 self.max_combo = self.combo
 
         if note.type != 9:
-            self.draw_arc_list.append(NoteArc(note.type, current_time, self.is_2p + 1, note.type == 3 or note.type == 4 or note.type == 7, note.type == 7))
+            self.draw_arc_list.append(self.arc_pool.acquire(note.type, current_time, self.is_2p + 1, note.type == 3 or note.type == 4 or note.type == 7, note.type == 7))
 
-        if note in self.current_notes_draw:
-            index = self.current_notes_draw.index(note)
-            self.current_notes_draw.pop(index)
+        self.current_notes_draw.pop(note.index, None)
 
     def check_drumroll(self, drum_type: int, background: Optional[Background], current_time: float):
         """Checks if a note has been hit during a drumroll"""
-        self.draw_arc_list.append(NoteArc(drum_type, current_time, self.is_2p + 1, drum_type == 3 or drum_type == 4, False))
+        self.draw_arc_list.append(self.arc_pool.acquire(drum_type, current_time, self.is_2p + 1, drum_type == 3 or drum_type == 4, False))
         self.curr_drumroll_count += 1
         self.total_drumroll += 1
         if self.is_branch and self.branch_condition == 'r':
@@ -584,10 +622,11 @@ class Player:
         if background is not None:
             background.add_renda()
         self.score += 100
-        self.base_score_list.append(ScoreCounterAnimation(self.player_number, 100, self.is_2p))
-        if not isinstance(self.current_notes_draw[0], Drumroll):
+        self.base_score_list.append(self.score_anim_pool.acquire(self.player_number, 100, self.is_2p))
+        head = next(iter(self.current_notes_draw.values()), None)
+        if not isinstance(head, Drumroll):
             return
-        self.current_notes_draw[0].color = max(0, 255 - (self.curr_drumroll_count * 10))
+        head.color = max(0, 255 - (self.curr_drumroll_count * 10))
 
     def check_balloon(self, drum_type: int, note: Balloon, current_time: float):
         """Checks if the player has popped a balloon"""
@@ -601,7 +640,7 @@ class Player:
         self.curr_balloon_count += 1
         self.total_drumroll += 1
         self.score += 100
-        self.base_score_list.append(ScoreCounterAnimation(self.player_number, 100, self.is_2p))
+        self.base_score_list.append(self.score_anim_pool.acquire(self.player_number, 100, self.is_2p))
         if self.curr_balloon_count == note.count:
             self.is_balloon = False
             note.popped = True
@@ -617,7 +656,7 @@ class Player:
         self.curr_balloon_count += 1
         self.total_drumroll += 1
         self.score += 100
-        self.base_score_list.append(ScoreCounterAnimation(self.player_number, 100, self.is_2p))
+        self.base_score_list.append(self.score_anim_pool.acquire(self.player_number, 100, self.is_2p))
         if self.curr_balloon_count == note.count:
             audio.play_sound('kusudama_pop', 'hitsound')
             self.is_balloon = False
@@ -665,11 +704,11 @@ class Player:
 
             big = curr_note.type == 3 or curr_note.type == 4
             if (curr_note.hit_ms - good_window_ms) <= ms_from_start <= (curr_note.hit_ms + good_window_ms):
-                self.draw_judge_list.append(Judgement('GOOD', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
-                self.lane_hit_effect = LaneHitEffect('GOOD', self.is_2p)
+                self.draw_judge_list.append(self.judge_pool.acquire('GOOD', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
+                self.show_lane_hit_effect('GOOD')
                 self.good_count += 1
                 self.score += self.base_score
-                self.base_score_list.append(ScoreCounterAnimation(self.player_number, self.base_score, self.is_2p))
+                self.base_score_list.append(self.score_anim_pool.acquire(self.player_number, self.base_score, self.is_2p))
                 self.note_correct(curr_note, current_time)
                 self.gauge.add_good()
                 if self.is_branch and self.branch_condition == 'p':
@@ -681,10 +720,10 @@ class Player:
                         background.add_chibi(False, 1)
 
             elif (curr_note.hit_ms - ok_window_ms) <= ms_from_start <= (curr_note.hit_ms + ok_window_ms):
-                self.draw_judge_list.append(Judgement('OK', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
+                self.draw_judge_list.append(self.judge_pool.acquire('OK', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
                 self.ok_count += 1
                 self.score += 10 * math.floor(self.base_score / 2 / 10)
-                self.base_score_list.append(ScoreCounterAnimation(self.player_number, 10 * math.floor(self.base_score / 2 / 10), self.is_2p))
+                self.base_score_list.append(self.score_anim_pool.acquire(self.player_number, 10 * math.floor(self.base_score / 2 / 10), self.is_2p))
                 self.note_correct(curr_note, current_time)
                 self.gauge.add_ok()
                 if self.is_branch and self.branch_condition == 'p':
@@ -696,10 +735,10 @@ class Player:
                         background.add_chibi(False, 1)
 
             elif (curr_note.hit_ms - bad_window_ms) <= ms_from_start <= (curr_note.hit_ms + bad_window_ms):
-                self.draw_judge_list.append(Judgement('BAD', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
+                self.draw_judge_list.append(self.judge_pool.acquire('BAD', big, self.is_2p, ms_display=ms_from_start - curr_note.hit_ms))
                 self.bad_count += 1
                 self.combo = 0
-                # Remove from both the specific note list and the main play_notes list
+                # Remove from the note list of its drum
                 if drum_type == 1:
                     self.don_notes.popleft()
                 else:
@@ -737,22 +776,28 @@ class Player:
                 self.kusudama_anim = None
 
     def handle_input(self, ms_from_start: float, current_time: float, background: Optional[Background]):
-        input_checks = [
-            (is_l_don_pressed, 'DON', 'L', f'hitsound_don_{self.player_number}p'),
-            (is_r_don_pressed, 'DON', 'R', f'hitsound_don_{self.player_number}p'),
-            (is_l_kat_pressed, 'KAT', 'L', f'hitsound_kat_{self.player_number}p'),
-            (is_r_kat_pressed, 'KAT', 'R', f'hitsound_kat_{self.player_number}p')
-        ]
-        for check_func, note_type, side, sound in input_checks:
-            if check_func(self.player_number):
-                self.lane_hit_effect = LaneHitEffect(note_type, self.is_2p)
-                self.draw_drum_hit_list.append(DrumHitEffect(note_type, side, self.is_2p))
+        """Judges the drums pressed this frame at the frame's time"""
+        for _, bit, note_type, side in DRUM_INPUTS:
+            if drum_input.is_pressed(bit, self.player_number):
+                self.hit(note_type, side, f'hitsound_{note_type.lower()}_{self.player_number}p',
+                         ms_from_start, current_time, background)
+
+    def show_lane_hit_effect(self, type: str):
+        """Replaces the lane hit effect, giving the old one back to its pool"""
+        if self.lane_hit_effect is not None:
+            self.lane_hit_pool.release(self.lane_hit_effect)
+        self.lane_hit_effect = self.lane_hit_pool.acquire(type, self.is_2p)
 
-                audio.play_sound(sound, 'hitsound')
+    def hit(self, note_type: str, side: str, sound: str, ms_from_start: float, current_time: float, background: Optional[Background]):
+        """Plays a drum hit and judges it against the notes at ms_from_start"""
+        self.show_lane_hit_effect(note_type)
+        self.draw_drum_hit_list.append(self.drum_hit_pool.acquire(note_type, side, self.is_2p))
 
-                drum_value = 1 if note_type == 'DON' else 2
-                self.check_note(ms_from_start, drum_value, current_time, background)
-                self.input_log[ms_from_start] = (note_type, side)
+        audio.play_sound(sound, 'hitsound')
+
+        drum_value = 1 if note_type == 'DON' else 2
+        self.check_note(ms_from_start, drum_value, current_time, background)
+        self.input_log[ms_from_start] = (note_type, side)
 
     def autoplay_manager(self, ms_from_start: float, current_time: float, background: Optional[Background]):
         """Manages autoplay behavior"""
@@ -772,9 +817,9 @@ class Player:
             if subdivision_in_ms > self.last_subdivision:
                 self.last_subdivision = subdivision_in_ms
                 hit_type = 'DON'
-                self.lane_hit_effect = LaneHitEffect(hit_type, self.is_2p)
+                self.show_lane_hit_effect(hit_type)
                 self.autoplay_hit_side = 'R' if self.autoplay_hit_side == 'L' else 'L'
-                self.draw_drum_hit_list.append(DrumHitEffect(hit_type, self.autoplay_hit_side, self.is_2p))
+                self.draw_drum_hit_list.append(self.drum_hit_pool.acquire(hit_type, self.autoplay_hit_side, self.is_2p))
                 audio.play_sound(f'hitsound_don_{self.player_number}p', 'hitsound')
                 note_type = 3 if note.type == 6 else 1
                 self.check_note(ms_from_start, note_type, current_time, background)
@@ -783,9 +828,9 @@ class Player:
             while self.don_notes and ms_from_start >= self.don_notes[0].hit_ms:
                 note = self.don_notes[0]
                 hit_type = 'DON'
-                self.lane_hit_effect = LaneHitEffect(hit_type, self.is_2p)
+                self.show_lane_hit_effect(hit_type)
                 self.autoplay_hit_side = 'R' if self.autoplay_hit_side == 'L' else 'L'
-                self.draw_drum_hit_list.append(DrumHitEffect(hit_type, self.autoplay_hit_side, self.is_2p))
+                self.draw_drum_hit_list.append(self.drum_hit_pool.acquire(hit_type, self.autoplay_hit_side, self.is_2p))
                 audio.play_sound(f'hitsound_don_{self.player_number}p', 'hitsound')
                 self.check_note(ms_from_start, 1, current_time, background)
 
@@ -793,9 +838,9 @@ class Player:
             while self.kat_notes and ms_from_start >= self.kat_notes[0].hit_ms:
                 note = self.kat_notes[0]
                 hit_type = 'KAT'
-                self.lane_hit_effect = LaneHitEffect(hit_type, self.is_2p)
+                self.show_lane_hit_effect(hit_type)
                 self.autoplay_hit_side = 'R' if self.autoplay_hit_side == 'L' else 'L'
-                self.draw_drum_hit_list.append(DrumHitEffect(hit_type, self.autoplay_hit_side, self.is_2p))
+                self.draw_drum_hit_list.append(self.drum_hit_pool.acquire(hit_type, self.autoplay_hit_side, self.is_2p))
                 audio.play_sound(f'hitsound_kat_{self.player_number}p', 'hitsound')
                 self.check_note(ms_from_start, 2, current_time, background)
 
@@ -808,6 +853,7 @@ class Player:
                 self.branch_condition_count = min((self.branch_condition_count/total_notes)*100, 100)
             if self.branch_condition_count >= e_req and self.branch_condition_count < m_req:
                 self.merge_branch_section(self.branch_e.pop(0), current_ms)
+                self.branch_level = 1
                 if self.branch_indicator is not None and self.branch_indicator.difficulty != 'expert':
                     if self.branch_indicator.difficulty == 'master':
                         self.branch_indicator.level_down('expert')
@@ -817,12 +863,14 @@ class Player:
                 self.branch_n.pop(0)
             elif self.branch_condition_count >= m_req:
                 self.merge_branch_section(self.branch_m.pop(0), current_ms)
+                self.branch_level = 2
                 if self.branch_indicator is not None and self.branch_indicator.difficulty != 'master':
                     self.branch_indicator.level_up('master')
                 self.branch_n.pop(0)
                 self.branch_e.pop(0)
             else:
                 self.merge_branch_section(self.branch_n.pop(0), current_ms)
+                self.branch_level = 0
                 if self.branch_indicator is not None and self.branch_indicator.difficulty != 'normal':
                     self.branch_indicator.level_down('normal')
                 self.branch_m.pop(0)
@@ -830,33 +878,35 @@ class Player:
             self.branch_condition_count = 0
 
     def update(self, ms_from_start: float, current_time: float, background: Optional[Background]):
-        self.note_manager(ms_from_start, background)
+        with profiler.section('note_manager'):
+            self.note_manager(ms_from_start, background)
         self.combo_display.update(current_time, self.combo)
         self.combo_announce.update(current_time)
         self.drumroll_counter_manager(current_time)
-        self.animation_manager(self.draw_judge_list, current_time)
+        self.animation_manager(self.draw_judge_list, current_time, self.judge_pool)
         self.balloon_manager(current_time)
         if self.gogo_time is not None:
             self.gogo_time.update(current_time)
         if self.lane_hit_effect is not None:
             self.lane_hit_effect.update(current_time)
-        self.animation_manager(self.draw_drum_hit_list, current_time)
+        self.animation_manager(self.draw_drum_hit_list, current_time, self.drum_hit_pool)
 
         # More efficient arc management
         finished_arcs = []
         for i, anim in enumerate(self.draw_arc_list):
             anim.update(current_time)
             if anim.is_finished:
-                self.gauge_hit_effect.append(GaugeHitEffect(anim.note_type, anim.is_big, self.is_2p))
+                self.gauge_hit_effect.append(self.gauge_hit_pool.acquire(anim.note_type, anim.is_big, self.is_2p))
                 finished_arcs.append(i)
         for i in reversed(finished_arcs):
-            self.draw_arc_list.pop(i)
+            self.arc_pool.release(self.draw_arc_list.pop(i))
 
-        self.animation_manager(self.gauge_hit_effect, current_time)
-        self.animation_manager(self.base_score_list, current_time)
+        self.animation_manager(self.gauge_hit_effect, current_time, self.gauge_hit_pool)
+        self.animation_manager(self.base_score_list, current_time, self.score_anim_pool)
         self.score_counter.update(current_time, self.score)
         self.autoplay_manager(ms_from_start, current_time, background)
-        self.handle_input(ms_from_start, current_time, background)
+        with profiler.section('handle_input'):
+            self.handle_input(ms_from_start, current_time, background)
         self.nameplate.update(current_time)
         self.gauge.update(current_time)
         if self.judge_counter is not None:
@@ -867,7 +917,8 @@ class Player:
             self.ending_anim.update(current_time)
 
         if self.is_branch:
-            self.evaluate_branch(ms_from_start)
+            with profiler.section('evaluate_branch'):
+                self.evaluate_branch(ms_from_start)
 
         # Get the next note from any of the three lists for BPM and gogo time updates
         next_note = None
@@ -897,29 +948,30 @@ class Player:
     def draw_drumroll(self, current_ms: float, head: Drumroll, current_eighth: int):
         """Draws a drumroll in the player's lane"""
         start_position = self.get_position_x(SCREEN_WIDTH, current_ms, head.load_ms, head.pixels_per_frame_x)
-        tail = next((note for note in self.current_notes_draw[1:] if note.type == 8 and note.index > head.index), self.current_notes_draw[1])
+        tail = self.roll_tail(head)
         is_big = int(head.type == 6)
         end_position = self.get_position_x(SCREEN_WIDTH, current_ms, tail.load_ms, tail.pixels_per_frame_x)
         length = end_position - start_position
         color = ray.Color(255, head.color, head.color, 255)
+        batch = self.note_batch
         if head.display:
             if length > 0:
-                tex.draw_texture('notes', "8", frame=is_big, x=start_position+64, y=192+(self.is_2p*176), x2=length-47, color=color)
+                batch.add("8", is_big, start_position+64, 192+(self.is_2p*176), color, length-47)
                 if is_big:
-                    tex.draw_texture('notes', "drumroll_big_tail", x=end_position+64, y=192+(self.is_2p*176), color=color)
+                    batch.add("drumroll_big_tail", 0, end_position+64, 192+(self.is_2p*176), color)
                 else:
-                    tex.draw_texture('notes', "drumroll_tail", x=end_position+64, y=192+(self.is_2p*176), color=color)
-            tex.draw_texture('notes', str(head.type), frame=current_eighth % 2, x=start_position, y=192+(self.is_2p*176), color=color)
+                    batch.add("drumroll_tail", 0, end_position+64, 192+(self.is_2p*176), color)
+            batch.add(str(head.type), current_eighth % 2, start_position, 192+(self.is_2p*176), color)
 
-        tex.draw_texture('notes', 'moji_drumroll_mid', x=start_position + 60, y=323+(self.is_2p*176), x2=length)
-        tex.draw_texture('notes', 'moji', frame=head.moji, x=(start_position - (168//2)) + 64, y=323+(self.is_2p*176))
-        tex.draw_texture('notes', 'moji', frame=tail.moji, x=(end_position - (168//2)) + 32, y=323+(self.is_2p*176))
+        batch.add('moji_drumroll_mid', 0, start_position + 60, 323+(self.is_2p*176), x2=length)
+        batch.add('moji', head.moji, (start_position - (168//2)) + 64, 323+(self.is_2p*176))
+        batch.add('moji', tail.moji, (end_position - (168//2)) + 32, 323+(self.is_2p*176))
 
     def draw_balloon(self, current_ms: float, head: Balloon, current_eighth: int):
         """Draws a balloon in the player's lane"""
         offset = 12
         start_position = self.get_position_x(SCREEN_WIDTH, current_ms, head.load_ms, head.pixels_per_frame_x)
-        tail = next((note for note in self.current_notes_draw[1:] if note.type == 8 and note.index > head.index), self.current_notes_draw[1])
+        tail = self.roll_tail(head)
         end_position = self.get_position_x(SCREEN_WIDTH, current_ms, tail.load_ms, tail.pixels_per_frame_x)
         pause_position = 349
         if current_ms >= tail.hit_ms:
@@ -929,16 +981,14 @@ class Player:
         else:
             position = start_position
         if head.display:
-            tex.draw_texture('notes', str(head.type), frame=current_eighth % 2, x=position-offset, y=192+(self.is_2p*176))
-        tex.draw_texture('notes', '10', frame=current_eighth % 2, x=position-offset+128, y=192+(self.is_2p*176))
+            self.note_batch.add(str(head.type), current_eighth % 2, position-offset, 192+(self.is_2p*176))
+        self.note_batch.add('10', current_eighth % 2, position-offset+128, 192+(self.is_2p*176))
 
     def draw_bars(self, current_ms: float):
         """Draw bars in the player's lane"""
         if not self.current_bars:
             return
 
-        # Batch bar draws by pre-calculating positions
-        bar_draws = []
         for bar in reversed(self.current_bars):
             if not bar.display:
                 continue
@@ -948,11 +998,8 @@ class Player:
                 frame = 1
             else:
                 frame = 0
-            bar_draws.append((str(bar.type), frame, x_position+60, y_position+190+(self.is_2p*176)))
-
-        # Draw all bars in one batch
-        for bar_type, frame, x, y in bar_draws:
-            tex.draw_texture('notes', bar_type, frame=frame, x=x, y=y)
+            self.note_batch.add(str(bar.type), frame, x_position+60, y_position+190+(self.is_2p*176))
+        self.note_batch.flush()
 
     def draw_notes(self, current_ms: float, start_ms: float):
         """Draw notes in the player's lane"""
@@ -964,8 +1011,10 @@ class Player:
         if self.combo >= 50 and eighth_in_ms != 0:
             current_eighth = int((current_ms - start_ms) // eighth_in_ms)
 
-        for note in reversed(self.current_notes_draw):
-            if self.is_balloon and note == self.current_notes_draw[0]:
+        batch = self.note_batch
+        first_index = next(iter(self.current_notes_draw))
+        for note in reversed(self.current_notes_draw.values()):
+            if self.is_balloon and note.index == first_index:
                 continue
             if note.type == 8:
                 continue
@@ -976,13 +1025,14 @@ class Player:
                 x_position = self.get_position_x(SCREEN_WIDTH, current_ms, note.load_ms, note.pixels_per_frame_x)
                 y_position = self.get_position_y(current_ms, note.load_ms, note.pixels_per_frame_y, note.pixels_per_frame_x)
                 self.draw_balloon(current_ms, note, current_eighth)
-                tex.draw_texture('notes', 'moji', frame=note.moji, x=x_position - (168//2) + 64, y=323 + y_position+(self.is_2p*176))
+                batch.add('moji', note.moji, x_position - (168//2) + 64, 323 + y_position+(self.is_2p*176))
             else:
                 x_position = self.get_position_x(SCREEN_WIDTH, current_ms, note.load_ms, note.pixels_per_frame_x)
                 y_position = self.get_position_y(current_ms, note.load_ms, note.pixels_per_frame_y, note.pixels_per_frame_x)
                 if note.display:
-                    tex.draw_texture('notes', str(note.type), frame=current_eighth % 2, x=x_position, y=y_position+192+(self.is_2p*176), center=True)
-                tex.draw_texture('notes', 'moji', frame=note.moji, x=x_position - (168//2) + 64, y=323 + y_position+(self.is_2p*176))
+                    batch.add(str(note.type), current_eighth % 2, x_position, y_position+192+(self.is_2p*176))
+                batch.add('moji', note.moji, x_position - (168//2) + 64, 323 + y_position+(self.is_2p*176))
+        batch.flush()
 
 
     def draw_modifiers(self):
@@ -1028,8 +1078,10 @@ class Player:
             anim.draw()
 
         # Group 3: Notes and bars (game content)
-        self.draw_bars(ms_from_start)
-        self.draw_notes(ms_from_start, start_ms)
+        with profiler.section('draw_bars'):
+            self.draw_bars(ms_from_start)
+        with profiler.section('draw_notes'):
+            self.draw_notes(ms_from_start, start_ms)
 
         # Group 4: Lane covers and UI elements (batch similar textures)
         tex.draw_texture('lane', f'{self.player_number}p_lane_cover', index=self.is_2p)
@@ -1083,6 +1135,14 @@ class Player:
 class Judgement:
     """Shows the judgement of the player's hit"""
     def __init__(self, type: str, big: bool, is_2p: bool, ms_display: Optional[float]=None):
+        self.fade_animation_1 = Animation.create_fade(132, initial_opacity=0.5, delay=100)
+        self.fade_animation_2 = Animation.create_fade(316 - 233.3, delay=233.3)
+        self.move_animation = Animation.create_move(83, total_distance=15, start_position=144)
+        self.texture_animation = Animation.create_texture_change(100, textures=[(33, 50, 0), (50, 83, 1), (83, 100, 2), (100, float('inf'), 3)])
+        self.reset(type, big, is_2p, ms_display)
+
+    def reset(self, type: str, big: bool, is_2p: bool, ms_display: Optional[float]=None):
+        """Show a new judgement, restarting the animations"""
         self.is_2p = is_2p
         self.type = type
         self.big = big
@@ -1091,13 +1151,10 @@ class Judgement:
         if ms_display is not None:
             self.curr_hit_ms = str(round(ms_display, 2))
 
-        self.fade_animation_1 = Animation.create_fade(132, initial_opacity=0.5, delay=100)
         self.fade_animation_1.start()
-        self.fade_animation_2 = Animation.create_fade(316 - 233.3, delay=233.3)
         self.fade_animation_2.start()
-        self.move_animation = Animation.create_move(83, total_distance=15, start_position=144)
         self.move_animation.start()
-        self.texture_animation = Animation.create_texture_change(100, textures=[(33, 50, 0), (50, 83, 1), (83, 100, 2), (100, float('inf'), 3)])
+        self.texture_animation.reset()
         self.texture_animation.start()
 
     def update(self, current_ms):
@@ -1135,9 +1192,13 @@ class Judgement:
 class LaneHitEffect:
     """Display a gradient overlay when the player hits the drum"""
     def __init__(self, type: str, is_2p: bool):
+        self.fade = tex.get_animation(0, is_copy=True)
+        self.reset(type, is_2p)
+
+    def reset(self, type: str, is_2p: bool):
+        """Show a new hit, restarting the fade"""
         self.is_2p = is_2p
         self.type = type
-        self.fade = tex.get_animation(0, is_copy=True)
         self.fade.start()
         self.is_finished = False
 
@@ -1157,11 +1218,15 @@ class LaneHitEffect:
 class DrumHitEffect:
     """Display the side of the drum hit"""
     def __init__(self, type: str, side: str, is_2p: bool):
+        self.fade = tex.get_animation(1, is_copy=True)
+        self.reset(type, side, is_2p)
+
+    def reset(self, type: str, side: str, is_2p: bool):
+        """Show a new hit, restarting the fade"""
         self.is_2p = is_2p
         self.type = type
         self.side = side
         self.is_finished = False
-        self.fade = tex.get_animation(1, is_copy=True)
         self.fade.start()
 
     def update(self, current_ms: float):
@@ -1186,18 +1251,24 @@ class GaugeHitEffect:
     _COLOR_THRESHOLDS = [(0.70, ray.WHITE), (0.80, ray.YELLOW), (0.90, ray.ORANGE), (1.00, ray.RED)]
 
     def __init__(self, note_type: int, big: bool, is_2p: bool):
+        self.texture_change = tex.get_animation(2, is_copy=True)
+        self.circle_fadein = Animation.create_fade(133, initial_opacity=0.0, final_opacity=1.0, delay=16.67)
+        self.resize = Animation.create_texture_resize(233, delay=self.texture_change.duration, initial_size=0.75, final_size=1.15)
+        self.fade_out = Animation.create_fade(66, delay=233)
+        self.rotation = Animation.create_fade(300, delay=116.67, initial_opacity=0.0, final_opacity=1.0)
+        self.reset(note_type, big, is_2p)
+
+    def reset(self, note_type: int, big: bool, is_2p: bool):
+        """Show a new note reaching the gauge, restarting the animations"""
         self.is_2p = is_2p
         self.note_type = note_type
         self.is_big = big
-        self.texture_change = tex.get_animation(2, is_copy=True)
+        self.texture_change.reset()
         self.texture_change.start()
-        self.circle_fadein = Animation.create_fade(133, initial_opacity=0.0, final_opacity=1.0, delay=16.67)
         self.circle_fadein.start()
-        self.resize = Animation.create_texture_resize(233, delay=self.texture_change.duration, initial_size=0.75, final_size=1.15)
         self.resize.start()
-        self.fade_out = Animation.create_fade(66, delay=233)
+        self.resize.attribute = self.resize.initial_size
         self.fade_out.start()
-        self.rotation = Animation.create_fade(300, delay=116.67, initial_opacity=0.0, final_opacity=1.0)
         self.rotation.start()
         self.color = ray.fade(ray.YELLOW, self.circle_fadein.attribute)
         self.is_finished = False
@@ -1213,6 +1284,7 @@ class GaugeHitEffect:
         # Cache for texture selection
         self.circle_texture = 'hit_effect_circle_big' if self.is_big else 'hit_effect_circle'
         self._last_resize_value = -1
+        self._last_resize_calc = -1
         self._cached_texture_color = ray.WHITE
 
     def _get_texture_color_for_resize(self, resize_value):
@@ -1250,7 +1322,7 @@ class GaugeHitEffect:
 
         # Pre-compute drawing values only when resize changes significantly
         resize_val = self.resize.attribute
-        if abs(resize_val - getattr(self, '_last_resize_calc', -1)) > 0.005:
+        if abs(resize_val - self._last_resize_calc) > 0.005:
             self._last_resize_calc = resize_val
             self.texture_color = self._get_texture_color_for_resize(resize_val)
             self.dest_width = 152 * resize_val
@@ -1290,26 +1362,37 @@ class GaugeHitEffect:
 class NoteArc:
     """Note arcing from the player to the gauge"""
     def __init__(self, note_type: int, current_ms: float, player_number: int, big: bool, is_balloon: bool):
+        self.arc_points = 100
+        self.arc_duration = 22
+        self.points_per_explosion = 5
+        self.player_number = 0
+        self.reset(note_type, current_ms, player_number, big, is_balloon)
+
+    def reset(self, note_type: int, current_ms: float, player_number: int, big: bool, is_balloon: bool):
+        """Start a new arc, the points of the curve are only computed again when the player changes"""
         self.note_type = note_type
         self.is_big = big
         self.is_balloon = is_balloon
-        self.arc_points = 100
-        self.arc_duration = 22
         self.current_progress = 0
         self.create_ms = current_ms
-        self.player_number = player_number
-
         self.explosion_point_index = 0
-        self.points_per_explosion = 5
+        self.is_finished = False
+        if player_number != self.player_number:
+            self.player_number = player_number
+            self._build_arc()
+        self.x_i, self.y_i = self.arc_points_cache[0]
+        self.explosion_x, self.explosion_y = self.arc_points_cache[0]
+        self.explosion_anim = tex.get_animation(22)
+        self.explosion_anim.start()
 
+    def _build_arc(self):
+        """Compute the points of the curve from the player to the gauge"""
         curve_height = 425
         self.start_x, self.start_y = 350, 192
         self.end_x, self.end_y = 1158, 101
         if self.player_number == 2:
             self.start_y += 176
             self.end_y += 372
-        self.explosion_x = self.start_x
-        self.explosion_y = self.start_y
 
         if self.player_number == 1:
             # Control point influences the curve shape
@@ -1319,9 +1402,6 @@ class NoteArc:
             self.control_x = (self.start_x + self.end_x) // 2
             self.control_y = max(self.start_y, self.end_y) + curve_height  # Arc downward
 
-        self.x_i = self.start_x
-        self.y_i = self.start_y
-        self.is_finished = False
         self.arc_points_cache = []
         for i in range(self.arc_points + 1):
             t = i / self.arc_points
@@ -1330,10 +1410,6 @@ class NoteArc:
             y = int(t_inv * t_inv * self.start_y + 2 * t_inv * t * self.control_y + t * t * self.end_y)
             self.arc_points_cache.append((x, y))
 
-        self.explosion_x, self.explosion_y = self.arc_points_cache[0]
-        self.explosion_anim = tex.get_animation(22)
-        self.explosion_anim.start()
-
     def update(self, current_ms: float):
         ms_since_call = (current_ms - self.create_ms) / 16.67
         ms_since_call = max(0, min(ms_since_call, self.arc_duration))
@@ -1647,32 +1723,36 @@ class ScoreCounter:
 class ScoreCounterAnimation:
     """Displays the score init being added to the total score"""
     def __init__(self, player_num: str, counter: int, is_2p: bool):
+        self.fade_animation_1 = Animation.create_fade(50, initial_opacity=0.0, final_opacity=1.0)
+        self.move_animation_1 = Animation.create_move(80, total_distance=-20, start_position=175)
+        self.fade_animation_2 = Animation.create_fade(80, delay=366.74)
+        self.move_animation_2 = Animation.create_move(66, total_distance=5, start_position=145, delay=80)
+        self.move_animation_3 = Animation.create_move(66, delay=279.36, total_distance=-2, start_position=146)
+        self.move_animation_4 = Animation.create_move(80, delay=366.74, total_distance=10, start_position=148)
+        self.margin = 20
+        self.reset(player_num, counter, is_2p)
+
+    def reset(self, player_num: str, counter: int, is_2p: bool):
+        """Show a new score, restarting the animations"""
         self.is_2p = is_2p
         self.counter = counter
         self.direction = -1 if self.is_2p else 1
-        self.fade_animation_1 = Animation.create_fade(50, initial_opacity=0.0, final_opacity=1.0)
         self.fade_animation_1.start()
-        self.move_animation_1 = Animation.create_move(80, total_distance=-20, start_position=175)
         self.move_animation_1.start()
-        self.fade_animation_2 = Animation.create_fade(80, delay=366.74)
         self.fade_animation_2.start()
-        self.move_animation_2 = Animation.create_move(66, total_distance=5, start_position=145, delay=80)
         self.move_animation_2.start()
-        self.move_animation_3 = Animation.create_move(66, delay=279.36, total_distance=-2, start_position=146)
         self.move_animation_3.start()
-        self.move_animation_4 = Animation.create_move(80, delay=366.74, total_distance=10, start_position=148)
         self.move_animation_4.start()
 
         if player_num == '2':
             self.base_color = ray.Color(84, 250, 238, 255)
         else:
             self.base_color = ray.Color(254, 102, 0, 255)
-        self.color = ray.fade(self.base_color, 1.0)
+        self.color = ray.fade(self.base_color, self.fade_animation_1.attribute)
         self.is_finished = False
 
         # Cache string and layout calculations
         self.counter_str = str(counter)
-        self.margin = 20
         self.total_width = len(self.counter_str) * self.margin
         self.y_pos_list = []
 
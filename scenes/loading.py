@@ -4,6 +4,7 @@ import pyray as ray
 
 from libs.animation import Animation
 from libs.global_objects import AllNetIcon
+from libs.score_store import score_store
 from libs.song_hash import build_song_hashes
 from libs.texture import tex
 from libs.utils import get_current_ms, global_data
@@ -36,6 +37,9 @@ class LoadScreen:
     def _load_song_hashes(self):
         """Background thread function to load song hashes"""
         global_data.song_hashes = build_song_hashes()
+        # Song select reads the scores of every box, load them before it starts
+        score_store.flush()
+        score_store.preload()
         self.songs_loaded = True
 
     def _load_navigator(self):
@@ -4,13 +4,12 @@ from libs.global_data import reset_session
 from libs.audio import audio
 from libs.chara_2d import Chara2D
 from libs.global_objects import AllNetIcon, CoinOverlay, Nameplate
+from libs.input import DON, drum_input
 from libs.texture import tex
 from libs.utils import (
     OutlinedText,
     get_current_ms,
     global_data,
-    is_l_don_pressed,
-    is_r_don_pressed
 )
 
 
@@ -55,11 +54,12 @@ class ResultScreen:
         return next_screen
 
     def handle_input(self):
-        if is_r_don_pressed() or is_l_don_pressed():
+        if drum_input.is_pressed(DON):
             if not self.is_skipped:
                 self.is_skipped = True
             else:
                 self.fade_out.start()
+                tex.prefetch_screen('song_select')
             audio.play_sound('don', 'sound')
 
     def update(self):
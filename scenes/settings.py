@@ -1,12 +1,9 @@
 import pyray as ray
 
 from libs.audio import audio
+from libs.input import DON, L_DON, L_KAT, R_DON, R_KAT, drum_input, input_map
 from libs.utils import (
     global_data,
-    is_l_don_pressed,
-    is_l_kat_pressed,
-    is_r_don_pressed,
-    is_r_kat_pressed,
     save_config,
 )
 
@@ -32,6 +29,7 @@ class SettingsScreen:
         self.screen_init = False
         save_config(self.config)
         global_data.config = self.config
+        input_map.compile(global_data.config)
         audio.close_audio_device()
         audio.device_type = global_data.config["audio"]["device_type"]
         audio.target_sample_rate = global_data.config["audio"]["sample_rate"]
@@ -85,6 +83,7 @@ class SettingsScreen:
 
         options = {
             'language': ['ja', 'en'],
+            'gc_mode': ['default', 'freeze', 'tuned'],
         }
 
         if key in options:
@@ -147,18 +146,18 @@ class SettingsScreen:
         current_header = self.headers[self.header_index]
 
         # Exit handling
-        if current_header == 'Exit' and (is_l_don_pressed() or is_r_don_pressed()):
+        if current_header == 'Exit' and (drum_input.is_pressed(DON)):
             return self.on_screen_end()
 
         # Navigation between sections
         if not self.in_setting_edit:
-            if is_r_kat_pressed():
+            if drum_input.is_pressed(R_KAT):
                 self.header_index = (self.header_index + 1) % len(self.headers)
                 self.setting_index = 0
-            elif is_l_kat_pressed():
+            elif drum_input.is_pressed(L_KAT):
                 self.header_index = (self.header_index - 1) % len(self.headers)
                 self.setting_index = 0
-            elif (is_l_don_pressed() or is_r_don_pressed()) and current_header != 'Exit':
+            elif (drum_input.is_pressed(DON)) and current_header != 'Exit':
                 self.in_setting_edit = True
         else:
             # Navigation within settings
@@ -167,11 +166,11 @@ class SettingsScreen:
                 self.in_setting_edit = False
                 return
 
-            if is_r_kat_pressed():
+            if drum_input.is_pressed(R_KAT):
                 self.setting_index = (self.setting_index + 1) % len(settings)
-            elif is_l_kat_pressed():
+            elif drum_input.is_pressed(L_KAT):
                 self.setting_index = (self.setting_index - 1) % len(settings)
-            elif is_r_don_pressed():
+            elif drum_input.is_pressed(R_DON):
                 # Modify setting value
                 setting_key, setting_value = settings[self.setting_index]
 
@@ -192,7 +191,7 @@ class SettingsScreen:
                         self.handle_key_binding(current_header, setting_key)
                     elif isinstance(setting_value[0], int):
                         self.handle_gamepad_binding(current_header, setting_key)
-            elif is_l_don_pressed():
+            elif drum_input.is_pressed(L_DON):
                 # Modify setting value (reverse direction for numeric)
                 setting_key, setting_value = settings[self.setting_index]
 
@@ -10,16 +10,13 @@ from libs.chara_2d import Chara2D
 from libs.file_navigator import Directory, SongBox, SongFile
 from libs.global_data import Modifiers
 from libs.global_objects import AllNetIcon, CoinOverlay, Nameplate, Indicator, Timer
+from libs.input import DON, KAT, L_KAT, R_KAT, drum_input
 from libs.texture import tex
 from libs.transition import Transition
 from libs.utils import (
     OutlinedText,
     get_current_ms,
     global_data,
-    is_l_don_pressed,
-    is_l_kat_pressed,
-    is_r_don_pressed,
-    is_r_kat_pressed,
 )
 
 class State:
@@ -228,6 +225,7 @@ class SongSelectScreen:
                 global_data.config['general']['language'], '')
             self.game_transition = Transition(title, subtitle)
             self.game_transition.start()
+            tex.prefetch_screen('game')
 
     def update(self):
         ret_val = self.on_screen_start()
@@ -424,27 +422,27 @@ class SongSelectPlayer:
         current_time = get_current_ms()
 
         # Skip left (fast navigate)
-        if ray.is_key_pressed(ray.KeyboardKey.KEY_LEFT_CONTROL) or (is_l_kat_pressed(self.player_num) and current_time <= last_moved + 50):
+        if ray.is_key_pressed(ray.KeyboardKey.KEY_LEFT_CONTROL) or (drum_input.is_pressed(L_KAT, self.player_num) and current_time <= last_moved + 50):
             audio.play_sound('skip', 'sound')
             return "skip_left"
 
         # Skip right (fast navigate)
-        if ray.is_key_pressed(ray.KeyboardKey.KEY_RIGHT_CONTROL) or (is_r_kat_pressed(self.player_num) and current_time <= last_moved + 50):
+        if ray.is_key_pressed(ray.KeyboardKey.KEY_RIGHT_CONTROL) or (drum_input.is_pressed(R_KAT, self.player_num) and current_time <= last_moved + 50):
             audio.play_sound('skip', 'sound')
             return "skip_right"
 
         # Navigate left
-        if is_l_kat_pressed(self.player_num):
+        if drum_input.is_pressed(L_KAT, self.player_num):
             audio.play_sound('kat', 'sound')
             return "navigate_left"
 
         # Navigate right
-        if is_r_kat_pressed(self.player_num):
+        if drum_input.is_pressed(R_KAT, self.player_num):
             audio.play_sound('kat', 'sound')
             return "navigate_right"
 
         # Select/Enter
-        if is_l_don_pressed(self.player_num) or is_r_don_pressed(self.player_num):
+        if drum_input.is_pressed(DON, self.player_num):
             if selected_item is not None and selected_item.box.is_back:
                 audio.play_sound('cancel', 'sound')
                 return "go_back"
@@ -462,15 +460,15 @@ class SongSelectPlayer:
 
     def handle_input_diff_sort(self, diff_sort_selector):
         """Handle input for difficulty sorting. Returns (diff, level) tuple or None."""
-        if is_l_kat_pressed(self.player_num):
+        if drum_input.is_pressed(L_KAT, self.player_num):
             diff_sort_selector.input_left()
             audio.play_sound('kat', 'sound')
 
-        if is_r_kat_pressed(self.player_num):
+        if drum_input.is_pressed(R_KAT, self.player_num):
             diff_sort_selector.input_right()
             audio.play_sound('kat', 'sound')
 
-        if is_l_don_pressed(self.player_num) or is_r_don_pressed(self.player_num):
+        if drum_input.is_pressed(DON, self.player_num):
             result = diff_sort_selector.input_select()
             audio.play_sound('don', 'sound')
             return result
@@ -492,28 +490,28 @@ class SongSelectPlayer:
     def handle_input_selected(self, current_item):
         """Handle input for selecting difficulty. Returns 'cancel', 'confirm', or None"""
         if self.neiro_selector is not None:
-            if is_l_kat_pressed(self.player_num):
+            if drum_input.is_pressed(L_KAT, self.player_num):
                 self.neiro_selector.move_left()
-            elif is_r_kat_pressed(self.player_num):
+            elif drum_input.is_pressed(R_KAT, self.player_num):
                 self.neiro_selector.move_right()
-            if is_l_don_pressed(self.player_num) or is_r_don_pressed(self.player_num):
+            if drum_input.is_pressed(DON, self.player_num):
                 audio.play_sound('don', 'sound')
                 self.neiro_selector.confirm()
             return None
 
         if self.modifier_selector is not None:
-            if is_l_kat_pressed(self.player_num):
+            if drum_input.is_pressed(L_KAT, self.player_num):
                 audio.play_sound('kat', 'sound')
                 self.modifier_selector.left()
-            elif is_r_kat_pressed(self.player_num):
+            elif drum_input.is_pressed(R_KAT, self.player_num):
                 audio.play_sound('kat', 'sound')
                 self.modifier_selector.right()
-            if is_l_don_pressed(self.player_num) or is_r_don_pressed(self.player_num):
+            if drum_input.is_pressed(DON, self.player_num):
                 audio.play_sound('don', 'sound')
                 self.modifier_selector.confirm()
             return None
 
-        if is_l_don_pressed(self.player_num) or is_r_don_pressed(self.player_num):
+        if drum_input.is_pressed(DON, self.player_num):
             if self.selected_difficulty == -3:
                 return "cancel"
             elif self.selected_difficulty == -2:
@@ -527,7 +525,7 @@ class SongSelectPlayer:
             else:
                 return "confirm"
 
-        if is_l_kat_pressed(self.player_num) or is_r_kat_pressed(self.player_num):
+        if drum_input.is_pressed(KAT, self.player_num):
             audio.play_sound('kat', 'sound')
             selected_song = current_item
             if isinstance(selected_song, Directory):
@@ -535,9 +533,9 @@ class SongSelectPlayer:
             diffs = sorted(selected_song.tja.metadata.course_data)
             prev_diff = self.selected_difficulty
 
-            if is_l_kat_pressed(self.player_num):
+            if drum_input.is_pressed(L_KAT, self.player_num):
                 self._navigate_difficulty_left(diffs)
-            else:  # is_r_kat_pressed()
+            else:  # drum_input.is_pressed(R_KAT)
                 self._navigate_difficulty_right(diffs)
 
             if 0 <= self.selected_difficulty <= 4 and self.selected_difficulty != prev_diff:
@@ -3,13 +3,12 @@ from pathlib import Path
 
 from libs.audio import audio
 from libs.global_objects import AllNetIcon, CoinOverlay, EntryOverlay
+from libs.input import DON, drum_input
 from libs.texture import tex
 from libs.utils import (
     get_current_ms,
     global_data,
     global_tex,
-    is_l_don_pressed,
-    is_r_don_pressed,
 )
 from libs.video import VideoPlayer
 
@@ -99,7 +98,7 @@ class TitleScreen:
             return self.on_screen_end()
 
         self.scene_manager(current_time)
-        if is_l_don_pressed() or is_r_don_pressed():
+        if drum_input.is_pressed(DON):
             self.fade_out.start()
             audio.play_sound('don', 'sound')
 
@@ -1,8 +1,12 @@
 import copy
 from pathlib import Path
-from libs.tja import TJAParser
-from libs.utils import get_current_ms
+from libs.chart_cache import chart_cache
+from libs.song_index import song_index
+from libs.tja import HASH_VERSION, TJAParser
 from libs.audio import audio
+from libs.profiler import profiler
+from libs.texture import tex
+from libs.timeline import song_timeline
 from libs.utils import global_data
 from libs.video import VideoPlayer
 import pyray as ray
@@ -52,6 +56,9 @@ class TwoPlayerGameScreen(GameScreen):
         if ray.is_key_pressed(ray.KeyboardKey.KEY_F1):
             if self.song_music is not None:
                 audio.stop_music_stream(self.song_music)
+            if ray.is_key_down(ray.KeyboardKey.KEY_LEFT_SHIFT):
+                # Shift+F1 recompiles the chart instead of loading it from the cache
+                chart_cache.invalidate(global_data.selected_song)
             self.init_tja(global_data.selected_song)
             audio.play_sound('restart', 'sound')
             self.song_started = False
@@ -63,7 +70,11 @@ class TwoPlayerGameScreen(GameScreen):
 
     def init_tja(self, song: Path):
         """Initialize the TJA file"""
-        self.tja = TJAParser(song, start_delay=self.start_delay, distance=SCREEN_WIDTH - GameScreen.JUDGE_X)
+        self.tja = TJAParser(song, start_delay=self.start_delay, distance=SCREEN_WIDTH - GameScreen.JUDGE_X,
+                             encoding=song_index.get_encoding(song))
+        # A restart replaces the video, its decoder thread and textures are released first
+        if self.movie is not None:
+            self.movie.stop()
         if self.tja.metadata.bgmovie != Path() and self.tja.metadata.bgmovie.exists():
             self.movie = VideoPlayer(self.tja.metadata.bgmovie)
             self.movie.set_volume(0.0)
@@ -73,10 +84,14 @@ class TwoPlayerGameScreen(GameScreen):
         if self.tja.metadata.wave.exists() and self.tja.metadata.wave.is_file() and self.song_music is None:
             self.song_music = audio.load_music_stream(self.tja.metadata.wave, 'song')
 
+        diff_hashes = song_index.get_diff_hashes(song, HASH_VERSION)
+        for session_data in global_data.session_data:
+            session_data.diff_hash = diff_hashes.get(session_data.selected_difficulty, '')
         tja_copy = copy.deepcopy(self.tja)
         self.player_1 = Player(self.tja, 1, global_data.session_data[0].selected_difficulty, False, global_data.modifiers[0])
         self.player_2 = Player(tja_copy, 2, global_data.session_data[1].selected_difficulty, True, global_data.modifiers[1])
-        self.start_ms = (get_current_ms() - self.tja.metadata.offset*1000)
+        song_timeline.start()
+        self.start_ms = (song_timeline.time_ms - self.tja.metadata.offset*1000)
 
     def spawn_ending_anims(self):
         if global_data.session_data[0].result_bad == 0:
@@ -95,14 +110,15 @@ class TwoPlayerGameScreen(GameScreen):
 
     def update(self):
         self.on_screen_start()
-        current_time = get_current_ms()
+        current_time = song_timeline.update()
         self.transition.update(current_time)
         self.current_ms = current_time - self.start_ms
         self.start_song(current_time)
         self.update_background(current_time)
 
         if self.song_music is not None:
-            audio.update_music_stream(self.song_music)
+            with profiler.section('audio'):
+                audio.update_music_stream(self.song_music)
 
         self.player_1.update(self.current_ms, current_time, self.background)
         self.player_2.update(self.current_ms, current_time, self.background)
@@ -122,6 +138,7 @@ class TwoPlayerGameScreen(GameScreen):
                     if self.player_1.ending_anim is None:
                         self.write_score()
                         self.spawn_ending_anims()
+                        tex.prefetch_screen('result')
                 if current_time >= self.end_ms + 8533.34:
                     if not self.result_transition.is_started:
                         self.result_transition.start()
@@ -133,7 +150,7 @@ class TwoPlayerGameScreen(GameScreen):
 
     def update_background(self, current_time):
         if self.movie is not None:
-            self.movie.update()
+            self.movie.update(current_time)
         else:
             if len(self.player_1.current_bars) > 0:
                 self.bpm = self.player_1.bpm
@@ -1,4 +1,5 @@
 from libs.file_navigator import SongFile
+from libs.texture import tex
 from libs.transition import Transition
 from scenes.song_select import DiffSortSelect, SongSelectPlayer, SongSelectScreen, State
 from libs.utils import get_current_ms, global_data
@@ -148,6 +149,7 @@ class TwoPlayerSongSelectScreen(SongSelectScreen):
                 global_data.config['general']['language'], '')
             self.game_transition = Transition(title, subtitle)
             self.game_transition.start()
+            tex.prefetch_screen('game')
 
     def update_players(self, current_time):
         self.player_1.update(current_time)